@@ -28,6 +28,9 @@ setuptools.setup(
         'ping3',
         'ubxlib>=0.4.0'
     ],
+    extras_require={
+        'dbus': ['jeepney>=0.7'],   # ModemManager access via D-Bus
+    },
     include_package_data=True,  # Use MANIFEST.in to add *.html, *.css files
     entry_points={
         'console_scripts': [
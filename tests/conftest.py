@@ -0,0 +1,11 @@
+import pytest
+
+from vcuui.data_model import Model
+
+
+@pytest.fixture
+def model():
+    Model.instance = None
+    m = Model()
+    yield m
+    Model.instance = None
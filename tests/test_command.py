@@ -0,0 +1,67 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from vcuui.command import CommandRunner, run_command, run_command_async
+
+
+@pytest.fixture
+def runner():
+    r = CommandRunner(max_concurrent=2)
+    r.setup()
+    return r
+
+
+class TestCommandRunner:
+    def test_output(self, runner):
+        cp = runner.execute([sys.executable, '-c', 'print("hello")'])
+        assert cp.returncode == 0
+        assert cp.stdout.decode().strip() == 'hello'
+
+        stats = runner.stats()[sys.executable.split('/')[-1]]
+        assert stats['runs'] == 1
+        assert stats['errors'] == 0
+
+    def test_returncode(self, runner):
+        cp = runner.execute([sys.executable, '-c', 'import sys; sys.exit(3)'])
+        assert cp.returncode == 3
+
+        stats = runner.stats()[sys.executable.split('/')[-1]]
+        assert stats['errors'] == 1
+
+    def test_timeout(self, runner):
+        with pytest.raises(subprocess.TimeoutExpired):
+            runner.execute([sys.executable, '-c', 'import time; time.sleep(5)'], timeout=0.2)
+
+        stats = runner.stats()[sys.executable.split('/')[-1]]
+        assert stats['timeouts'] == 1
+        assert stats['latency-max'] < 2.0
+
+    def test_not_found(self, runner):
+        with pytest.raises(FileNotFoundError):
+            runner.execute(['/nonexistent/tool'])
+
+        assert runner.stats()['tool']['errors'] == 1
+
+    def test_concurrency_limit(self, runner):
+        async def run_all():
+            cmd = [sys.executable, '-c', 'import time; time.sleep(0.3)']
+            return await asyncio.gather(*[runner.execute_async(cmd) for _ in range(4)])
+
+        start = time.monotonic()
+        res = asyncio.run(run_all())
+        duration = time.monotonic() - start
+
+        # Two at a time, so at least two rounds
+        assert all(cp.returncode == 0 for cp in res)
+        assert duration >= 0.6
+
+    def test_module_functions(self):
+        cp = run_command([sys.executable, '-c', 'print(1)'])
+        assert cp.stdout == b'1\n'
+
+        cp = asyncio.run(run_command_async([sys.executable, '-c', 'print(2)']))
+        assert cp.stdout == b'2\n'
@@ -0,0 +1,146 @@
+import json
+
+import pytest
+
+from vcuui.data_model import FrozenDict, freeze
+
+
+class TestFreeze:
+    def test_dict(self):
+        d = freeze({'a': 1, 'b': {'c': [1, 2]}})
+        assert isinstance(d, FrozenDict)
+        assert isinstance(d['b'], FrozenDict)
+        assert d['b']['c'] == (1, 2)
+
+    def test_readonly(self):
+        d = freeze({'a': 1})
+        with pytest.raises(TypeError):
+            d['a'] = 2
+        with pytest.raises(TypeError):
+            d.update({'b': 2})
+        with pytest.raises(TypeError):
+            del d['a']
+        with pytest.raises(TypeError):
+            d.pop('a')
+
+    def test_json(self):
+        d = freeze({'a': 1, 'b': {'c': [1, 2]}})
+        assert json.loads(json.dumps(d)) == {'a': 1, 'b': {'c': [1, 2]}}
+
+
+class TestModelSnapshot:
+    def test_publish_copies_value(self, model):
+        info = {'delay': 0.1}
+        model.publish('link', info)
+        info['delay'] = 0.2
+        assert model.get('link')['delay'] == 0.1
+
+    def test_snapshot_is_stable(self, model):
+        model.publish('link', {'delay': 0.1})
+        md = model.get_all()
+
+        model.publish('link', {'delay': 0.2})
+        model.publish('obd2', {'speed': 10.0})
+        model.remove('link')
+
+        assert md['link']['delay'] == 0.1
+        assert 'obd2' not in md
+        assert 'link' not in model.get_all()
+
+    def test_version(self, model):
+        v0, _ = model.snapshot()
+        model.publish('link', {'delay': 0.1})
+        v1, md = model.snapshot()
+        assert v1 > v0
+        assert md['link']['delay'] == 0.1
+
+        # Removing non existing origin is no change
+        model.remove('gnss-pos')
+        v2, _ = model.snapshot()
+        assert v2 == v1
+
+    def test_statistics(self, model):
+        model.publish('modem', {'bearer-uptime': 100})
+        model.publish('modem', {'bearer-uptime': 50})
+        stats = model.get_statistics()['modem.bearer-uptime']
+        assert stats['max'] == 100
+        assert stats['min'] == 50
+        assert stats['count'] == 2
+
+    def test_statistics_unchanged_value(self, model):
+        events = list()
+        model.subscribe(['obd2'], lambda origin, value: events.append(value))
+
+        # Parked car, speed stays at 0
+        for speed in (10.0, 0.0, 0.0, 0.0):
+            model.publish('obd2', {'speed': speed})
+
+        stats = model.get_statistics()['obd2.speed']
+        assert stats['count'] == 4
+        assert stats['mean'] == 2.5
+        assert len(events) == 2
+
+    def test_statistics_keep_version(self, model):
+        model.publish('sys-misc', {'temp': 40.0})
+        v, _ = model.snapshot()
+        for _ in range(3):
+            model.publish('sys-misc', {'temp': 40.0})
+
+        assert model.snapshot()[0] == v
+        assert model.get_statistics()['sys-misc.temp']['count'] == 4
+        assert 'statistics' not in model.get_all()
+
+    def test_statistics_reset(self, model):
+        model.publish('link', {'delay': 0.1})
+        model.publish('link', {'delay': 0.0})
+        assert model.get_statistics()['link.delay']['count'] == 1
+
+        model.reset_statistics()
+        assert model.get_statistics() == {}
+
+
+class TestModelSubscribe:
+    def test_notify_on_change(self, model):
+        events = list()
+        model.subscribe(['link'], lambda origin, value: events.append((origin, value)))
+
+        model.publish('link', {'delay': 0.1})
+        model.publish('obd2', {'speed': 10.0})
+        assert events == [('link', {'delay': 0.1})]
+
+    def test_no_notify_without_change(self, model):
+        events = list()
+        model.subscribe(['link'], lambda origin, value: events.append(origin))
+
+        model.publish('link', {'delay': 0.1})
+        v, _ = model.snapshot()
+        model.publish('link', {'delay': 0.1})
+        assert events == ['link']
+        assert model.snapshot()[0] == v
+
+    def test_remove(self, model):
+        events = list()
+        model.subscribe(None, lambda origin, value: events.append((origin, value)))
+
+        model.publish('gnss-pos', {'lon': 8.0})
+        model.remove('gnss-pos')
+        assert events[-1] == ('gnss-pos', None)
+
+    def test_unsubscribe(self, model):
+        events = list()
+        sub = model.subscribe(['link'], lambda origin, value: events.append(origin))
+        model.unsubscribe(sub)
+
+        model.publish('link', {'delay': 0.1})
+        assert events == []
+
+    def test_failing_subscriber(self, model):
+        def fail(origin, value):
+            raise ValueError('fail')
+
+        events = list()
+        model.subscribe(['link'], fail)
+        model.subscribe(['link'], lambda origin, value: events.append(origin))
+
+        model.publish('link', {'delay': 0.1})
+        assert events == ['link']
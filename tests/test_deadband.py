@@ -0,0 +1,55 @@
+from vcuui.deadband import DeadbandFilter, Rule
+
+
+class TestDeadbandFilter:
+    def test_first_value_reported(self):
+        f = DeadbandFilter()
+        assert f.filter({'a': 1, 'b': 'x'}, now=0.0) == {'a': 1, 'b': 'x'}
+
+    def test_absolute(self):
+        f = DeadbandFilter({'temp': Rule(abs=1.0)})
+        f.filter({'temp': 40.0}, now=0.0)
+        assert f.filter({'temp': 40.5}, now=1.0) == {}
+        assert f.filter({'temp': 40.9}, now=2.0) == {}
+        assert f.filter({'temp': 41.0}, now=3.0) == {'temp': 41.0}
+
+        # Threshold relates to last reported value
+        assert f.filter({'temp': 40.5}, now=4.0) == {}
+        assert f.filter({'temp': 39.9}, now=5.0) == {'temp': 39.9}
+
+    def test_relative(self):
+        f = DeadbandFilter({'mem': Rule(rel=0.1)})
+        f.filter({'mem': 1000}, now=0.0)
+        assert f.filter({'mem': 1050}, now=1.0) == {}
+        assert f.filter({'mem': 890}, now=2.0) == {'mem': 890}
+
+    def test_any_change(self):
+        f = DeadbandFilter()
+        f.filter({'rat': 4}, now=0.0)
+        assert f.filter({'rat': 4}, now=1.0) == {}
+        assert f.filter({'rat': 3}, now=2.0) == {'rat': 3}
+
+    def test_heartbeat(self):
+        f = DeadbandFilter({'speed': Rule(abs=1.0, max_silence=60.0)})
+        f.filter({'speed': 50.0}, now=0.0)
+        assert f.filter({'speed': 50.0}, now=59.0) == {}
+        assert f.filter({'speed': 50.0}, now=60.0) == {'speed': 50.0}
+        assert f.filter({'speed': 50.0}, now=61.0) == {}
+
+    def test_rate_limit(self):
+        f = DeadbandFilter({'speed': Rule(abs=1.0, min_interval=0.5)})
+        f.filter({'speed': 50.0}, now=0.0)
+        assert f.filter({'speed': 60.0}, now=0.2) == {}
+        assert f.filter({'speed': 60.0}, now=0.5) == {'speed': 60.0}
+
+    def test_mixed_keys(self):
+        f = DeadbandFilter({'temp': Rule(abs=1.0)})
+        f.filter({'temp': 40.0, 'rat': 4}, now=0.0)
+        assert f.filter({'temp': 40.2, 'rat': 3}, now=1.0) == {'rat': 3}
+        assert f.stats() == {'passed': 3, 'suppressed': 1}
+
+    def test_reset(self):
+        f = DeadbandFilter()
+        f.filter({'rat': 4}, now=0.0)
+        f.reset()
+        assert f.filter({'rat': 4}, now=1.0) == {'rat': 4}
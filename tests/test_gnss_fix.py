@@ -0,0 +1,118 @@
+import pytest
+
+from vcuui.gnss_fix import FixHistory, GnssFix, SkyInfo, parse_gpsd_time
+from vcuui.gnss_pos import GnssPosition
+
+TPV = {
+    'class': 'TPV', 'mode': 3, 'status': 2, 'time': '2021-04-12T10:00:00.500Z',
+    'lat': 47.1, 'lon': 8.2, 'altMSL': 420.5, 'speed': 12.0, 'track': 90.0, 'climb': 0.1,
+    'epx': 3.0, 'epy': 4.0, 'eph': 5.0,
+}
+
+
+@pytest.fixture
+def gnss_pos(model):
+    GnssPosition.instance = None
+    yield GnssPosition(model)
+    GnssPosition.instance = None
+
+
+class TestParseTime:
+    def test_time(self):
+        assert parse_gpsd_time('1970-01-01T00:01:00Z') == 60.0
+        assert parse_gpsd_time('2021-04-12T10:00:00.500Z') == 1618221600.5
+
+    def test_invalid(self):
+        assert parse_gpsd_time(None) is None
+        assert parse_gpsd_time('garbage') is None
+
+
+class TestSkyInfo:
+    def test_counts(self):
+        sky = SkyInfo.from_report({'class': 'SKY', 'pdop': 1.5, 'nSat': 20, 'uSat': 12})
+        assert (sky.pdop, sky.sats_used, sky.sats_visible) == (1.5, 12, 20)
+
+    def test_satellite_list(self):
+        sats = [{'PRN': 1, 'used': True}, {'PRN': 2, 'used': False}, {'PRN': 3, 'used': True}]
+        sky = SkyInfo.from_report({'class': 'SKY', 'satellites': sats})
+        assert (sky.sats_used, sky.sats_visible) == (2, 3)
+
+    def test_keeps_last(self):
+        last = SkyInfo(1.5, 12, 20)
+        sky = SkyInfo.from_report({'class': 'SKY', 'pdop': 2.0}, last)
+        assert (sky.pdop, sky.sats_used, sky.sats_visible) == (2.0, 12, 20)
+
+
+class TestGnssFix:
+    def test_from_tpv(self):
+        fix = GnssFix.from_tpv(TPV, SkyInfo(1.5, 12, 20), received=1618221600.75)
+        assert fix.fix == '3D DGPS'
+        assert fix.alt == 420.5
+        assert fix.latency == pytest.approx(0.25)
+
+        d = fix.to_dict()
+        assert d['lat'] == 47.1
+        assert d['pdop'] == 1.5
+        assert d['sats-used'] == 12
+        assert d['time'] == 1618221600.5
+        assert d['latency'] == 0.25
+
+    def test_slots(self):
+        fix = GnssFix.from_tpv(TPV)
+        with pytest.raises(AttributeError):
+            fix.foo = 1
+
+    def test_speed_from_last(self):
+        last = GnssFix.from_tpv(TPV)
+        fix = GnssFix.from_tpv({'class': 'TPV', 'mode': 2, 'lat': 47.1, 'lon': 8.2}, last=last)
+        assert fix.fix == '2D'
+        assert fix.speed == 12.0
+        assert fix.latency is None
+
+    def test_same_values(self):
+        a = GnssFix.from_tpv(TPV, received=1.0)
+        b = GnssFix.from_tpv(dict(TPV, time='2021-04-12T10:00:01.500Z'), received=2.0)
+        c = GnssFix.from_tpv(dict(TPV, lat=47.2))
+        assert a.same_values(b)
+        assert not a.same_values(c)
+        assert not a.same_values(None)
+
+
+class TestFixHistory:
+    def test_window(self):
+        h = FixHistory(seconds=10.0, max_rate=1)
+        for t in range(30):
+            h.add(GnssFix(received=float(t)))
+
+        assert len(h) == 10
+        assert [f.received for f in h.last(3.0, now=29.0)] == [26.0, 27.0, 28.0, 29.0]
+
+    def test_age_limit(self):
+        h = FixHistory(seconds=10.0, max_rate=10)
+        h.add(GnssFix(received=0.0))
+        h.add(GnssFix(received=20.0))
+        assert len(h) == 1
+
+
+class TestGnssPosition:
+    def test_publish_on_change(self, gnss_pos):
+        published = list()
+        gnss_pos.model.subscribe(['gnss-pos'], lambda origin, value: published.append(value))
+
+        gnss_pos._handle_report({'class': 'SKY', 'pdop': 1.5, 'nSat': 20, 'uSat': 12})
+        gnss_pos._handle_report(TPV)
+        gnss_pos._handle_report(dict(TPV, time='2021-04-12T10:00:01.500Z'))
+        gnss_pos._handle_report(dict(TPV, lat=47.2))
+
+        assert [p['lat'] for p in published] == [47.1, 47.2]
+        assert published[0]['pdop'] == 1.5
+        assert len(gnss_pos.history) == 3
+
+        track = gnss_pos.track(60.0)
+        assert [f['lat'] for f in track] == [47.1, 47.1, 47.2]
+        assert track[0]['time'] == 1618221600.5
+
+    def test_no_position(self, gnss_pos):
+        gnss_pos._handle_report({'class': 'TPV', 'mode': 1})
+        assert 'gnss-pos' not in gnss_pos.model.get_all()
+        assert len(gnss_pos.history) == 0
@@ -0,0 +1,183 @@
+import queue
+import socket
+import threading
+
+import pytest
+
+from vcuui.gpsd import GpsdSession, LineBuffer, ReportQueue
+
+TPV = b'{"class":"TPV","device":"/dev/ttyS3","mode":3,"lat":47.1,"lon":8.2}'
+SKY = b'{"class":"SKY","device":"/dev/ttyS3","pdop":1.5}'
+ATT = b'{"class":"ATT","device":"/dev/ttyS3","heading":10.0}'
+
+
+class TestLineBuffer:
+    def test_complete_lines(self):
+        lb = LineBuffer()
+        assert lb.feed(b'a\nb\r\n') == [b'a', b'b']
+
+    def test_split_line(self):
+        lb = LineBuffer()
+        assert lb.feed(TPV[:10]) == []
+        assert lb.feed(TPV[10:] + b'\r\n' + SKY[:5]) == [TPV]
+        assert lb.feed(SKY[5:] + b'\r\n') == [SKY]
+
+    def test_empty_lines_skipped(self):
+        lb = LineBuffer()
+        assert lb.feed(b'\r\n\na\n') == [b'a']
+
+    def test_overlong_line_dropped(self):
+        lb = LineBuffer(max_line_length=8)
+        assert lb.feed(b'0123456789') == []
+        assert lb.feed(b'abc') == []
+        assert lb.feed(b'def\nok\n') == [b'ok']
+        assert lb.overflows == 1
+
+
+class TestGpsdSession:
+    def test_reassembly(self):
+        session = GpsdSession()
+        sub = session.subscribe()
+        data = TPV + b'\r\n' + SKY + b'\r\n'
+        for i in range(0, len(data), 7):
+            session._receive(data[i:i + 7])
+
+        assert sub.next(0.0)['class'] == 'TPV'
+        assert sub.next(0.0)['pdop'] == 1.5
+        assert sub.next(0.0) is None
+        assert session.stats()['decode-errors'] == 0
+
+    def test_class_filter(self):
+        session = GpsdSession()
+        sub = session.subscribe(('TPV', 'SKY'))
+        session._receive(ATT + b'\r\n' + TPV + b'\r\n' + ATT + b'\r\n')
+
+        assert sub.next(0.0)['class'] == 'TPV'
+        assert sub.next(0.0) is None
+        assert session.stats()['received'] == 3
+        assert session.stats()['filtered'] == 2
+
+    def test_fan_out(self):
+        session = GpsdSession()
+        pos = session.subscribe(('TPV',), policy='latest')
+        sky = session.subscribe(('SKY',))
+        monitor = session.subscribe()
+        session._receive(TPV + b'\n' + SKY + b'\n' + TPV + b'\n')
+
+        assert pos.next(0.0)['class'] == 'TPV'
+        assert pos.next(0.0) is None
+        assert sky.next(0.0)['class'] == 'SKY'
+        assert sky.next(0.0) is None
+        assert [monitor.next(0.0)['class'] for _ in range(3)] == ['TPV', 'SKY', 'TPV']
+        assert session.stats()['filtered'] == 0
+
+        # Classes nobody wants anymore are not decoded
+        monitor.close()
+        session._receive(ATT + b'\n')
+        assert session.stats()['filtered'] == 1
+        assert session.stats()['subscribers'] == 2
+
+    def test_unknown_layout_decoded(self):
+        session = GpsdSession()
+        sub = session.subscribe(('TPV',))
+        session._receive(b'{"mode":3,"class":"TPV"}\n')
+        assert sub.next(0.0)['mode'] == 3
+
+    def test_decode_error(self):
+        session = GpsdSession()
+        sub = session.subscribe()
+        session._receive(b'{"class":"TPV",\n' + SKY + b'\n')
+        assert sub.next(0.0)['class'] == 'SKY'
+        assert session.stats()['decode-errors'] == 1
+
+    def test_bounded_queue(self):
+        session = GpsdSession()
+        sub = session.subscribe(max_queue_size=2)
+        for i in range(5):
+            session._receive(b'{"class":"TPV","time":%d}\n' % i)
+
+        assert sub.next(0.0)['time'] == 3
+        assert sub.next(0.0)['time'] == 4
+        assert sub.stats()['dropped'] == 3
+
+    def test_connection(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        server.settimeout(5.0)
+
+        session = GpsdSession(server.getsockname())
+        session.RECONNECT_DELAY = 0.05
+        sub = session.subscribe(('TPV',))
+        session.setup()
+        try:
+            # gpsd restarts, session reconnects by itself
+            for _ in range(2):
+                conn, _ = server.accept()
+                assert conn.recv(100).startswith(b'?WATCH=')
+                conn.sendall(TPV + b'\r\n')
+                assert sub.next(5.0)['class'] == 'TPV'
+                assert session.healthy()
+                conn.close()
+
+            assert session.stats()['connects'] == 2
+        finally:
+            session.stop()
+            session.join(5.0)
+            server.close()
+
+
+class TestReportQueue:
+    def test_fifo(self):
+        q = ReportQueue('fifo', 3)
+        for i in range(5):
+            q.put({'class': 'TPV', 'time': i})
+
+        assert [q.get_nowait()['time'] for _ in range(3)] == [2, 3, 4]
+        assert q.empty()
+
+        stats = q.stats()
+        assert stats['enqueued'] == 5
+        assert stats['dropped'] == 2
+        assert stats['max-depth'] == 3
+
+    def test_latest(self):
+        q = ReportQueue('latest')
+        q.put({'class': 'TPV', 'time': 1, 'lat': 47.0})
+        q.put({'class': 'SKY', 'pdop': 1.5})
+        q.put({'class': 'TPV', 'time': 2})
+
+        assert q.get_nowait() == {'class': 'SKY', 'pdop': 1.5}
+        assert q.get_nowait() == {'class': 'TPV', 'time': 2}
+        assert q.stats()['dropped'] == 1
+        assert q.stats()['max-depth'] == 2
+
+    def test_conflate(self):
+        q = ReportQueue('conflate')
+        q.put({'class': 'TPV', 'time': 1, 'lat': 47.0})
+        q.put({'class': 'TPV', 'time': 2, 'speed': 3.0})
+
+        assert q.get_nowait() == {'class': 'TPV', 'time': 2, 'lat': 47.0, 'speed': 3.0}
+        assert q.empty()
+
+    def test_latest_bounded(self):
+        q = ReportQueue('latest', 2)
+        for c in ('A', 'B', 'C'):
+            q.put({'class': c})
+
+        assert q.qsize() == 2
+        assert q.get_nowait()['class'] == 'B'
+
+    def test_timeout(self):
+        q = ReportQueue()
+        with pytest.raises(queue.Empty):
+            q.get(True, 0.01)
+        with pytest.raises(queue.Empty):
+            q.get_nowait()
+
+    def test_blocking_get(self):
+        q = ReportQueue()
+        t = threading.Timer(0.05, q.put, ({'class': 'TPV'},))
+        t.start()
+        assert q.get(True, 5.0) == {'class': 'TPV'}
+        t.join()
@@ -0,0 +1,62 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pycurl = pytest.importorskip('pycurl')
+
+from vcuui.http_client import HttpClient  # noqa: E402
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    bodies = list()
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        Handler.bodies.append(self.rfile.read(length))
+
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.bodies = list()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHttpClient:
+    def test_keep_alive(self, server):
+        client = HttpClient()
+        for i in range(3):
+            res = client.post(f'{server}/api', f'{{"i": {i}}}'.encode(), ['Content-Type:application/json'])
+            assert res.code == 200
+            assert res.body == b'ok'
+
+        assert Handler.bodies == [b'{"i": 0}', b'{"i": 1}', b'{"i": 2}']
+        assert client.stats() == {'requests': 3, 'connects': 1, 'errors': 0}
+        assert res.timings['new-connections'] == 0
+        assert res.timings['bytes-up'] == 8
+        client.close()
+
+    def test_reconnect(self, server):
+        client = HttpClient(connect_timeout_ms=500, timeout_ms=1000)
+        with pytest.raises(pycurl.error):
+            client.post('http://127.0.0.1:1/api', b'{}')
+        assert client.stats()['errors'] == 1
+
+        res = client.post(f'{server}/api', b'{}')
+        assert res.code == 200
+        assert res.timings['new-connections'] == 1
+        client.close()
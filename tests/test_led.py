@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+from vcuui.led import LED_BiColor, LedWriter
+
+
+@pytest.fixture
+def led(tmp_path):
+    for color in ('red', 'green'):
+        (tmp_path / f'ind:{color}').mkdir()
+        (tmp_path / f'ind:{color}' / 'brightness').write_text('0')
+
+    writer = LedWriter()
+    writer.start()
+    return LED_BiColor(str(tmp_path / 'ind'), writer)
+
+
+def brightness(tmp_path):
+    red = (tmp_path / 'ind:red' / 'brightness').read_text()
+    green = (tmp_path / 'ind:green' / 'brightness').read_text()
+    return red, green
+
+
+class TestLED:
+    def test_set(self, led, tmp_path):
+        led.yellow()
+        assert led.writer.flush()
+        assert brightness(tmp_path) == ('1', '1')
+
+        led.green()
+        assert led.writer.flush()
+        assert brightness(tmp_path) == ('0', '1')
+
+    def test_dedup(self, led, tmp_path, monkeypatch):
+        writes = list()
+        pwrite = os.pwrite
+
+        def pwrite_counted(fd, data, offset):
+            writes.append(data)
+            return pwrite(fd, data, offset)
+
+        monkeypatch.setattr(os, 'pwrite', pwrite_counted)
+
+        led.green()
+        assert led.writer.flush()
+        assert len(writes) == 2
+
+        # Same state again, nothing written
+        for _ in range(10):
+            led.green()
+        assert led.writer.flush()
+        assert len(writes) == 2
+
+        # Only red changes
+        led.yellow()
+        assert led.writer.flush()
+        assert writes[2:] == [b'1']
+
+    def test_blink(self, led, tmp_path):
+        states = set()
+        led.blink(LED_BiColor.YELLOW, LED_BiColor.OFF, 0.02)
+
+        end = time.monotonic() + 0.3
+        while time.monotonic() < end:
+            states.add(brightness(tmp_path))
+            time.sleep(0.005)
+        assert states == {('1', '1'), ('0', '0')}
+
+        led.green()
+        assert led.writer.flush()
+        time.sleep(0.05)
+        assert brightness(tmp_path) == ('0', '1')
+
+    def test_missing_led(self, tmp_path):
+        writer = LedWriter()
+        writer.start()
+        led = LED_BiColor(str(tmp_path / 'none'), writer)
+        led.red()
+        assert writer.flush()
+        assert led._failed
+
+    def test_retry_after_failure(self, tmp_path):
+        writer = LedWriter()
+        writer.start()
+        led = LED_BiColor(str(tmp_path / 'ind'), writer)
+        led.red()
+        assert writer.flush()
+        assert led._failed
+
+        # LED shows up later, same request is written now
+        for color in ('red', 'green'):
+            (tmp_path / f'ind:{color}').mkdir()
+            (tmp_path / f'ind:{color}' / 'brightness').write_text('0')
+        led.red()
+        assert writer.flush()
+        assert brightness(tmp_path) == ('1', '0')
+        assert not led._failed
@@ -0,0 +1,82 @@
+from vcuui.metrics import Metric, MetricsRegistry
+
+
+class TestMetric:
+    def test_sample_name(self):
+        assert Metric('link', 'delay', 'vcu_delay', 'gauge', 'x').sample == 'vcu_delay'
+        m = Metric('net-wwan0', 'bytes.0', 'vcu_rx_bytes', 'counter', 'x', {'interface': 'wwan0'})
+        assert m.sample == 'vcu_rx_bytes_total{interface="wwan0"}'
+
+    def test_value(self):
+        m = Metric('net-wwan0', 'bytes.1', 'vcu_tx_bytes', 'counter', 'x')
+        assert m.value({'bytes': (10, 20)}) == 20
+        assert m.value({'bytes': (None, None)}) is None
+        assert Metric('sys-misc', 'load.0', 'vcu_load1', 'gauge', 'x').value({'load': [0.52, 0.4, 0.3]}) == 0.52
+        assert Metric('a', 'b', 'c', 'gauge', 'x').value({'b': float('nan')}) is None
+        assert m.value({}) is None
+        assert Metric('a', 'b', 'c', 'gauge', 'x').value({'b': 'text'}) is None
+        assert Metric('a', 'b', 'c', 'gauge', 'x').value({'b': True}) == 1
+
+
+class TestMetricsRegistry:
+    METRICS = [
+        Metric('link', 'delay', 'vcu_link_delay_seconds', 'gauge', 'Ping'),
+        Metric('net-wwan0', 'bytes.0', 'vcu_network_receive_bytes', 'counter', 'Received', {'interface': 'wwan0'}),
+        Metric('net-wlan0', 'bytes.0', 'vcu_network_receive_bytes', 'counter', 'Received', {'interface': 'wlan0'}),
+    ]
+
+    def test_empty(self):
+        reg = MetricsRegistry(self.METRICS)
+        text = reg.render()
+        assert text.startswith('# TYPE vcu_ui info\n')
+        assert text.endswith('# EOF\n')
+        assert 'vcu_link_delay_seconds' not in text
+
+    def test_update(self):
+        reg = MetricsRegistry(self.METRICS)
+        reg.update('net-wlan0', {'bytes': (5, 6)})
+        reg.update('link', {'delay': 0.25})
+        reg.update('net-wwan0', {'bytes': (7, 8)})
+
+        lines = reg.render().splitlines()
+        assert lines[3:] == [
+            '# TYPE vcu_link_delay_seconds gauge',
+            '# HELP vcu_link_delay_seconds Ping',
+            'vcu_link_delay_seconds 0.25',
+            '# TYPE vcu_network_receive_bytes counter',
+            '# HELP vcu_network_receive_bytes Received',
+            'vcu_network_receive_bytes_total{interface="wwan0"} 7',
+            'vcu_network_receive_bytes_total{interface="wlan0"} 5',
+            '# EOF',
+        ]
+
+    def test_remove(self):
+        reg = MetricsRegistry(self.METRICS)
+        reg.update('link', {'delay': 0.25})
+        reg.update('link', None)
+        assert 'vcu_link_delay_seconds' not in reg.render()
+
+    def test_cached(self):
+        reg = MetricsRegistry(self.METRICS)
+        reg.update('link', {'delay': 0.25})
+        text = reg.render()
+        reg.update('link', {'delay': 0.25})
+        assert reg.render() is text
+
+    def test_model(self, model):
+        model.publish('link', {'delay': 0.1})
+        model.publish('sys-misc', {'temp': 45.5, 'load': [0.52, 0.40, 0.31], 'mem': (1024, 512)})
+        model.publish('sys-disc', {'wear': (10.0, 20.0), 'part_data': {'size': 100, 'free': 40}})
+        reg = MetricsRegistry()
+        reg.attach(model)
+        model.publish('net-wwan0', {'bytes': (1000, 2000)})
+        model.publish('things-upload', {'queue': {'entries': 12, 'dropped': 0}, 'successes': 3, 'failures': 1})
+
+        text = reg.render()
+        assert 'vcu_link_delay_seconds 0.1\n' in text
+        assert 'vcu_load1 0.52\n' in text
+        assert 'vcu_emmc_wear_percent{type="mlc"} 20.0\n' in text
+        assert 'vcu_partition_free_bytes{partition="data"} 40\n' in text
+        assert 'vcu_upload_queue_entries 12\n' in text
+        assert 'vcu_uploads_total{result="failure"} 1\n' in text
+        assert 'vcu_network_transmit_bytes_total{interface="wwan0"} 2000\n' in text
@@ -0,0 +1,249 @@
+"""
+Tests ModemManager D-Bus backend against a stand-in ModemManager service
+
+Starts a private dbus-daemon. Skipped if jeepney or dbus-daemon are not
+available.
+"""
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+jeepney = pytest.importorskip('jeepney')
+
+from jeepney import DBusAddress, HeaderFields, message_bus, new_method_return, new_signal  # noqa: E402
+from jeepney.io.blocking import open_dbus_connection  # noqa: E402
+
+from vcuui.mm import MM, MmCli  # noqa: E402
+from vcuui.mm_dbus import MmDBus  # noqa: E402
+
+
+DBUS_DAEMON = shutil.which('dbus-daemon')
+pytestmark = pytest.mark.skipif(DBUS_DAEMON is None, reason='dbus-daemon not available')
+
+BUS_CONFIG = """<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>session</type>
+  <listen>unix:tmpdir=/tmp</listen>
+  <auth>EXTERNAL</auth>
+  <policy context="default">
+    <allow send_destination="*" eavesdrop="true"/>
+    <allow eavesdrop="true"/>
+    <allow own="*"/>
+  </policy>
+</busconfig>
+"""
+
+MM_PATH = '/org/freedesktop/ModemManager1'
+MODEM = f'{MM_PATH}/Modem/0'
+BEARER = f'{MM_PATH}/Bearer/1'
+SIM = f'{MM_PATH}/SIM/0'
+
+
+class ModemManagerStandIn(threading.Thread):
+    """
+    Minimal ModemManager service with one connected LTE modem
+    """
+    def __init__(self, address):
+        super().__init__()
+        self.daemon = True
+        self.address = address
+        self.ready = threading.Event()
+        self.stop = threading.Event()
+        self.commands = queue.Queue()
+        self.calls = list()
+
+        self.objects = {
+            MODEM: {
+                'org.freedesktop.ModemManager1.Modem': {
+                    'Manufacturer': ('s', 'Quectel'),
+                    'Model': ('s', 'EG25'),
+                    'Revision': ('s', 'EG25GGBR07A08M2G'),
+                    'State': ('i', 11),
+                    'AccessTechnologies': ('u', 1 << 14),
+                    'SignalQuality': ('(ub)', (75, True)),
+                    'Bearers': ('ao', [BEARER]),
+                    'Sim': ('o', SIM),
+                },
+                'org.freedesktop.ModemManager1.Modem.Signal': {
+                    'Rate': ('u', 0),
+                    'Gsm': ('a{sv}', {}),
+                    'Umts': ('a{sv}', {}),
+                    'Lte': ('a{sv}', {'rsrq': ('d', -9.0), 'rsrp': ('d', -88.0), 'snr': ('d', 10.2)}),
+                },
+                'org.freedesktop.ModemManager1.Modem.Location': {
+                    'Enabled': ('u', 0),
+                    'SignalsLocation': ('b', False),
+                },
+            },
+            BEARER: {
+                'org.freedesktop.ModemManager1.Bearer': {
+                    'Stats': ('a{sv}', {'duration': ('u', 120)}),
+                    'Ip4Config': ('a{sv}', {'address': ('s', '10.1.2.3')}),
+                },
+            },
+            SIM: {
+                'org.freedesktop.ModemManager1.Sim': {
+                    'Imsi': ('s', '228012345678901'),
+                    'SimIdentifier': ('s', '8941012345678901234'),
+                },
+            },
+        }
+
+    def set_property(self, path, interface, name, signature, value):
+        self.commands.put((path, interface, name, signature, value))
+
+    def run(self):
+        with open_dbus_connection(bus=self.address) as conn:
+            conn.send_and_get_reply(message_bus.RequestName('org.freedesktop.ModemManager1'))
+            self.ready.set()
+
+            while not self.stop.is_set():
+                try:
+                    msg = conn.receive(timeout=0.02)
+                    self._handle(conn, msg)
+                except TimeoutError:
+                    pass
+
+                while not self.commands.empty():
+                    self._emit(conn, *self.commands.get())
+
+    def _handle(self, conn, msg):
+        path = msg.header.fields.get(HeaderFields.path)
+        member = msg.header.fields.get(HeaderFields.member)
+        self.calls.append((path, member, msg.body))
+
+        if member == 'GetManagedObjects':
+            modems = {MODEM: self.objects[MODEM]}
+            conn.send(new_method_return(msg, 'a{oa{sa{sv}}}', (modems, )))
+        elif member == 'GetAll':
+            props = self.objects[path][msg.body[0]]
+            conn.send(new_method_return(msg, 'a{sv}', (props, )))
+        elif member == 'GetLocation':
+            location = {1: ('s', '228,01,1A2B,010B6E03,0D6A')}
+            conn.send(new_method_return(msg, 'a{uv}', (location, )))
+        elif member in ('Setup', 'Reset'):
+            conn.send(new_method_return(msg))
+
+    def _emit(self, conn, path, interface, name, signature, value):
+        self.objects[path][interface][name] = (signature, value)
+        emitter = DBusAddress(path, interface='org.freedesktop.DBus.Properties')
+        body = (interface, {name: (signature, value)}, [])
+        conn.send(new_signal(emitter, 'PropertiesChanged', 'sa{sv}as', body))
+
+
+@pytest.fixture
+def bus(tmp_path):
+    config = tmp_path / 'bus.conf'
+    config.write_text(BUS_CONFIG)
+    p = subprocess.Popen([DBUS_DAEMON, f'--config-file={config}', '--nofork', '--print-address'],
+                         stdout=subprocess.PIPE)
+    address = p.stdout.readline().decode().strip()
+    yield address
+    p.terminate()
+    p.wait()
+
+
+@pytest.fixture
+def service(bus):
+    mm = ModemManagerStandIn(bus)
+    mm.start()
+    assert mm.ready.wait(2.0)
+    yield mm
+    mm.stop.set()
+    mm.join()
+
+
+@pytest.fixture
+def backend(bus, service):
+    b = MmDBus(bus=bus)
+    assert b.setup()
+    MM.backend = b
+    yield b
+    MM.backend = MmCli()
+    b.close()
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestMmDBus:
+    def test_no_service(self, bus):
+        b = MmDBus(bus=bus)
+        assert not b.setup()
+        b.close()
+
+    def test_modem(self, backend):
+        m = MM.modem()
+        assert m.id == 0
+
+        mmr = m.get_info()
+        assert m.vendor(mmr) == 'Quectel'
+        assert m.model(mmr) == 'EG25'
+        assert m.revision(mmr) == 'EG25GGBR07A08M2G'
+        assert m.state(mmr) == 'connected'
+        assert m.access_tech(mmr) == 'lte'
+        assert m.signal_quality(mmr) == 75
+        assert m.bearer(mmr).id == 1
+        assert m.sim(mmr).id == 0
+
+    def test_signal(self, backend):
+        m = MM.modem()
+        mmr = m.signal_get()
+        assert m.signal_access_tech(mmr) == 'lte'
+        assert m.signal_lte(mmr) == {'rsrq': -9.0, 'rsrp': -88.0, 'snr': 10.2}
+
+    def test_location(self, backend):
+        m = MM.modem()
+        loc = m.location()
+        assert loc == {'mcc': 228, 'mnc': 1, 'lac': 0x0D6A, 'cid': 0x010B6E03}
+
+    def test_bearer_sim(self, backend):
+        m = MM.modem()
+        mmr = m.get_info()
+
+        b = m.bearer(mmr)
+        b_info = b.get_info()
+        assert b.uptime(b_info) == 120
+        assert b.ip(b_info) == '10.1.2.3'
+
+        s = m.sim(mmr)
+        s_info = s.get_info()
+        assert s.imsi(s_info) == '228012345678901'
+        assert s.iccid(s_info) == '8941012345678901234'
+
+    def test_properties_cached(self, backend, service):
+        m = MM.modem()
+        for _ in range(3):
+            mmr = m.get_info()
+            b = m.bearer(mmr)
+            b.uptime(b.get_info())
+
+        get_all = [c for c in service.calls if c[1] == 'GetAll']
+        assert [c[0] for c in get_all] == [BEARER]
+
+    def test_properties_changed(self, backend, service):
+        m = MM.modem()
+        assert m.signal_quality(m.get_info()) == 75
+
+        service.set_property(MODEM, 'org.freedesktop.ModemManager1.Modem', 'SignalQuality', '(ub)', (50, True))
+        assert wait_for(lambda: m.signal_quality(m.get_info()) == 50)
+
+    def test_actions(self, backend, service):
+        m = MM.modem()
+        m.setup_signal_query()
+        m.setup_location_query()
+
+        calls = {c[1]: c[2] for c in service.calls}
+        assert calls['Setup'] == (1, False)
+        assert (MODEM, 'Setup', (2, )) in service.calls
@@ -0,0 +1,104 @@
+from vcuui.mm import IdentityCache, MmResult
+
+
+class FakeModem:
+    def __init__(self, id):
+        self.id = id
+
+    def vendor(self, mmr):
+        return mmr.text('modem.generic.manufacturer')
+
+    def model(self, mmr):
+        return mmr.text('modem.generic.model')
+
+    def revision(self, mmr):
+        return mmr.text('modem.generic.revision')
+
+
+class FakeSim:
+    def __init__(self, id, imsi='228012345678901'):
+        self.id = id
+        self._imsi = imsi
+        self.queries = 0
+
+    def get_info(self):
+        self.queries += 1
+        return MmResult(f'sim.properties.imsi : {self._imsi}\n'
+                        'sim.properties.iccid : 8941012345678901234')
+
+    def imsi(self, mmr):
+        return mmr.text('sim.properties.imsi')
+
+    def iccid(self, mmr):
+        return mmr.text('sim.properties.iccid')
+
+
+MODEM_INFO = MmResult('modem.generic.manufacturer : Quectel\n'
+                      'modem.generic.model : EG25\n'
+                      'modem.generic.revision : EG25GGBR07A08M2G')
+
+
+class TestIdentityCache:
+    def test_modem(self):
+        ic = IdentityCache()
+        info = ic.modem(FakeModem(0), MODEM_INFO)
+        assert info == {'vendor': 'Quectel', 'model': 'EG25', 'revision': 'EG25GGBR07A08M2G'}
+        assert ic.modem_id == 0
+
+        # Cached, result object not used anymore
+        assert ic.modem(FakeModem(0), None) == info
+
+    def test_sim_cached(self):
+        ic = IdentityCache()
+        ic.modem(FakeModem(0), MODEM_INFO)
+
+        s = FakeSim(0)
+        for _ in range(3):
+            info = ic.sim(s)
+        assert info == {'sim-imsi': '228012345678901', 'sim-iccid': '8941012345678901234'}
+        assert s.queries == 1
+
+    def test_sim_change(self):
+        ic = IdentityCache()
+        ic.modem(FakeModem(0), MODEM_INFO)
+
+        s0 = FakeSim(0)
+        s1 = FakeSim(1)
+        ic.sim(s0)
+        ic.sim(s1)
+        ic.sim(s1)
+        assert s0.queries == 1
+        assert s1.queries == 1
+
+    def test_modem_change_invalidates_sim(self):
+        ic = IdentityCache()
+        s = FakeSim(0)
+
+        ic.modem(FakeModem(0), MODEM_INFO)
+        ic.sim(s)
+        ic.modem(FakeModem(1), MODEM_INFO)
+        ic.sim(s)
+        assert ic.modem_id == 1
+        assert s.queries == 2
+
+    def test_sim_incomplete(self):
+        ic = IdentityCache()
+        s = FakeSim(0, imsi='')
+        ic.sim(s)
+        ic.sim(s)
+        assert s.queries == 2
+
+    def test_modem_incomplete(self):
+        ic = IdentityCache()
+        s = FakeSim(0)
+
+        partial = MmResult('modem.generic.manufacturer : Quectel\n')
+        info = ic.modem(FakeModem(0), partial)
+        assert info == {'vendor': 'Quectel', 'model': None, 'revision': None}
+        ic.sim(s)
+
+        # Read again on next call, SIM stays cached
+        assert ic.modem(FakeModem(0), MODEM_INFO)['model'] == 'EG25'
+        assert ic.modem(FakeModem(0), None)['model'] == 'EG25'
+        ic.sim(s)
+        assert s.queries == 1
@@ -15,16 +15,21 @@ class TestMmResult:
         assert mmr._exists('key')
         assert mmr.text('key') == '1'
 
-        # FIXME: Should work as well
-        # mmr = MmResult('key:1')
-        # assert mmr._exists('key')
-        # assert mmr.text('key') == '1'
+        mmr = MmResult('key:1')
+        assert mmr._exists('key')
+        assert mmr.text('key') == '1'
 
     def test_empty_value(self):
         mmr = MmResult('key :')
         assert mmr._exists('key')
         assert mmr.text('key') is None
 
+    def test_not_set_value(self):
+        mmr = MmResult('key : --')
+        assert mmr._exists('key')
+        assert mmr.text('key') is None
+        assert mmr.number('key') is None
+
     def test_does_not_exist(self):
         mmr = MmResult('key : 123')
         res = mmr.text('key1')
@@ -48,9 +53,8 @@ class TestMmResult:
         assert mmr.id('modem-list.value[1]') is None
 
         # No index link
-        # mmr = MmResult('modem-list.value[1] : 12345')
-        # assert mmr.id('modem-list.value[1]') is None
-        # FIXME: This one should fail
+        mmr = MmResult('modem-list.value[1] : 12345')
+        assert mmr.id('modem-list.value[1]') is None
 
         # No ID
         mmr = MmResult('modem-list.value[1] : /org/freedesktop/ModemManager1/Modem/')
@@ -65,9 +69,11 @@ class TestMmResult:
         assert mmr.id('modem-list.value[1]') == 1
 
     def test_text(self):
-        # mmr = MmResult('key : any text')
-        # assert mmr.text('key') == 'any text'
-        # DODO: Should work as well
+        mmr = MmResult('key : any text')
+        assert mmr.text('key') == 'any text'
+
+        mmr = MmResult('key : 2023-09-23T12:00:00Z')
+        assert mmr.text('key') == '2023-09-23T12:00:00Z'
 
         mmr = MmResult('key : any_text')
         assert mmr.text('key') == 'any_text'
@@ -104,3 +110,10 @@ class TestMmResult:
 
         mmr = MmResult('key : -1.23456')
         assert mmr.number('key') == pytest.approx(-1.23456)
+
+    def test_cached_conversion(self):
+        mmr = MmResult('key : 12')
+        assert mmr.dec('key') == 12
+        assert mmr.hex('key') == 0x12
+        assert mmr.number('key') == pytest.approx(12.0)
+        assert mmr.dec('key') == 12
@@ -0,0 +1,103 @@
+"""
+MmResult parser checks and micro-benchmark with real mmcli dumps
+
+Run with 'pytest -s tests/test_mm_result_bench.py' to see timings.
+"""
+import os
+import timeit
+
+import pytest
+
+from vcuui.mm import MmResult, Modem, Bearer
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def load(name):
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return f.read()
+
+
+MODEM = load('mmcli_modem.txt')
+SIGNAL = load('mmcli_signal.txt')
+BEARER = load('mmcli_bearer.txt')
+
+
+def legacy_parse(stdout):
+    # Parser before single pass rework, kept as reference
+    res = dict()
+    for line in stdout.split('\n'):
+        t = line.split()
+        if len(t) >= 1:
+            res[t[0]] = t[2] if len(t) >= 3 else None
+    return res
+
+
+def poll_modem(stdout_modem, stdout_signal, stdout_bearer):
+    # Accessors used by one modem poll in ModelWorker._modem
+    m = Modem(0)
+    mmr = MmResult(stdout_modem)
+    m.vendor(mmr), m.model(mmr), m.revision(mmr)
+    m.state(mmr), m.access_tech(mmr), m.signal_quality(mmr)
+    m.bearer(mmr), m.sim(mmr)
+
+    sig = MmResult(stdout_signal)
+    m.signal_access_tech(sig)
+    m.signal_lte(sig)
+
+    b = Bearer(1)
+    b_info = MmResult(stdout_bearer)
+    b.uptime(b_info), b.ip(b_info)
+
+
+class TestMmResultDumps:
+    def test_modem(self):
+        m = Modem(0)
+        mmr = MmResult(MODEM)
+        assert m.vendor(mmr) == 'QUALCOMM INCORPORATED'
+        assert m.model(mmr) == 'QUECTEL Mobile Broadband Module'
+        assert m.revision(mmr) == 'EG25GGBR07A08M2G'
+        assert m.state(mmr) == 'connected'
+        assert m.access_tech(mmr) == 'lte'
+        assert m.signal_quality(mmr) == 67
+        assert m.bearer(mmr).id == 1
+        assert m.sim(mmr).id == 0
+        assert mmr.text('modem.generic.current-modes') == 'allowed: 2g, 3g, 4g; preferred: 4g'
+        assert mmr.text('modem.3gpp.pco') is None
+
+    def test_signal(self):
+        m = Modem(0)
+        mmr = MmResult(SIGNAL)
+        assert m.signal_access_tech(mmr) == 'lte'
+        assert m.signal_lte(mmr) == {'rsrp': -93.0, 'rsrq': -11.0, 'rssi': -63.0, 'snr': 7.4}
+
+    def test_bearer(self):
+        b = Bearer(1)
+        mmr = MmResult(BEARER)
+        assert b.uptime(mmr) == 8534
+        assert b.ip(mmr) == '10.179.41.93'
+        assert mmr.text('bearer.stats.start-date') == '2023-09-23T10:02:11Z'
+
+
+class TestMmResultBenchmark:
+    NUM = 2000
+
+    def test_parse(self):
+        legacy = timeit.timeit(lambda: legacy_parse(MODEM), number=self.NUM)
+        current = timeit.timeit(lambda: MmResult(MODEM).items, number=self.NUM)
+        print(f'\nparse modem dump: legacy {legacy / self.NUM * 1e6:.1f} us, '
+              f'single pass {current / self.NUM * 1e6:.1f} us')
+
+    def test_poll(self):
+        t = timeit.timeit(lambda: poll_modem(MODEM, SIGNAL, BEARER), number=self.NUM)
+        print(f'\nmodem poll accessors: {t / self.NUM * 1e6:.1f} us')
+
+    def test_cached_conversion(self):
+        mmr = MmResult(SIGNAL)
+        first = timeit.timeit(lambda: MmResult(SIGNAL).number('modem.signal.lte.rsrq'), number=self.NUM)
+        mmr.number('modem.signal.lte.rsrq')
+        cached = timeit.timeit(lambda: mmr.number('modem.signal.lte.rsrq'), number=self.NUM)
+        print(f'\nnumber(): parse and convert {first / self.NUM * 1e6:.2f} us, '
+              f'cached {cached / self.NUM * 1e6:.2f} us')
+        assert mmr.number('modem.signal.lte.rsrq') == pytest.approx(-11.0)
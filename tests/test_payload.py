@@ -0,0 +1,86 @@
+import gzip
+import json
+
+from vcuui.payload import PayloadEncoder
+
+
+def entries(num, values_per_ts=1):
+    res = list()
+    for i in range(num):
+        for k in range(values_per_ts):
+            res.append({'time': 1000 * i, 'data': {f'key{k}': i * 10 + k}})
+    return res
+
+
+class TestPayloadEncoder:
+    def test_format(self):
+        enc = PayloadEncoder(compress=False)
+        p = enc.encode(entries(2))
+
+        assert json.loads(p.body) == [{'ts': 0, 'values': {'key0': 0}}, {'ts': 1000, 'values': {'key0': 10}}]
+        assert p.num_entries == 2
+        assert p.headers == ['Content-Type:application/json']
+
+    def test_merge_same_timestamp(self):
+        enc = PayloadEncoder(compress=False)
+        p = enc.encode(entries(2, values_per_ts=3))
+
+        data = json.loads(p.body)
+        assert data[0] == {'ts': 0, 'values': {'key0': 0, 'key1': 1, 'key2': 2}}
+        assert p.num_entries == 6
+        assert p.num_records == 2
+        assert p.num_values == 6
+
+    def test_byte_budget(self):
+        enc = PayloadEncoder(byte_budget=200, compress=False)
+        p = enc.encode(entries(50))
+
+        assert p.raw_size <= 200
+        assert 0 < p.num_entries < 50
+        assert len(json.loads(p.body)) == p.num_entries
+
+    def test_budget_at_least_one(self):
+        enc = PayloadEncoder(byte_budget=10, compress=False)
+        p = enc.encode(entries(3))
+        assert p.num_entries == 1
+
+    def test_compress(self):
+        enc = PayloadEncoder()
+        p = enc.encode(entries(100, values_per_ts=2))
+
+        assert p.compressed
+        assert 'Content-Encoding:gzip' in p.headers
+        assert json.loads(gzip.decompress(p.body)) == json.loads(PayloadEncoder(compress=False).encode(
+            entries(100, values_per_ts=2)).body)
+        assert p.stats()['compression-ratio'] > 2.0
+
+    def test_small_not_compressed(self):
+        enc = PayloadEncoder()
+        p = enc.encode(entries(1))
+        assert not p.compressed
+        assert p.stats()['compression-ratio'] == 1.0
+
+    def test_keep_on_other_errors(self):
+        enc = PayloadEncoder()
+        p = enc.encode(entries(50))
+        for code in (None, 200, 401, 500, 503):
+            assert not enc.response(p, code)
+        assert enc.compressing()
+
+    def test_pause_on_reject(self):
+        enc = PayloadEncoder()
+        p = enc.encode(entries(50))
+        assert enc.response(p, 400)
+        assert not enc.encode(entries(50)).compressed
+
+        assert enc.response(p, 415, now=100.0)
+        assert not enc.compressing(now=101.0)
+
+        # Tries again after a while
+        assert enc.compressing(now=100.0 + PayloadEncoder.COMPRESS_RETRY)
+        assert enc.compressing(now=101.0)
+
+    def test_disabled(self):
+        enc = PayloadEncoder(compress=False)
+        assert not enc.compressing()
+        assert not enc.response(enc.encode(entries(50)), 400)
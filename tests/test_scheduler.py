@@ -0,0 +1,80 @@
+import threading
+import time
+
+from vcuui.scheduler import PollScheduler
+
+
+class TestPollScheduler:
+    def test_periodic(self):
+        cnt = list()
+        s = PollScheduler()
+        s.add('fast', lambda: cnt.append(1), 0.05)
+        s.start()
+        time.sleep(0.28)
+        s.stop()
+
+        assert 4 <= len(cnt) <= 7
+        stats = s.stats()['fast']
+        assert stats['runs'] == len(cnt)
+        assert stats['overruns'] == 0
+
+    def test_hung_source_does_not_block(self):
+        release = threading.Event()
+        cnt = list()
+
+        s = PollScheduler()
+        s.add('hung', lambda: release.wait(2.0), 0.05, timeout=0.1)
+        s.add('fast', lambda: cnt.append(1), 0.05, priority=1)
+        s.start()
+        time.sleep(0.4)
+
+        stats = s.stats()
+        assert len(cnt) >= 6
+        assert stats['hung']['runs'] == 0
+        assert stats['hung']['overruns'] >= 4
+        assert stats['hung']['timeouts'] == 1
+
+        release.set()
+        time.sleep(0.1)
+        s.stop()
+        assert s.stats()['hung']['runs'] >= 1
+        assert s.stats()['hung']['timeouts'] == 1
+
+    def test_error(self):
+        def fail():
+            raise ValueError('poll failed')
+
+        s = PollScheduler()
+        s.add('fail', fail, 0.05)
+        s.start()
+        time.sleep(0.12)
+        s.stop()
+
+        stats = s.stats()['fail']
+        assert stats['errors'] == stats['runs']
+        assert stats['runs'] >= 2
+
+    def test_priority(self):
+        started = threading.Event()
+        release = threading.Event()
+        order = list()
+
+        def block():
+            started.set()
+            release.wait(2.0)
+
+        s = PollScheduler(num_workers=1)
+        s.add('block', block, 10.0)
+        s.start()
+        assert started.wait(1.0)
+
+        # Both due while the only worker is busy, high priority goes first
+        s.add('low', lambda: order.append('low'), 10.0)
+        s.add('high', lambda: order.append('high'), 10.0, priority=1)
+        time.sleep(0.05)
+        release.set()
+        time.sleep(0.1)
+        s.stop()
+
+        assert order == ['high', 'low']
+        assert s.stats()['low']['drift-max'] >= 0.05
@@ -0,0 +1,197 @@
+import os
+
+from vcuui.spool import Spool
+from vcuui.transmit_queue import TransmitQueue
+
+
+def fill(spool, num, start=0):
+    for i in range(start, start + num):
+        spool.append({'time': i, 'data': {'v': i}})
+
+
+class TestSpool:
+    def test_append_read(self, tmp_path):
+        s = Spool(str(tmp_path))
+        s.open()
+        fill(s, 5)
+
+        assert s.num_entries() == 5
+        entries = s.read(2, 2)
+        assert [e['seq'] for e in entries] == [2, 3]
+        assert entries[0]['data'] == {'v': 1}
+
+    def test_ack(self, tmp_path):
+        s = Spool(str(tmp_path), segment_size=100)
+        s.open()
+        fill(s, 10)
+        num_segments = len(s._segments)
+        assert num_segments > 2
+
+        s.ack(8)
+        assert s.num_entries() == 2
+        assert s.head_seq == 9
+        assert len(s._segments) < num_segments
+        assert [e['seq'] for e in s.read(s.head_seq, 10)] == [9, 10]
+
+    def test_replay(self, tmp_path):
+        s = Spool(str(tmp_path), segment_size=100)
+        s.open()
+        fill(s, 10)
+        s.ack(4)
+        s.close()
+
+        s = Spool(str(tmp_path), segment_size=100)
+        s.open()
+        assert s.head_seq == 5
+        assert s.num_entries() == 6
+        assert [e['seq'] for e in s.read(s.head_seq, 100)] == [5, 6, 7, 8, 9, 10]
+
+        fill(s, 1)
+        assert s.read(11, 1)[0]['seq'] == 11
+
+    def test_partial_write(self, tmp_path):
+        s = Spool(str(tmp_path))
+        s.open()
+        fill(s, 3)
+        s.close()
+
+        # Simulate power loss while writing last entry
+        segment = os.path.join(str(tmp_path), sorted(os.listdir(str(tmp_path)))[0])
+        with open(segment, 'ab') as f:
+            f.write(b'{"time":3,"data":{"v"')
+
+        s = Spool(str(tmp_path))
+        s.open()
+        assert s.num_entries() == 3
+        fill(s, 1)
+        assert [e['seq'] for e in s.read(1, 10)] == [1, 2, 3, 4]
+
+    def test_size_limit(self, tmp_path):
+        s = Spool(str(tmp_path), max_size=1000, segment_size=200)
+        s.open()
+        fill(s, 100)
+
+        assert sum(seg.size for seg in s._segments) <= 1000 + 200
+        assert s.dropped > 0
+        assert s.num_entries() == 100 - s.dropped
+        assert s.read(s.head_seq, 1)[0]['seq'] == s.head_seq
+
+    def test_read_cursor(self, tmp_path):
+        s = Spool(str(tmp_path))
+        s.open()
+        fill(s, 10)
+        assert [e['seq'] for e in s.read(1, 4)] == [1, 2, 3, 4]
+
+        # Continues at the byte offset where the previous read stopped,
+        # read entries are not parsed again
+        path = s._segments[0].path
+        with open(path, 'r+b') as f:
+            f.write(b'x')
+        assert [e['seq'] for e in s.read(5, 3)] == [5, 6, 7]
+
+        # Other start positions scan the segment
+        assert s.read(2, 3) == []
+
+    def test_read_segments_deleted(self, tmp_path):
+        s = Spool(str(tmp_path), segment_size=100)
+        s.open()
+        fill(s, 10)
+        plan = s.read_plan(1)
+        os.remove(plan[0][1])
+
+        entries, cursor = Spool.read_segments(plan, 1, 20)
+        assert entries[-1]['seq'] == 10
+        assert cursor[0] == 11
+
+
+class TestTransmitQueuePersistent:
+    def test_restart(self, tmp_path):
+        tq = TransmitQueue(10, str(tmp_path))
+        for i in range(5):
+            tq.add(i)
+        tq.remove_first(2)
+        tq.close()
+
+        tq = TransmitQueue(10, str(tmp_path))
+        assert tq.num_entries() == 3
+        assert [e['data'] for e in tq.first_entries(10)] == [2, 3, 4]
+
+    def test_backlog_on_disk(self, tmp_path):
+        tq = TransmitQueue(4, str(tmp_path))
+        for i in range(10):
+            tq.add(i)
+
+        assert tq.num_entries() == 10
+        assert len(tq.all_entries()) == 4
+        assert tq.stats()['dropped'] == 0
+
+        res = list()
+        while tq.num_entries():
+            entries = tq.first_entries(3)
+            res += [e['data'] for e in entries]
+            tq.remove_first(len(entries))
+
+        assert res == list(range(10))
+
+    def test_add_while_draining(self, tmp_path):
+        tq = TransmitQueue(2, str(tmp_path))
+        for i in range(3):
+            tq.add(i)
+
+        assert [e['data'] for e in tq.pop_first(2)] == [0, 1]
+        tq.add(3)
+        assert [e['data'] for e in tq.pop_first(5)] == [2, 3]
+        assert tq.num_entries() == 0
+
+    def test_refill_without_lock(self, tmp_path, monkeypatch):
+        tq = TransmitQueue(2, str(tmp_path))
+        for i in range(6):
+            tq.add(i)
+
+        read_segments = Spool.read_segments
+        locked = list()
+
+        def check(*args):
+            locked.append(tq._lock.locked())
+            # Collector keeps adding while entries are read
+            if len(locked) <= 3:
+                tq.add(100 + len(locked))
+            return read_segments(*args)
+
+        monkeypatch.setattr(Spool, 'read_segments', staticmethod(check))
+        res = list()
+        while tq.num_entries():
+            res += [e['data'] for e in tq.pop_first(2)]
+
+        assert locked and not any(locked)
+        assert res == [0, 1, 2, 3, 4, 5, 101, 102, 103]
+
+    def test_disk_error_on_add(self, tmp_path):
+        tq = TransmitQueue(4, str(tmp_path))
+        for i in range(6):
+            tq.add(i)
+
+        def no_space(entry):
+            raise OSError(28, 'No space left on device')
+
+        tq._spool.append = no_space
+        tq.add(6)
+
+        # Entries only on disk (4, 5) are lost, 0 is dropped for space
+        assert [e['data'] for e in tq.all_entries()] == [1, 2, 3, 6]
+        assert tq.stats()['dropped'] == 3
+        tq.add(7)
+        assert tq.num_entries() == 4
+
+    def test_disk_error_on_ack(self, tmp_path):
+        tq = TransmitQueue(4, str(tmp_path))
+        for i in range(3):
+            tq.add(i)
+
+        def io_error(seq):
+            raise OSError(5, 'Input/output error')
+
+        tq._spool.ack = io_error
+        assert [e['data'] for e in tq.pop_first(2)] == [0, 1]
+        assert [e['data'] for e in tq.pop_first(2)] == [2]
+        assert tq.stats()['dropped'] == 0
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from vcuui.statistics import FieldStats, P2Quantile, Stat, Statistics
+
+
+class TestP2Quantile:
+    def test_first_samples_exact(self):
+        q = P2Quantile(0.5)
+        assert q.value() is None
+        for x in (3.0, 1.0, 2.0):
+            q.add(x)
+        assert q.value() == 2.0
+
+    @pytest.mark.parametrize('p', [0.05, 0.5, 0.9, 0.99])
+    def test_estimate(self, p):
+        rnd = random.Random(1)
+        samples = [rnd.gauss(50.0, 10.0) for _ in range(20000)]
+        q = P2Quantile(p)
+        for x in samples:
+            q.add(x)
+
+        exact = sorted(samples)[int(p * (len(samples) - 1))]
+        assert q.value() == pytest.approx(exact, abs=1.0)
+
+    def test_state(self):
+        q = P2Quantile(0.9)
+        for x in range(100):
+            q.add(float(x))
+
+        r = P2Quantile.from_state(q.state())
+        for x in range(100, 200):
+            q.add(float(x))
+            r.add(float(x))
+        assert r.value() == q.value()
+
+
+class TestFieldStats:
+    def test_info(self):
+        f = FieldStats((0.5,))
+        for x in (1, 2, 3, 4, 10):
+            f.add(x)
+
+        assert f.info() == {'count': 5, 'min': 1, 'max': 10, 'mean': 4.0, 'p50': 3}
+
+
+class TestStatistics:
+    SPECS = {
+        'sys-misc.temp': Stat((0.5,)),
+        'sys-misc.load.0': Stat(),
+        'link.delay': Stat(valid=lambda v: v > 0.0),
+    }
+
+    def test_update(self):
+        st = Statistics(self.SPECS)
+        assert st.update('sys-misc', {'temp': 40.0, 'load': (0.5, 0.4, 0.3)}) == ['sys-misc.temp', 'sys-misc.load.0']
+        assert st.update('sys-misc', {'temp': None}) == []
+        assert st.update('other', {'temp': 1.0}) == []
+
+        info = st.info()
+        assert info['sys-misc.temp']['p50'] == 40.0
+        assert info['sys-misc.load.0']['max'] == 0.5
+        assert 'link.delay' not in info
+
+    def test_valid(self):
+        st = Statistics(self.SPECS)
+        assert st.update('link', {'delay': 0.0}) == []
+        assert st.update('link', {'delay': 0.2}) == ['link.delay']
+
+    def test_reset(self):
+        st = Statistics(self.SPECS)
+        st.update('sys-misc', {'temp': 40.0})
+        st.update('link', {'delay': 0.2})
+
+        st.reset('link.delay')
+        assert list(st.info()) == ['sys-misc.temp']
+        st.reset()
+        assert st.info() == {}
+
+    def test_persistence(self, tmp_path):
+        path = str(tmp_path / 'vcuui' / 'statistics.json')
+        st = Statistics(self.SPECS, path)
+        for x in range(10):
+            st.update('sys-misc', {'temp': float(x)})
+        st.save()
+
+        st2 = Statistics(self.SPECS, path)
+        st2.load()
+        assert st2.info() == st.info()
+
+        st2.update('sys-misc', {'temp': 20.0})
+        assert st2.info()['sys-misc.temp']['count'] == 11
+
+    def test_load_invalid(self, tmp_path):
+        path = tmp_path / 'statistics.json'
+        path.write_text('garbage')
+        st = Statistics(self.SPECS, str(path))
+        st.load()
+        assert st.info() == {}
@@ -0,0 +1,89 @@
+import errno
+import os
+
+import pytest
+
+from vcuui.sysfs import SysfsReader
+
+
+class TestSysfsReader:
+    def test_read_keeps_fd(self, tmp_path):
+        attr = tmp_path / 'temp1_input'
+        attr.write_text('41500\n')
+
+        r = SysfsReader()
+        assert r.read(str(attr)) == '41500'
+        fd = r.attributes[str(attr)].fd
+
+        # Content rewritten in place, same descriptor returns new value
+        with open(attr, 'r+') as f:
+            f.write('42000\n')
+        assert r.read(str(attr)) == '42000'
+        assert r.attributes[str(attr)].fd == fd
+        r.close()
+
+    def test_procfs(self):
+        r = SysfsReader()
+        first = r.read('/proc/loadavg')
+        assert len(first.split()) == 5
+        assert len(r.read('/proc/loadavg').split()) == 5
+        assert 'MemTotal' in r.read('/proc/meminfo')
+        r.close()
+
+    def test_missing(self, tmp_path):
+        r = SysfsReader()
+        with pytest.raises(FileNotFoundError):
+            r.read(str(tmp_path / 'missing'))
+
+        # Appears later, e.g. module loaded
+        (tmp_path / 'missing').write_text('1\n')
+        assert r.read(str(tmp_path / 'missing')) == '1'
+        r.close()
+
+    def test_reopen_on_enodev(self, tmp_path, monkeypatch):
+        attr = tmp_path / 'rx_bytes'
+        attr.write_text('100\n')
+
+        r = SysfsReader()
+        assert r.read(str(attr)) == '100'
+
+        pread = os.pread
+        opened = list()
+        unplugged = [True]
+
+        def pread_unplugged(fd, n, offset):
+            if unplugged:
+                unplugged.pop()
+                raise OSError(errno.ENODEV, 'No such device')
+            return pread(fd, n, offset)
+
+        def open_counted(*args):
+            opened.append(args[0])
+            return os_open(*args)
+
+        os_open = os.open
+        monkeypatch.setattr(os, 'pread', pread_unplugged)
+        monkeypatch.setattr(os, 'open', open_counted)
+        attr.write_text('200\n')
+        assert r.read(str(attr)) == '200'
+        assert opened == [str(attr)]
+        r.close()
+
+    def test_large_file(self, tmp_path):
+        attr = tmp_path / 'large'
+        attr.write_text('x' * 10000)
+
+        r = SysfsReader()
+        assert len(r.read(str(attr))) == 10000
+        r.close()
+
+    def test_batch(self, tmp_path):
+        rx = tmp_path / 'rx_bytes'
+        tx = tmp_path / 'tx_bytes'
+        rx.write_text('1\n')
+        tx.write_text('2\n')
+
+        r = SysfsReader()
+        res = r.read_batch((str(rx), str(tx), str(tmp_path / 'missing')))
+        assert res == {str(rx): '1', str(tx): '2', str(tmp_path / 'missing'): None}
+        r.close()
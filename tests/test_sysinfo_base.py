@@ -0,0 +1,48 @@
+import os
+import time
+
+from vcuui.sysinfo_base import SysInfoBase
+from vcuui.tools import bytes_to_human
+
+
+class TestSysInfoBase:
+    def test_format_uptime(self):
+        assert SysInfoBase.format_uptime(59) == 'up 0 min'
+        assert SysInfoBase.format_uptime(3600) == 'up  1:00'
+        assert SysInfoBase.format_uptime(86400 + 3660) == 'up 1 day,  1:01'
+        assert SysInfoBase.format_uptime(2 * 86400 + 300) == 'up 2 days, 5 min'
+        assert SysInfoBase.format_uptime(12 * 3600 + 59) == 'up 12:00'
+
+    def test_date(self):
+        si = SysInfoBase()
+        assert si.date().endswith(time.strftime('%Y'))
+
+    def test_part_size(self, tmp_path):
+        si = SysInfoBase()
+        info = si.part_size(str(tmp_path))
+
+        st = os.statvfs(tmp_path)
+        assert info['size'] == st.f_blocks * st.f_frsize
+        assert info['used'] + info['free'] <= info['size']
+        assert 0 <= info['percent'] <= 100
+
+    def test_part_size_missing(self, tmp_path):
+        si = SysInfoBase()
+        assert si.part_size(str(tmp_path / 'missing')) is None
+
+    def test_bytes_to_human(self):
+        assert bytes_to_human(1000) == '1000'
+        assert bytes_to_human(1536) == '1.5K'
+        assert bytes_to_human(10 * 1024 * 1024) == '10M'
+        assert bytes_to_human(5 * 1024 ** 3) == '5.0G'
+
+    def test_load(self):
+        load = SysInfoBase().load()
+        assert len(load) == 3
+        assert all(isinstance(v, float) for v in load)
+
+    def test_ifinfo(self):
+        si = SysInfoBase()
+        rx, tx = si.ifinfo('lo')
+        assert isinstance(rx, int) and isinstance(tx, int)
+        assert si.ifinfo('missing0') == (None, None)
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('pycurl')
+
+from vcuui.things import ThingsDataCollector  # noqa: E402
+from vcuui.transmit_queue import TransmitQueue  # noqa: E402
+
+
+@pytest.fixture
+def collector(model, monkeypatch):
+    # Test the collector functions, without the thread
+    monkeypatch.setattr(ThingsDataCollector, 'start', lambda self: None)
+    queue = TransmitQueue(100)
+    c = ThingsDataCollector(model, queue, TransmitQueue(1))
+    c.enable()
+    return c, queue
+
+
+class TestThingsDataCollector:
+    def test_broadr_quality_deadband(self, collector):
+        c, queue = collector
+
+        # Older models published the PHY quality as text
+        for quality in ('66', 68, '83'):
+            c._info({'phy-broadr0': {'state': 'up', 'quality': quality}})
+
+        sent = [e['data']['broadr0-quality'] for e in queue.all_entries()]
+        assert sent == [66, 83]
+
+    def test_broadr_missing_phy(self, collector):
+        c, queue = collector
+        c._info({'phy-broadr0': {'state': None, 'quality': None}})
+        assert all('broadr0-quality' not in e['data'] for e in queue.all_entries())
@@ -0,0 +1,157 @@
+import vcuui.timeseries
+from vcuui.timeseries import Series, Tier, TimeSeriesStore
+
+T0 = 1600000000.0
+
+
+class TestTier:
+    def test_aggregate(self):
+        tier = Tier(60, 10)
+        for i, v in enumerate([1.0, 5.0, 3.0]):
+            tier.add(T0 + i, v)
+        tier.add(T0 + 60, 7.0)
+
+        assert tier.buckets(0, T0 + 1000) == [(T0 - T0 % 60, 1.0, 5.0, 3.0), (T0 + 60 - T0 % 60, 7.0, 7.0, 7.0)]
+
+    def test_ring(self):
+        tier = Tier(1, 4)
+        for i in range(10):
+            tier.add(T0 + i, float(i))
+
+        # 4 closed buckets plus the one being filled
+        assert [b[1] for b in tier.buckets(0, T0 + 100)] == [5.0, 6.0, 7.0, 8.0, 9.0]
+        assert tier.oldest() == T0 + 5
+        assert tier.nbytes == 4 * 5 * 8
+
+    def test_range(self):
+        tier = Tier(1, 100)
+        for i in range(10):
+            tier.add(T0 + i, float(i))
+
+        assert [b[1] for b in tier.buckets(T0 + 3, T0 + 5)] == [3.0, 4.0, 5.0]
+
+    def test_clock_step_back(self):
+        tier = Tier(1, 10)
+        tier.add(T0 + 5, 1.0)
+        tier.add(T0, 3.0)
+        assert tier.buckets(0, T0 + 10) == [(T0 + 5, 1.0, 3.0, 2.0)]
+
+    def test_shift(self):
+        tier = Tier(60, 10)
+        tier.add(T0, 1.0)
+        tier.add(T0 + 60, 2.0)
+        tier.shift(3600 + 10)
+        assert [b[0] for b in tier.buckets(0, T0 + 7200)] == [T0 - 40 + 3600, T0 + 20 + 3600]
+
+        # Steps below half the resolution keep buckets in place
+        tier.shift(20)
+        assert tier.oldest() == T0 - 40 + 3600
+
+
+class TestSeries:
+    def test_tier_selection(self):
+        s = Series(((1, 60), (60, 60)))
+        for i in range(300):
+            s.add(T0 + i, float(i))
+
+        # Fine tier only holds the last minute
+        res, points = s.query(T0 + 250, T0 + 300, 1)
+        assert res == 1
+        assert len(points) == 50
+
+        res, points = s.query(T0, T0 + 300, 1)
+        assert res == 60
+
+        res, points = s.query(T0 + 250, T0 + 300, 10)
+        assert res == 60
+
+    def test_young_series_prefers_fine_tier(self):
+        s = Series(((1, 60), (60, 60)))
+        for i in range(30):
+            s.add(T0 + i, float(i))
+
+        res, points = s.query(T0 - 3600, T0 + 30, 1)
+        assert res == 1
+        assert len(points) == 30
+
+
+class TestTimeSeriesStore:
+    def test_flatten(self):
+        store = TimeSeriesStore()
+        store.add('sys-misc', {'temp': 45.5, 'load': (0.5, 0.4, 0.3), 'name': 'x', 'ok': True}, now=T0)
+        assert store.fields() == ['sys-misc.load.0', 'sys-misc.load.1', 'sys-misc.load.2', 'sys-misc.temp']
+
+    def test_exclude(self):
+        store = TimeSeriesStore()
+        store.add('gnss-pos', {'speed': 1.0, 'time': T0}, now=T0)
+        assert store.fields() == ['gnss-pos.speed']
+
+    def test_query(self):
+        store = TimeSeriesStore()
+        for i in range(120):
+            store.add('link', {'delay': 0.1 * (i % 2)}, now=T0 + i)
+
+        res = store.query('link.delay', T0, T0 + 200, resolution=60)
+        assert res['resolution'] == 60
+        assert res['points'][0][1:] == [0.0, 0.1, 0.05]
+        assert store.query('link.unknown') is None
+
+    def test_budget(self):
+        tiers = ((1, 10),)
+        store = TimeSeriesStore(tiers, budget=2 * 10 * 5 * 8)
+        store.add('obd2', {'speed': 1.0, 'coolant-temp': 80.0, 'rpm': 800}, now=T0)
+
+        stats = store.stats()
+        assert stats['fields'] == 2
+        assert stats['bytes'] == 800
+        assert stats['rejected'] == 1
+
+    def test_clock_step(self, monkeypatch):
+        class Clock():
+            wall = T0
+            mono = 100.0
+
+            def time(self):
+                return self.wall
+
+            def monotonic(self):
+                return self.mono
+
+        clock = Clock()
+        monkeypatch.setattr(vcuui.timeseries, 'time', clock)
+
+        store = TimeSeriesStore()
+        for i in range(10):
+            store.add('sys-misc', {'temp': float(i)})
+            clock.wall += 1.0
+            clock.mono += 1.0
+
+        # Time sync after boot sets the clock one day ahead
+        clock.wall += 86400.0
+        store.add('sys-misc', {'temp': 10.0})
+
+        points = store.query('sys-misc.temp', T0 + 86400, clock.wall)['points']
+        assert [p[1] for p in points] == [float(i) for i in range(11)]
+        assert points[0][0] == T0 + 86400
+
+    def test_model(self, model):
+        model.publish('sys-misc', {'temp': 40.0})
+        model.publish('sys-misc', {'temp': 41.0})
+        model.publish('things', {'state': 'sent', 'bytes': 100})
+
+        assert model.timeseries.fields() == ['sys-misc.temp']
+        points = model.timeseries.query('sys-misc.temp')['points']
+        assert min(p[1] for p in points) == 40.0
+        assert max(p[2] for p in points) == 41.0
+
+    def test_model_unchanged_values(self, model):
+        # Parked car, unchanged values count for the average
+        for speed in (50.0, 0.0, 0.0, 0.0, 0.0):
+            model.publish('obd2', {'speed': speed})
+
+        assert model.timeseries.stats()['samples'] == 5
+
+    def test_other_origin(self):
+        store = TimeSeriesStore()
+        store.add('things', {'bytes': 100}, now=T0)
+        assert store.fields() == []
@@ -0,0 +1,117 @@
+import math
+
+import pytest
+
+from vcuui.trajectory import haversine, TrajectorySimplifier
+
+# Approx. 1 m in degrees latitude
+M = 1.0 / 111195.0
+
+
+def run(simplifier, points):
+    reported = list()
+    for i, (lat, lon) in enumerate(points):
+        reported += simplifier.add(lat, lon, i, float(i))
+    reported += simplifier.flush()
+    return [data for _, data in reported]
+
+
+def deviation(points, reported):
+    # Worst distance of any input point to the reported polyline, in m
+    scale = 111195.0
+    res = 0.0
+    for k in range(len(reported) - 1):
+        a, b = reported[k], reported[k + 1]
+        ax, ay = points[a][1] * scale, points[a][0] * scale
+        bx, by = points[b][1] * scale, points[b][0] * scale
+        for i in range(a, b + 1):
+            px, py = points[i][1] * scale, points[i][0] * scale
+            dx, dy = bx - ax, by - ay
+            d2 = dx * dx + dy * dy
+            t = min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / d2)) if d2 else 0.0
+            res = max(res, math.hypot(px - ax - t * dx, py - ay - t * dy))
+    return res
+
+
+class TestHaversine:
+    def test_one_degree(self):
+        assert haversine(0.0, 0.0, 1.0, 0.0) == pytest.approx(111195.0, rel=1e-3)
+        assert haversine(47.0, 8.0, 47.0, 8.0) == 0.0
+
+    def test_arrays(self):
+        np = pytest.importorskip('numpy')
+        lat = np.array([47.0, 47.001, 47.002])
+        lon = np.array([8.0, 8.0, 8.001])
+        d = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        assert d[0] == pytest.approx(haversine(47.0, 8.0, 47.001, 8.0))
+        assert d[1] == pytest.approx(haversine(47.001, 8.0, 47.002, 8.001))
+
+
+class TestTrajectorySimplifier:
+    @pytest.fixture(params=[False, True], ids=['python', 'numpy'])
+    def use_numpy(self, request):
+        if request.param:
+            pytest.importorskip('numpy')
+        return request.param
+
+    def test_straight_line(self, use_numpy):
+        s = TrajectorySimplifier(5.0, max_points=1000, max_age=1000.0, use_numpy=use_numpy)
+        points = [(i * 10 * M, 0.0) for i in range(50)]
+        assert run(s, points) == [0, 49]
+
+    def test_corner_kept(self, use_numpy):
+        s = TrajectorySimplifier(5.0, max_points=1000, max_age=1000.0, use_numpy=use_numpy)
+        # North for 300 m, then east for 300 m
+        points = [(i * 10 * M, 0.0) for i in range(31)]
+        points += [(300 * M, i * 10 * M) for i in range(1, 31)]
+        assert run(s, points) == [0, 30, 60]
+
+    def test_error_bound(self, use_numpy):
+        s = TrajectorySimplifier(5.0, max_points=1000, max_age=1000.0, use_numpy=use_numpy)
+        # Circle with radius 200 m, one fix every 3 degrees
+        points = [(200 * M * math.sin(math.radians(a)), 200 * M * math.cos(math.radians(a))) for a in range(0, 360, 3)]
+        reported = run(s, points)
+        assert len(reported) < len(points) / 2
+        assert deviation(points, reported) <= 5.0
+
+    def test_backends_agree(self):
+        pytest.importorskip('numpy')
+        points = [(200 * M * math.sin(math.radians(a)), 300 * M * math.cos(math.radians(a))) for a in range(0, 720, 2)]
+        a = run(TrajectorySimplifier(3.0, max_points=1000, max_age=1000.0, use_numpy=False), points)
+        b = run(TrajectorySimplifier(3.0, max_points=1000, max_age=1000.0, use_numpy=True), points)
+        assert a == b
+
+    def test_max_age(self):
+        s = TrajectorySimplifier(5.0, max_age=10.0, use_numpy=False)
+        points = [(i * 10 * M, 0.0) for i in range(25)]
+        # Fix 10 exceeds the age, the one before it is reported
+        assert run(s, points) == [0, 9, 18, 24]
+
+    def test_jitter_suppressed(self):
+        s = TrajectorySimplifier(5.0, max_age=1000.0, use_numpy=False)
+        points = [((i % 3) * M, (i % 2) * M) for i in range(30)]
+        assert run(s, points) == [0, 29]
+
+    def test_reset(self):
+        s = TrajectorySimplifier(use_numpy=False)
+        assert s.add(47.0, 8.0, 'a', 0.0) == [(0.0, 'a')]
+        assert s.add(47.0, 8.0, 'b', 1.0) == []
+        s.reset()
+        assert s.add(47.0, 8.0, 'c', 2.0) == [(2.0, 'c')]
+        assert s.flush() == []
+
+    def test_repeat(self):
+        s = TrajectorySimplifier(use_numpy=False)
+        assert s.repeat(1.0) == []
+        s.add(47.0, 8.0, 'a', 0.0)
+        s.add(47.0, 8.0, 'b', 1.0)
+        assert s.repeat(2.0) == [(2.0, 'a')]
+
+    def test_stats(self):
+        s = TrajectorySimplifier(use_numpy=False)
+        run(s, [(i * 10 * M, 0.0) for i in range(11)])
+        stats = s.stats()
+        assert stats['received'] == 11
+        assert stats['reported'] == 2
+        assert stats['pending'] == 0
+        assert stats['distance'] == 100
@@ -81,6 +81,50 @@ class TestTransmitQueueBasic:
         tq.remove_first(99)
         assert tq.num_entries() == 0
 
+    def test_all_entries_copy(self):
+        tq = TransmitQueue(4)
+        self._fill(tq, 2)
+
+        data = tq.all_entries()
+        tq.add(3)
+        assert len(data) == 2
+
+    def test_pop_first(self):
+        tq = TransmitQueue(4)
+        self._fill(tq, 3)
+
+        data = tq.pop_first(2)
+        assert [d['data'] for d in data] == [1, 2]
+        assert tq.num_entries() == 1
+        assert tq.pop_first(5)[0]['data'] == 3
+        assert tq.pop_first(5) == []
+
+    def test_timestamp(self):
+        tq = TransmitQueue(4)
+        tq.add(1, 1600000000.5)
+        tq.add(2)
+        data = tq.all_entries()
+        assert data[0]['time'] == 1600000000500
+        assert data[1]['time'] > data[0]['time']
+
+    def test_stats(self):
+        tq = TransmitQueue(2)
+        self._fill(tq, 5)
+        tq.remove_first(1)
+
+        stats = tq.stats()
+        assert stats['entries'] == 1
+        assert stats['capacity'] == 2
+        assert stats['added'] == 5
+        assert stats['removed'] == 1
+        assert stats['dropped'] == 3
+
+    def test_large(self):
+        tq = TransmitQueue(100000)
+        self._fill(tq, 100001)
+        assert tq.num_entries() == 100000
+        assert tq.first_entries(1)[0]['data'] == 2
+
     @staticmethod
     def _fill(tq, num):
         for i in range(1, num + 1):
@@ -0,0 +1,43 @@
+"""
+TransmitQueue micro-benchmark
+
+Adding to a full queue must not get slower with queue size. Run with
+'pytest -s tests/test_transmit_queue_bench.py' to see timings.
+"""
+import timeit
+
+from vcuui.transmit_queue import TransmitQueue
+
+
+class TestTransmitQueueBenchmark:
+    NUM = 5000
+    SIZES = (600, 6000, 60000)
+
+    def test_add_full_queue(self):
+        times = dict()
+        for size in self.SIZES:
+            tq = TransmitQueue(size)
+            for i in range(size):
+                tq.add(i)
+
+            t = timeit.timeit(lambda: tq.add(1), number=self.NUM)
+            times[size] = t / self.NUM
+            print(f'\nadd to full queue of {size}: {times[size] * 1e6:.2f} us')
+
+        # Cost is flat, allow for timing noise. The former list based
+        # queue was ~100 times slower at 60000 than at 600 entries.
+        assert times[self.SIZES[-1]] < 5 * times[self.SIZES[0]]
+
+    def test_upload_cycle(self):
+        tq = TransmitQueue(600)
+        for i in range(600):
+            tq.add(i)
+
+        def cycle():
+            entries = tq.first_entries(120)
+            tq.remove_first(len(entries))
+            for i in range(120):
+                tq.add(i)
+
+        t = timeit.timeit(cycle, number=self.NUM // 10)
+        print(f'\npeek/remove/refill 120 entries: {t / (self.NUM // 10) * 1e6:.1f} us')
@@ -0,0 +1,57 @@
+from vcuui.upload_policy import UploadPolicy
+
+
+def md(sq=None, delay=None):
+    res = dict()
+    if sq is not None:
+        res['modem'] = {'signal-quality2': sq}
+    if delay is not None:
+        res['link'] = {'delay': delay}
+    return res
+
+
+class TestUploadPolicy:
+    def test_unknown(self):
+        p = UploadPolicy()
+        assert not p.update(dict(), 0)
+        assert p.quality is None
+        assert p.link_class == 'fair'
+
+    def test_good(self):
+        p = UploadPolicy()
+        assert p.update(md(sq=90, delay=0.05), 0)
+        assert p.link_class == 'good'
+        assert p.period == 30.0
+        assert p.byte_budget == 128 * 1024
+        assert p.drain
+
+    def test_poor_signal(self):
+        p = UploadPolicy()
+        p.update(md(sq=20, delay=0.05), 1000)
+        assert p.link_class == 'poor'
+        assert p.period == 120.0
+        assert p.byte_budget == 8 * 1024
+        assert not p.drain
+
+    def test_slow_link(self):
+        p = UploadPolicy()
+        p.update(md(sq=90, delay=0.6), 0)
+        assert p.link_class == 'fair'
+
+        # Failed ping
+        p.update(md(sq=90, delay=0.0), 0)
+        assert p.link_class == 'poor'
+
+    def test_backlog(self):
+        p = UploadPolicy()
+        p.update(md(sq=90, delay=0.05), UploadPolicy.BACKLOG_ENTRIES)
+        assert p.period == UploadPolicy.BACKLOG_PERIOD
+
+        assert p.update(md(sq=90, delay=0.05), 10)
+        assert p.period == 30.0
+
+    def test_modem_signal_quality_fallback(self):
+        p = UploadPolicy()
+        p.update({'modem': {'signal-quality': 50}}, 0)
+        assert p.link_class == 'fair'
+        assert p.info()['link-quality'] == 0.5
@@ -0,0 +1,110 @@
+import time
+
+from vcuui.uploader import CircuitBreaker, Uploader
+
+
+def wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestCircuitBreaker:
+    def test_backoff(self):
+        b = CircuitBreaker(threshold=3, base_delay=1.0, max_delay=8.0)
+        assert b.state == 'closed'
+        assert b.allow(0.0)
+
+        delays = [b.record_failure(0.0) for _ in range(6)]
+        for i, d in enumerate(delays):
+            nominal = min(8.0, 2 ** i)
+            assert nominal / 2 <= d <= nominal
+
+        assert b.state == 'open'
+        assert not b.allow(delays[-1] - 0.01)
+        assert b.allow(delays[-1])
+
+        b.record_success()
+        assert b.state == 'closed'
+        assert b.allow(0.0)
+
+    def test_retrying(self):
+        b = CircuitBreaker(threshold=3)
+        b.record_failure(0.0)
+        assert b.state == 'retrying'
+
+
+class TestUploader:
+    def test_no_link(self):
+        calls = list()
+        u = Uploader('test-uploader', lambda: calls.append(1), 0.05)
+        u.start()
+        time.sleep(0.1)
+        assert calls == []
+        assert u.state == 'offline'
+
+        u.set_link(True)
+        assert wait_for(lambda: len(calls) >= 2)
+        assert u.state == 'connected'
+        u.stop()
+
+    def test_circuit_opens_and_recovers(self):
+        ok = [False]
+
+        def upload():
+            return ok[0]
+
+        breaker = CircuitBreaker(threshold=3, base_delay=0.01, max_delay=0.05)
+        u = Uploader('test-uploader', upload, 10.0, breaker=breaker)
+        u.set_link(True)
+        u.start()
+
+        assert wait_for(lambda: u.state == 'disconnected')
+        assert u.stats()['failures'] >= 3
+
+        ok[0] = True
+        assert wait_for(lambda: u.state == 'connected')
+        assert u.stats()['consecutive-failures'] == 0
+        u.stop()
+
+    def test_exception_counts_as_failure(self):
+        def upload():
+            raise ValueError('broken')
+
+        breaker = CircuitBreaker(threshold=2, base_delay=0.01, max_delay=0.02)
+        u = Uploader('test-uploader', upload, 10.0, breaker=breaker)
+        u.set_link(True)
+        u.start()
+        assert wait_for(lambda: u.state == 'disconnected')
+        u.stop()
+
+    def test_drain_backlog(self):
+        backlog = [5]
+
+        def upload():
+            backlog[0] -= 1
+            return True
+
+        u = Uploader('test-uploader', upload, 10.0, pending=lambda: backlog[0] > 0)
+        u.set_link(True)
+        u.start()
+
+        # Doesn't wait for period while data is pending
+        assert wait_for(lambda: backlog[0] == 0, timeout=1.0)
+        time.sleep(0.05)
+        assert u.stats()['successes'] == 5
+        u.stop()
+
+    def test_set_period(self):
+        calls = list()
+        u = Uploader('test-uploader', lambda: calls.append(1), 10.0)
+        u.set_link(True)
+        u.start()
+        assert wait_for(lambda: len(calls) == 1)
+
+        u.set_period(0.02)
+        assert wait_for(lambda: len(calls) >= 3, timeout=1.0)
+        u.stop()
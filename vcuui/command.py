@@ -0,0 +1,190 @@
+"""
+Execution of external tools
+
+All external commands are executed on a shared asyncio event loop running
+in its own thread. This limits the number of concurrently running
+processes, enforces timeouts and records per command latency metrics.
+
+- run_command() for worker threads, blocks the calling thread only
+- run_command_async() for coroutines, e.g. Tornado request handlers
+
+Both return a subprocess.CompletedProcess with stdout/stderr as bytes and
+raise subprocess.TimeoutExpired on timeout or FileNotFoundError if the
+tool does not exist, like subprocess.run() does.
+"""
+import asyncio
+import functools
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger('vcu-ui')
+
+
+class CommandStats():
+    def __init__(self):
+        super().__init__()
+
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def record(self, latency, error=False, timeout=False):
+        self.runs += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_last = latency
+        if error:
+            self.errors += 1
+        if timeout:
+            self.timeouts += 1
+
+    def as_dict(self):
+        latency_avg = self.latency_sum / self.runs if self.runs else 0.0
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'latency-avg': round(latency_avg, 4),
+            'latency-max': round(self.latency_max, 4),
+            'latency-last': round(self.latency_last, 4),
+        }
+
+
+class CommandRunner():
+    # Singleton accessor, see get()
+    instance = None
+    _instance_lock = threading.Lock()
+
+    # Maximum number of processes running at the same time
+    MAX_CONCURRENT = 4
+
+    # Timeout if caller doesn't specify one
+    DEFAULT_TIMEOUT = 10.0
+
+    # Python 3.7 can't watch child processes from an event loop in a
+    # secondary thread, run blocking subprocess calls in executor instead
+    USE_ASYNC_SUBPROCESS = sys.version_info >= (3, 8)
+
+    @staticmethod
+    def get():
+        """
+        Returns shared runner, creates it on first use
+        """
+        with CommandRunner._instance_lock:
+            if CommandRunner.instance is None:
+                runner = CommandRunner()
+                runner.setup()
+                CommandRunner.instance = runner
+
+            return CommandRunner.instance
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        super().__init__()
+
+        self.max_concurrent = max_concurrent
+        self.loop = asyncio.new_event_loop()
+        self.lock = threading.Lock()
+        self._stats = dict()
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._run_loop, name='cmd-runner', daemon=True)
+
+    def setup(self):
+        ready = threading.Event()
+        self.loop.call_soon_threadsafe(ready.set)
+        self._thread.start()
+        ready.wait()
+
+    def execute(self, cmd, timeout=None):
+        """
+        Executes command, blocks until it is finished
+        """
+        future = asyncio.run_coroutine_threadsafe(self._execute(cmd, timeout), self.loop)
+        return future.result()
+
+    async def execute_async(self, cmd, timeout=None):
+        """
+        Executes command, awaitable from any event loop
+        """
+        future = asyncio.run_coroutine_threadsafe(self._execute(cmd, timeout), self.loop)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        """
+        Returns statistics per command as dictionary, indexed by tool name
+        """
+        with self.lock:
+            return {name: s.as_dict() for name, s in self._stats.items()}
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.loop.run_forever()
+
+    async def _execute(self, cmd, timeout):
+        if timeout is None:
+            timeout = self.DEFAULT_TIMEOUT
+
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                if self.USE_ASYNC_SUBPROCESS:
+                    cp = await self._spawn(cmd, timeout)
+                else:
+                    run = functools.partial(subprocess.run, cmd, capture_output=True, timeout=timeout)
+                    cp = await self.loop.run_in_executor(None, run)
+
+                self._record(cmd, start, error=cp.returncode != 0)
+                return cp
+
+            except subprocess.TimeoutExpired:
+                logger.warning(f'command {cmd[0]} timed out after {timeout} s')
+                self._record(cmd, start, error=True, timeout=True)
+                raise
+
+            except OSError:
+                self._record(cmd, start, error=True)
+                raise
+
+    async def _spawn(self, cmd, timeout):
+        proc = await asyncio.create_subprocess_exec(*cmd,
+                                                    stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    def _record(self, cmd, start, error=False, timeout=False):
+        latency = time.monotonic() - start
+        name = os.path.basename(cmd[0])
+        with self.lock:
+            if name not in self._stats:
+                self._stats[name] = CommandStats()
+            self._stats[name].record(latency, error, timeout)
+
+
+def run_command(cmd, timeout=None):
+    """
+    Executes command on shared runner, blocks until finished
+
+    Must not be called from the Tornado IOLoop, use run_command_async() there.
+    """
+    return CommandRunner.get().execute(cmd, timeout)
+
+
+async def run_command_async(cmd, timeout=None):
+    """
+    Executes command on shared runner without blocking the caller's event loop
+    """
+    return await CommandRunner.get().execute_async(cmd, timeout)
@@ -14,17 +14,21 @@ Speed = Bitrate to use. Either 250000 or 500000
 
 import configparser
 import logging
+import os
 import platform
 import threading
-import time
 
+from vcuui.command import CommandRunner
 from vcuui.led import LED_BiColor
-from vcuui.mm import MM
+from vcuui.mm import MM, IdentityCache
 from vcuui.obd_client import OBD2
 from vcuui.phy_info import PhyInfo, PhyInfo5
+from vcuui.scheduler import PollScheduler
 from vcuui.sig_quality import SignalQuality_LTE
+from vcuui.statistics import Stat, Statistics
 from vcuui.sysinfo_sysfs import SysInfoSysFs
 from vcuui.sysinfo_sensors import SysInfoSensors
+from vcuui.timeseries import TimeSeriesStore
 from vcuui.vnstat import VnStat
 
 CONF_FILE = '/etc/vcuui.conf'
@@ -33,10 +37,60 @@ CONF_FILE = '/etc/vcuui.conf'
 logger = logging.getLogger('vcu-ui')
 
 
+class FrozenDict(dict):
+    """
+    Read-only dictionary
+
+    Used for the data model snapshots. Behaves like a regular dict for
+    readers (including json serialization) but refuses any modification.
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('model snapshot is read-only')
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+    __ior__ = _readonly
+
+
+def freeze(value):
+    """
+    Returns an immutable copy of value
+
+    dicts are turned into FrozenDicts and lists into tuples, recursively.
+    Already frozen values and scalars are returned as they are.
+    """
+    if isinstance(value, FrozenDict):
+        return value
+    elif isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
 class Model(object):
     # Singleton accessor
     instance = None
 
+    # Statistics kept for model fields, see vcuui.statistics
+    STATISTICS = {
+        'modem.bearer-uptime': Stat(),
+        'modem.signal-quality2': Stat((0.05, 0.5, 0.95)),
+        'sys-misc.temp': Stat((0.5, 0.95)),
+        'sys-misc.v_in': Stat((0.05, 0.5)),
+        'link.delay': Stat((0.5, 0.9, 0.99), valid=lambda v: v > 0.0),
+        'obd2.speed': Stat((0.5, 0.95)),
+    }
+
+    # Statistics are kept across restarts if /data partition is present
+    STATISTICS_PARTITION = '/data'
+    STATISTICS_PATH = '/data/vcuui/statistics.json'
+
     def __init__(self):
         super().__init__()
 
@@ -47,8 +101,16 @@ class Model(object):
 
         self.worker = ModelWorker(self)
         self.lock = threading.Lock()
-        self.data = dict()
-        self.data['watermark'] = dict()
+        self.version = 0
+        self.subscribers = list()
+
+        path = self.STATISTICS_PATH if os.path.isdir(self.STATISTICS_PARTITION) else None
+        self.statistics = Statistics(self.STATISTICS, path)
+        self.statistics.load()
+        self.data = FrozenDict()
+
+        # History of numeric values, fed by publish()
+        self.timeseries = TimeSeriesStore()
 
         self.led_ind = LED_BiColor('/sys/class/leds/ind')
         self.led_stat = LED_BiColor('/sys/class/leds/status')
@@ -72,62 +134,162 @@ class Model(object):
         self.worker.setup()
 
     def get_all(self):
+        """
+        Returns a consistent, read-only view of all model data
+
+        The view is never modified afterwards. Publishers replace the
+        snapshot instead (copy-on-write), so readers can walk it without
+        holding the lock.
+        """
         with self.lock:
             return self.data
 
+    def snapshot(self):
+        """
+        Returns tuple (version, data) of the current model snapshot
+
+        version increases with every change to the model. Readers can use
+        it to skip work if nothing changed since their last call.
+        """
+        with self.lock:
+            return self.version, self.data
+
     def get(self, origin):
         with self.lock:
             if origin in self.data:
                 return self.data[origin]
 
+    def subscribe(self, origins, callback):
+        """
+        Registers callback for changes of the given origins
+
+        callback(origin, value) is invoked whenever a published value differs
+        from the previous one. value is None if the origin was removed.
+        Use origins=None to get notified about all origins.
+
+        Callbacks are executed in the context of the publishing thread, after
+        the model lock has been released. They must return quickly, i.e. only
+        signal an event or schedule work in the consumer's own context.
+
+        Returns a handle to be used with unsubscribe()
+        """
+        if origins is not None:
+            origins = frozenset(origins)
+        subscription = (origins, callback)
+
+        with self.lock:
+            # Copy on write, publishers iterate the list without lock
+            self.subscribers = self.subscribers + [subscription]
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s is not subscription]
+
     def publish(self, origin, value):
         """
         Report event (with data) to data model
 
-        Safe to be called from any thread
+        Safe to be called from any thread. The value is copied, the caller
+        is free to modify it afterwards. Subscribers are only notified if
+        the value has changed. Statistics see every published value, so a
+        value standing still is weighted by the time it stays. They are kept
+        outside of the snapshot, see get_statistics().
         """
         # logger.debug(f'get data from {origin}')
         # logger.debug(f'values {value}')
+        value = freeze(value)
+
+        # History sees every value, also unchanged ones. Store has its own lock.
+        self.timeseries.add(origin, value)
+
         with self.lock:
-            self.data[origin] = value
+            self.statistics.update(origin, value)
+            if origin in self.data and self.data[origin] == value:
+                return
+
+            data = dict(self.data)
+            data[origin] = value
+            self._commit(data)
+            subscribers = self.subscribers
+
+        if origin == 'things':
+            # LED writes are queued, don't block
+            if value['state'] == 'sending':
+                self.led_ind.yellow()
+            else:
+                self.led_ind.green()
 
-            if origin == 'things':
-                if value['state'] == 'sending':
-                    self.led_ind.yellow()
-                else:
-                    self.led_ind.green()
-            elif origin == 'modem':
-                if 'bearer-uptime' in value:
-                    self._watermark('bearer-uptime', value['bearer-uptime'])
+        self._notify(subscribers, [(origin, value)])
 
     def remove(self, origin):
         with self.lock:
-            self.data.pop(origin, None)
+            if origin not in self.data:
+                return
+
+            data = dict(self.data)
+            del data[origin]
+            self._commit(data)
+            subscribers = self.subscribers
+
+        self._notify(subscribers, [(origin, None)])
+
+    def reset_statistics(self, name=None):
+        """
+        Clears statistics of field name, or all statistics if name is None
+        """
+        with self.lock:
+            self.statistics.reset(name)
+            state = self.statistics.state()
+
+        self.statistics.save(state)
+
+    def get_statistics(self):
+        """
+        Returns statistics of model fields, indexed by field path
+
+        Not part of the snapshot, they change with every published value and
+        would change the snapshot version all the time.
+        """
+        with self.lock:
+            return self.statistics.info()
+
+    def save_statistics(self):
+        # File is written without holding the lock
+        with self.lock:
+            state = self.statistics.state()
 
-    def _watermark(self, topic, value):
-        if topic not in self.data['watermark']:
-            logger.info(f'creating watermark topic {topic}')
-            self.data['watermark'][topic] = None
+        self.statistics.save(state)
 
-        curr = self.data['watermark'][topic]
-        logger.debug(f'checking watermark {topic}, current = {curr}, new = {value}')
+    def _commit(self, data):
+        # Lock must be held by caller
+        self.data = FrozenDict(data)
+        self.version += 1
 
-        if curr is None or value > curr:
-            self.data['watermark'][topic] = value
-            logger.debug(f'new watermark for {topic} = {value}')
+    @staticmethod
+    def _notify(subscribers, changes):
+        for origins, callback in subscribers:
+            for origin, value in changes:
+                if origins is None or origin in origins:
+                    try:
+                        callback(origin, value)
+                    except Exception as e:
+                        logger.warning(f'subscriber for {origin} failed')
+                        logger.warning(e)
 
 
-class ModelWorker(threading.Thread):
+class ModelWorker(object):
     def __init__(self, model):
         super().__init__()
 
         self.model = model
         self.modem_setup_done = False
+        self.modem_identity = IdentityCache()
+        self.scheduler = PollScheduler()
 
     def setup(self):
         self.lock = threading.Lock()
-        self.daemon = True
-        self.name = 'model-worker'
 
         if SysInfoSensors.sensors_present():
             logger.info('using sensors based sysinfo module')
@@ -141,39 +303,32 @@ class ModelWorker(threading.Thread):
         else:
             self.broadr_phy = PhyInfo5('broadr0')
 
+        # Each source runs on its own schedule. A slow source, i.e. a hanging
+        # mmcli call, does not delay the other ones.
+        # Arguments: name, function, period, timeout, priority
+        sched = self.scheduler
+        sched.add('sysinfo', self._sysinfo, 1.0, 1.0, priority=2)
+        sched.add('network', self._network, 4.0, 1.0, priority=1)
+        sched.add('100base-t1', self._100base_t1, 4.0, 2.0, priority=1)
+        sched.add('modem', self._modem, 4.0, 15.0)
+        sched.add('disc', self._disc, 20.0, 10.0)
+        sched.add('poll-stats', self._poll_stats, 10.0, 1.0)
+        sched.add('statistics', self.model.save_statistics, 300.0, 5.0)
+
         if self.model.obd2_port and self.model.obd2_speed:
             self._obd2_setup(self.model.obd2_port, self.model.obd2_speed)
+            sched.add('obd2', self._obd2_poll, 1.0, 2.5, priority=2)
 
         self._traffic_mon_setup()
+        if self._vnstat:
+            sched.add('traffic', self._traffic, 20.0, 5.0)
 
-        self.start()
-
-    def run(self):
-        cnt = 0
-        while True:
-            self._sysinfo()
-
-            if cnt == 0 or cnt % 4 == 2:
-                self._network()
-
-            if cnt == 0 or cnt % 4 == 3:
-                self._100base_t1()
-
-            if cnt == 0 or cnt % 4 == 2:
-                self._modem()
-
-            if cnt == 0 or cnt % 20 == 15:
-                self._disc()
-
-            if self.model.obd2_port:
-                # if cnt == 0 or cnt % 2 == 1:
-                self._obd2_poll()
-
-            if cnt == 0 or cnt % 20 == 12:
-                self._traffic()
+        sched.start()
 
-            cnt += 1
-            time.sleep(1.0)
+    def _poll_stats(self):
+        self.model.publish('poll-stats', self.scheduler.stats())
+        self.model.publish('cmd-stats', CommandRunner.get().stats())
+        self.model.publish('timeseries', self.model.timeseries.stats())
 
     def _sysinfo(self):
         si = self.si
@@ -192,7 +347,8 @@ class ModelWorker(threading.Thread):
 
         dt = dict()
         dt['date'] = si.date()
-        dt['uptime'] = si.uptime()
+        dt['uptime-secs'] = si.uptime_secs()
+        dt['uptime'] = si.format_uptime(dt['uptime-secs'])
         self.model.publish('sys-datetime', dt)
 
         info = dict()
@@ -238,15 +394,15 @@ class ModelWorker(threading.Thread):
         info = dict()
         m = MM.modem()
         if m:
-            if not self.modem_setup_done:
+            # Setup again if modem id changes, i.e. after modem reset
+            if not self.modem_setup_done or m.id != self.modem_identity.modem_id:
                 self._modem_setup(m)
 
             info['modem-id'] = str(m.id)
             m_info = m.get_info()
 
-            info['vendor'] = m.vendor(m_info)
-            info['model'] = m.model(m_info)
-            info['revision'] = m.revision(m_info)
+            # Static information, only read when modem changes
+            info.update(self.modem_identity.modem(m, m_info))
 
             state = m.state(m_info)
             access_tech = m.access_tech(m_info)
@@ -296,14 +452,10 @@ class ModelWorker(threading.Thread):
             s = m.sim(m_info)
             if s:
                 info['sim-id'] = str(s.id)
-
-                s_info = s.get_info()
-                imsi = s.imsi(s_info)
-                info['sim-imsi'] = imsi
-                iccid = s.iccid(s_info)
-                info['sim-iccid'] = iccid
+                info.update(self.modem_identity.sim(s))
         else:
             self.modem_setup_done = False
+            self.modem_identity.clear()
 
         self.model.publish('modem', info)
 
@@ -340,7 +492,7 @@ class ModelWorker(threading.Thread):
 
         info = dict()
         info['state'] = state
-        info['quality'] = str(quality)
+        info['quality'] = quality
 
         self.model.publish('phy-broadr0', info)
 
@@ -0,0 +1,108 @@
+"""
+Deadband filter for telemetry values
+
+Suppresses values that did not change significantly since they were last
+reported. Each key has a rule with
+- abs: minimum absolute change to report
+- rel: minimum change relative to last reported value (0.05 = 5 %)
+- min_interval: minimum time between two reports (rate limit)
+- max_silence: value is reported after this time even if unchanged
+  (heartbeat)
+
+If neither abs nor rel is given, any change is reported. Non-numeric
+values are reported on any change.
+"""
+import time
+
+
+class Rule():
+    # Heartbeat if rule doesn't specify otherwise
+    MAX_SILENCE = 300.0
+
+    def __init__(self, abs=None, rel=None, min_interval=0.0, max_silence=MAX_SILENCE):
+        super().__init__()
+
+        self.abs = abs
+        self.rel = rel
+        self.min_interval = min_interval
+        self.max_silence = max_silence
+
+    def changed(self, value, last):
+        if value == last:
+            return False
+
+        numeric = isinstance(value, (int, float)) and isinstance(last, (int, float))
+        if not numeric or (self.abs is None and self.rel is None):
+            return True
+
+        diff = abs(value - last)
+        if self.abs is not None and diff >= self.abs:
+            return True
+        if self.rel is not None and diff >= self.rel * abs(last):
+            return True
+
+        return False
+
+
+class DeadbandFilter():
+    def __init__(self, rules=None, default=None):
+        """
+        rules: dictionary of Rule, indexed by key
+        default: Rule for keys without explicit rule
+        """
+        super().__init__()
+
+        self.rules = rules or dict()
+        self.default = default or Rule()
+
+        # key: (value, time) of last report
+        self._last = dict()
+
+        # Statistics
+        self.passed = 0
+        self.suppressed = 0
+
+    def filter(self, values, now=None):
+        """
+        Returns dictionary with values to report
+        """
+        if now is None:
+            now = time.monotonic()
+
+        res = dict()
+        for key, value in values.items():
+            if self._report(key, value, now):
+                res[key] = value
+                self._last[key] = (value, now)
+
+        self.passed += len(res)
+        self.suppressed += len(values) - len(res)
+
+        return res
+
+    def reset(self):
+        """
+        Forgets last reported values, next values are all reported
+        """
+        self._last.clear()
+
+    def stats(self):
+        return {
+            'passed': self.passed,
+            'suppressed': self.suppressed,
+        }
+
+    def _report(self, key, value, now):
+        if key not in self._last:
+            return True
+
+        rule = self.rules.get(key, self.default)
+        last, last_time = self._last[key]
+        elapsed = now - last_time
+
+        if elapsed >= rule.max_silence:
+            return True
+        if elapsed < rule.min_interval:
+            return False
+
+        return rule.changed(value, last)
@@ -0,0 +1,196 @@
+"""
+GNSS fix record and history
+
+GnssFix holds the state of one gpsd TPV report, completed with the
+satellite information of the latest SKY report. Records are not modified
+after creation, so they can be shared between threads.
+"""
+import calendar
+import threading
+import time
+from collections import deque
+
+
+def parse_gpsd_time(text):
+    """
+    Converts gpsd ISO 8601 time (2021-04-12T10:00:00.500Z) to seconds since
+    epoch, returns None if missing or invalid
+    """
+    if not text:
+        return None
+
+    try:
+        secs = calendar.timegm(time.strptime(text[:19], '%Y-%m-%dT%H:%M:%S'))
+        frac = text[19:].rstrip('Z')
+        return secs + float(frac) if frac else float(secs)
+    except ValueError:
+        return None
+
+
+class SkyInfo():
+    """
+    Satellite information from gpsd SKY report
+    """
+    __slots__ = ('pdop', 'sats_used', 'sats_visible')
+
+    def __init__(self, pdop=0.0, sats_used=None, sats_visible=None):
+        self.pdop = pdop
+        self.sats_used = sats_used
+        self.sats_visible = sats_visible
+
+    @classmethod
+    def from_report(cls, report, last=None):
+        """
+        Creates info from SKY report, members not in report are taken from
+        last info
+        """
+        last = last or cls()
+        sats_used = report.get('uSat')
+        sats_visible = report.get('nSat')
+        if sats_visible is None and 'satellites' in report:
+            # Older gpsd versions only list the satellites
+            sats = report['satellites']
+            sats_visible = len(sats)
+            sats_used = sum(1 for s in sats if s.get('used'))
+
+        return cls(report.get('pdop', last.pdop),
+                   sats_used if sats_used is not None else last.sats_used,
+                   sats_visible if sats_visible is not None else last.sats_visible)
+
+
+class GnssFix():
+    # Members compared to decide whether fix changed, time and received
+    # differ on every fix
+    VALUES = ('mode', 'status', 'lat', 'lon', 'alt', 'speed', 'track', 'climb', 'epx', 'epy', 'eph',
+              'pdop', 'sats_used', 'sats_visible')
+
+    __slots__ = ('time', 'received') + VALUES
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    @classmethod
+    def from_tpv(cls, report, sky=None, received=None, last=None):
+        """
+        Creates fix from TPV report
+
+        sky: latest SkyInfo
+        received: time the report was received, defaults to now
+        last: previous fix, provides speed if report has none
+        """
+        sky = sky or SkyInfo()
+        speed = report.get('speed', last.speed if last else 0.0)
+
+        return cls(time=parse_gpsd_time(report.get('time')),
+                   received=received if received is not None else time.time(),
+                   mode=report.get('mode', 0),
+                   status=report.get('status'),
+                   lat=report.get('lat'),
+                   lon=report.get('lon'),
+                   alt=report.get('altMSL', report.get('alt')),
+                   speed=speed,
+                   track=report.get('track'),
+                   climb=report.get('climb'),
+                   epx=report.get('epx'),
+                   epy=report.get('epy'),
+                   eph=report.get('eph'),
+                   pdop=sky.pdop,
+                   sats_used=sky.sats_used,
+                   sats_visible=sky.sats_visible)
+
+    @property
+    def fix(self):
+        """
+        Fix type as text
+        """
+        if self.mode == 2:
+            return '2D'
+        elif self.mode == 3:
+            return '3D DGPS' if self.status == 2 else '3D'
+        else:
+            return 'No Fix'
+
+    @property
+    def has_position(self):
+        return self.lat is not None and self.lon is not None
+
+    @property
+    def latency(self):
+        """
+        Seconds from gpsd time of fix until reception, None if unknown
+        """
+        if self.time is not None:
+            return self.received - self.time
+
+    def same_values(self, other):
+        """
+        True if other fix has same values, ignoring time
+        """
+        if other is None:
+            return False
+
+        return all(getattr(self, name) == getattr(other, name) for name in self.VALUES)
+
+    def to_dict(self):
+        latency = self.latency
+        return {
+            'fix': self.fix,
+            'lon': self.lon,
+            'lat': self.lat,
+            'alt': self.alt,
+            'speed': self.speed,
+            'track': self.track,
+            'climb': self.climb,
+            'epx': self.epx,
+            'epy': self.epy,
+            'eph': self.eph,
+            'pdop': self.pdop,
+            'sats-used': self.sats_used,
+            'sats-visible': self.sats_visible,
+            'time': self.time,
+            'latency': round(latency, 3) if latency is not None else None,
+        }
+
+
+class FixHistory():
+    """
+    Ring of the fixes received in the last <seconds>
+
+    Size is fixed, enough for a 10 Hz receiver. Thread safe.
+    """
+    SECONDS = 60.0
+    MAX_RATE = 10
+
+    def __init__(self, seconds=SECONDS, max_rate=MAX_RATE):
+        super().__init__()
+
+        self.seconds = seconds
+        self._fixes = deque(maxlen=int(seconds * max_rate))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fixes)
+
+    def add(self, fix):
+        with self._lock:
+            self._fixes.append(fix)
+
+            limit = fix.received - self.seconds
+            while self._fixes[0].received < limit:
+                self._fixes.popleft()
+
+    def last(self, seconds=None, now=None):
+        """
+        Returns list of fixes received in the last seconds, oldest first
+        """
+        if now is None:
+            now = time.time()
+
+        limit = now - (seconds if seconds is not None else self.seconds)
+        with self._lock:
+            return [f for f in self._fixes if f.received >= limit]
+
+    def clear(self):
+        with self._lock:
+            self._fixes.clear()
@@ -16,7 +16,7 @@ from ubxlib.ubx_esf_alg import UbxEsfAlgPoll
 from ubxlib.ubx_esf_status import UbxEsfStatusPoll
 from ubxlib.ubx_mon_ver import UbxMonVerPoll
 from ubxlib.ubx_upd_sos import UbxUpdSosAction
-from vcuui.gpsd import Gpsd
+from vcuui.gpsd import GpsdSession
 
 logger = logging.getLogger('vcu-ui')
 
@@ -344,30 +344,22 @@ class Gnss(threading.Thread):
             time.sleep(1.0)
 
     def _state_init(self):
-        logger.debug('trying to connect to gpsd')
+        logger.debug('waiting for data from gpsd')
 
-        gps = Gpsd()
+        # Liveness check on shared gpsd connection, wait until first data
+        # is seen
+        sub = GpsdSession.get().subscribe()
+        res = sub.next(timeout=10)
+        sub.close()
 
-        res = gps.setup()
         if res:
-            logger.info('gpsd connected')
-            # gpsd is around, socket exists
-            # wait until first data is seen
-            res = gps.next(timeout=10)
-            if res:
-                logger.info('gps connected')
-                self.state = 'setup'
-            else:
-                # No data incoming
-                logger.warning('no data from gpsd, is it running?')
-                time.sleep(3.0)
+            logger.info('gps connected')
+            self.state = 'setup'
         else:
-            logger.warning('cannot connect to gpsd, is it running?')
+            # No data incoming
+            logger.warning('no data from gpsd, is it running?')
             time.sleep(3.0)
 
-        gps.cleanup()
-        gps = None
-
     def _state_setup(self):
         # Trying to connect to ubxlib
         logger.debug('setting up gpsd library')
@@ -2,7 +2,8 @@ import logging
 import threading
 import time
 
-from vcuui.gpsd import Gpsd
+from vcuui.gnss_fix import FixHistory, GnssFix, SkyInfo
+from vcuui.gpsd import GpsdSession
 
 logger = logging.getLogger('vcu-ui')
 
@@ -11,6 +12,14 @@ class GnssPosition(threading.Thread):
     # Singleton accessor
     instance = None
 
+    # gpsd objects evaluated by _handle_report. Only the most recent object
+    # of each class is of interest, older ones are stale if processing lags.
+    GPSD_CLASSES = ('TPV', 'SKY')
+    GPSD_QUEUE_POLICY = 'latest'
+
+    # Publish gpsd receive statistics every 10 seconds
+    STATS_PERIOD = 10.0
+
     def __init__(self, model):
         super().__init__()
 
@@ -21,17 +30,24 @@ class GnssPosition(threading.Thread):
 
         self.state = 'init'
         self.gps = None
-        self.lon = 0
-        self.lat = 0
-        self.fix = 0
-        self.speed = 0
-        self.pdop = 0
+        self.sky = SkyInfo()
+        self.last_fix = None
+        self.published_fix = None
+        self.history = FixHistory()
+        self.stats_next = 0.0
 
     def setup(self):
         self.daemon = True
         self.name = 'gps-reader'
         self.start()
 
+    def track(self, seconds=None):
+        """
+        Returns fixes received in the last seconds as list of dicts, oldest
+        first. Unlike the published position it holds every fix.
+        """
+        return [dict(fix.to_dict(), received=fix.received) for fix in self.history.last(seconds)]
+
     def run(self):
         logger.info('running gps position thread')
 
@@ -49,75 +65,66 @@ class GnssPosition(threading.Thread):
                 time.sleep(0.8)
 
     def _state_init(self):
-        logger.debug('trying to connect to gpsd')
-
         if not self.gps:
-            self.gps = Gpsd()
+            self.gps = GpsdSession.get().subscribe(self.GPSD_CLASSES, policy=self.GPSD_QUEUE_POLICY)
 
-        res = self.gps.setup()
-        if res:
-            logger.info('gpsd connected')
+        # Session reconnects to gpsd by itself, just wait for data
+        report = self.gps.next()
+        if report:
+            logger.info('receiving data from gpsd')
+            self._process(report)
             self.state = 'connected'
         else:
-            logger.warning('cannot connect to gpsd, is it running?')
-            time.sleep(3.0)
+            logger.warning('no data from gpsd, is it running?')
 
     def _state_connected(self):
+        report = self.gps.next()
+        if report:
+            self._process(report)
+        else:
+            logger.warning('gpsd timeout, maybe connection is lost')
+            self.state = 'timeout'
+
+    def _state_timeout(self):
+        logger.warning('connection to gpsd lost')
+        self.model.remove('gnss-pos')
+        self.published_fix = None
+        self.state = 'init'
+
+    def _process(self, report):
         try:
-            report = self.gps.next()
-            if report:
-                self._handle_report(report)
-            else:
-                logger.warning('gpsd timeout, maybe connection is lost')
-                self.state = 'timeout'
+            self._handle_report(report)
+            self._publish_stats()
         except KeyError as e:
             # For whatever reasons getting GPS data from gps daemon is unstable.
             # Have to handle KeyErrors in order to keep system running.
             logger.warning('gps module KeyError')
             logger.warning(e)
 
-    def _state_timeout(self):
-        logger.warning('connection to gpsd lost')
-        self.model.remove('gnss-pos')
-
-        self.gps.cleanup()
-        self.gps = None
-        self.state = 'init'
+    def _publish_stats(self):
+        now = time.monotonic()
+        if now >= self.stats_next:
+            self.stats_next = now + self.STATS_PERIOD
+            info = self.gps.session.stats()
+            info['queue'] = self.gps.stats()
+            self.model.publish('gpsd', info)
 
     def _handle_report(self, report):
         if report['class'] == 'SKY':
-            # Remember PDOP only, will be sent on next TPV message
-            if 'pdop' in report:
-                self.pdop = report['pdop']
-
-        if report['class'] == 'TPV':
-            fix = report['mode']
-            if fix == 0 or fix == 1:
-                self.fix = 'No Fix'
-            elif fix == 2:
-                self.fix = '2D'
-            elif fix == 3:
-                self.fix = '3D'
-
-            if 'status' in report:
-                status = report['status']
-                if status == 2 and self.fix == '3D':
-                    self.fix = '3D DGPS'
-
-            if 'speed' in report:
-                self.speed = report['speed']
-
-            # Ensure we have lon/lat in report
-            # only update when present, to avoid 0/0 position messages
-            if 'lon' in report and 'lat' in report:
-                self.lon = report['lon']
-                self.lat = report['lat']
-
-                pos = dict()
-                pos['fix'] = self.fix
-                pos['lon'] = self.lon
-                pos['lat'] = self.lat
-                pos['speed'] = self.speed
-                pos['pdop'] = self.pdop
-
-                self.model.publish('gnss-pos', pos)
+            # Remember satellite info only, will be sent on next TPV message
+            self.sky = SkyInfo.from_report(report, self.sky)
+
+        elif report['class'] == 'TPV':
+            fix = GnssFix.from_tpv(report, self.sky, last=self.last_fix)
+
+            # Only use fixes with lon/lat to avoid 0/0 position messages
+            if fix.has_position:
+                self.last_fix = fix
+                self.history.add(fix)
+
+                # Model drops unchanged values, but the time differs on every
+                # fix. Don't publish (and wake up subscribers) if only the
+                # time changed.
+                if not fix.same_values(self.published_fix):
+                    self.published_fix = fix
+                    self.model.publish('gnss-pos', fix.to_dict())
@@ -1,104 +1,446 @@
 """
 gpsd wrapper
 
-runs thread to receive JSON data from gpsd and store in queue
-use .next() to get gpsd message
+One shared session (GpsdSession.get()) owns the connection to gpsd and
+its receive thread. Users subscribe to the object classes they need and
+get their own queue, use .next() of the subscription to get gpsd messages.
+The session reconnects by itself if gpsd restarts, subscriptions stay
+valid.
+
+gpsd sends one JSON object per line. Lines may be split across or combined
+in socket reads, they are reassembled before decoding. Objects of classes
+no subscriber is interested in are dropped before they are decoded.
+Each object is decoded once and the same dict is passed to all
+subscribers, it must not be modified.
+
+Queue policies, when the consumer is slower than gpsd
+- fifo: objects are kept in order, oldest objects are dropped when the
+  queue is full
+- latest: only the most recent object of each class is kept
+- conflate: like latest, but a newer object is merged into the kept one,
+  members missing in the newer object keep their previous value
 """
-import json  # or `import simplejson as json` if on Python < 2.6
+import json
 import logging
 import queue
 import socket
 import threading
+import time
+from collections import OrderedDict, deque
 
 logger = logging.getLogger('vcu-ui')
 
 
-class Gpsd(threading.Thread):
-    GPSD_DATA_SOCKET = ('127.0.0.1', 2947)
+class LineBuffer():
+    """
+    Reassembles newline terminated lines from a byte stream
+    """
+    # gpsd objects are a few kB at most (SKY with many satellites). Longer
+    # lines indicate garbage and are dropped to bound memory.
+    MAX_LINE_LENGTH = 64 * 1024
 
-    def __init__(self):
+    def __init__(self, max_line_length=MAX_LINE_LENGTH):
         super().__init__()
 
-        self.connect_msg = '?WATCH={"enable":true,"json":true}'.encode()
-        self.response_queue = queue.Queue()
-        self.thread_ready_event = threading.Event()
-        self.thread_stop_event = threading.Event()
-        self.daemon = True
+        self.max_line_length = max_line_length
+        self._buffer = bytearray()
+        self._discard = False
 
-    def setup(self):
-        try:
-            logger.info('connecting to gpsd')
-            self.listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.listen_sock.connect(self.GPSD_DATA_SOCKET)
+        # Statistics
+        self.overflows = 0
+
+    def feed(self, data):
+        """
+        Adds received data, returns list of complete lines without line end
+        """
+        self._buffer += data
+        lines = self._buffer.split(b'\n')
 
-            # Start worker thread in daemon mode, will invoke run() method
-            self.start()
+        # Last element is incomplete line, or empty if data ended with \n
+        self._buffer = bytearray(lines.pop())
+        if self._discard and lines:
+            # End of over-long line found, skip its remainder
+            lines.pop(0)
+            self._discard = False
 
-            # Wait for worker thread to become ready.
-            # Without this wait we might send the command before the thread can
-            # handle the response.
-            logger.debug('waiting for receive thread to become active')
-            self.thread_ready_event.wait()
-            return True
+        if len(self._buffer) > self.max_line_length:
+            self.overflows += 1
+            self._buffer.clear()
+            self._discard = True
 
-        except socket.error as msg:
-            logger.warning(msg)
-            return False
+        return [bytes(line.rstrip(b'\r')) for line in lines if line.strip()]
 
-    def cleanup(self):
-        if self.is_alive():
-            logger.debug('requesting thread to stop')
-            self.thread_stop_event.set()
+    def clear(self):
+        self._buffer.clear()
+        self._discard = False
+
+
+class ReportQueue():
+    """
+    Thread safe queue for gpsd objects with selectable policy
+
+    get() and empty() behave like queue.Queue, so it can replace it.
+    """
+    POLICIES = ('fifo', 'latest', 'conflate')
+
+    def __init__(self, policy='fifo', maxsize=200):
+        super().__init__()
+
+        assert policy in self.POLICIES
+        assert maxsize >= 1
+        self.policy = policy
+        self.maxsize = maxsize
+        self._cond = threading.Condition()
+
+        # fifo: deque of objects, latest/conflate: objects by class
+        self._fifo = deque()
+        self._latest = OrderedDict()
+
+        # Statistics
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, obj):
+        with self._cond:
+            self.enqueued += 1
+            if self.policy == 'fifo':
+                if len(self._fifo) == self.maxsize:
+                    self._fifo.popleft()
+                    self.dropped += 1
+                self._fifo.append(obj)
+            else:
+                self._put_latest(obj)
+
+            self.max_depth = max(self.max_depth, self._depth())
+            self._cond.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        Returns oldest object, raises queue.Empty if none is available
+        within timeout
+        """
+        with self._cond:
+            if block and not self._cond.wait_for(self._depth, timeout):
+                raise queue.Empty
+            if self._fifo:
+                return self._fifo.popleft()
+            if self._latest:
+                return self._latest.popitem(last=False)[1]
+            raise queue.Empty
 
-            # Wait until thread ended
-            self.join(timeout=1.0)
-            logger.debug('thread stopped')
+    def get_nowait(self):
+        return self.get(False)
 
-            # Close socket
-            self.listen_sock.close()
-            self.listen_sock = None
+    def empty(self):
+        return self.qsize() == 0
+
+    def qsize(self):
+        with self._cond:
+            return self._depth()
+
+    def clear(self):
+        with self._cond:
+            self._fifo.clear()
+            self._latest.clear()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'policy': self.policy,
+                'depth': self._depth(),
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'max-depth': self.max_depth,
+            }
+
+    def _depth(self):
+        # Lock must be held by caller
+        return len(self._fifo) + len(self._latest)
+
+    def _put_latest(self, obj):
+        # Lock must be held by caller
+        key = obj.get('class')
+        old = self._latest.pop(key, None)
+        if old is not None:
+            self.dropped += 1
+            if self.policy == 'conflate':
+                obj = {**old, **obj}
+        elif len(self._latest) == self.maxsize:
+            self._latest.popitem(last=False)
+            self.dropped += 1
+
+        # Re-inserted at the end, objects are delivered in order of their
+        # most recent update
+        self._latest[key] = obj
+
+
+class Subscription():
+    """
+    Receives gpsd objects of selected classes from a GpsdSession
+    """
+    def __init__(self, session, classes, policy, max_queue_size):
+        super().__init__()
+
+        self.session = session
+        self.classes = set(classes) if classes else None
+        self.queue = ReportQueue(policy, max_queue_size)
+
+    def wants(self, cls):
+        return self.classes is None or cls in self.classes
 
     def next(self, timeout=5.0):
-        # logger.debug(f'waiting {timeout}s for reponse from listener thread')
+        """
+        Returns next gpsd object, or None if nothing arrives within timeout
+        """
         try:
-            response = self.response_queue.get(True, timeout)
-            # logger.debug(f'got response {response}')
-            return response
+            return self.queue.get(True, timeout)
         except queue.Empty:
-            logger.warning('timeout...')
+            return None
+
+    def stats(self):
+        return self.queue.stats()
+
+    def close(self):
+        self.session.unsubscribe(self)
+
+
+class GpsdSession(threading.Thread):
+    # Singleton accessor
+    instance = None
+    _instance_lock = threading.Lock()
+
+    GPSD_DATA_SOCKET = ('127.0.0.1', 2947)
+
+    # Queue limit per subscriber, at 10 Hz this holds 10 seconds of TPV and
+    # SKY objects
+    MAX_QUEUE_SIZE = 200
+
+    # Objects start with the class, i.e. {"class":"TPV",...
+    CLASS_PREFIX = b'{"class":"'
+
+    # Reconnect if gpsd is silent for this time, i.e. hangs or lost device
+    SILENCE_TIMEOUT = 10.0
+
+    # Delay before reconnect, doubles while gpsd can't be reached
+    RECONNECT_DELAY = 1.0
+    MAX_RECONNECT_DELAY = 30.0
+
+    @staticmethod
+    def get():
+        """
+        Returns shared session, creates and starts it on first use
+        """
+        with GpsdSession._instance_lock:
+            if GpsdSession.instance is None:
+                session = GpsdSession()
+                session.setup()
+                GpsdSession.instance = session
+
+            return GpsdSession.instance
+
+    def __init__(self, address=GPSD_DATA_SOCKET):
+        super().__init__()
+
+        self.address = address
+        self.connect_msg = '?WATCH={"enable":true,"json":true}'.encode()
+        self.line_buffer = LineBuffer()
+        self.state = 'disconnected'
+
+        self._lock = threading.Lock()
+        self._subscribers = tuple()
+        self._classes = None
+        self._sock = None
+        self._last_report = None
+        self._wakeup = threading.Event()
+        self._stop_requested = False
+
+        # Statistics
+        self.connects = 0
+        self.received = 0
+        self.filtered = 0
+        self.decode_errors = 0
+
+    def setup(self):
+        self.daemon = True
+        self.name = 'gpsd-session'
+        self.start()
+
+    def stop(self):
+        self._stop_requested = True
+        self._wakeup.set()
+
+    def subscribe(self, classes=None, policy='fifo', max_queue_size=MAX_QUEUE_SIZE):
+        """
+        Creates subscription
+
+        classes: gpsd object classes to receive (i.e. 'TPV', 'SKY'), all
+            classes if None
+        policy: queue policy, see module description
+        max_queue_size: queue limit
+        """
+        sub = Subscription(self, classes, policy, max_queue_size)
+        with self._lock:
+            self._subscribers += (sub,)
+            self._update_classes()
+
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not sub)
+            self._update_classes()
+
+    @property
+    def connected(self):
+        return self.state == 'connected'
+
+    def report_age(self):
+        """
+        Returns seconds since last object from gpsd, None if none received
+        on current connection
+        """
+        last = self._last_report
+        if last is not None:
+            return time.monotonic() - last
+
+    def healthy(self, max_age=5.0):
+        """
+        True if connected and gpsd sent data recently
+        """
+        age = self.report_age()
+        return self.connected and age is not None and age <= max_age
+
+    def stats(self):
+        age = self.report_age()
+        return {
+            'state': self.state,
+            'connects': self.connects,
+            'subscribers': len(self._subscribers),
+            'report-age': round(age, 1) if age is not None else None,
+            'received': self.received,
+            'filtered': self.filtered,
+            'decode-errors': self.decode_errors,
+            'line-overflows': self.line_buffer.overflows,
+        }
 
     def run(self):
         """
         Thread running method
 
-        - receives raw data from gpsd
-        - parses ubx frames, decodes them
-        - if a frame is received it is put in the receive queue
+        - connects to gpsd and enables JSON watch mode
+        - receives raw data and hands decoded objects to subscribers
+        - reconnects with growing delay if connection fails or gpsd is silent
         """
+        delay = self.RECONNECT_DELAY
+        while not self._stop_requested:
+            if self._connect():
+                self._receive_loop()
+                if self._last_report is not None:
+                    # Connection worked, next attempt right away
+                    delay = self.RECONNECT_DELAY
+                self._disconnect()
+
+            if self._stop_requested:
+                break
+
+            self._wakeup.wait(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+        logger.debug('gpsd session done')
+
+    def _connect(self):
         try:
-            logger.debug('starting raw listener on gpsd')
-            self.listen_sock.send(self.connect_msg)
-            self.listen_sock.settimeout(0.25)
-
-            logger.debug('receiver ready')
-            self.thread_ready_event.set()
-
-            while not self.thread_stop_event.is_set():
-                try:
-                    data = self.listen_sock.recv(8192)
-                    if data:
-                        try:
-                            json_strings = data.decode()
-                            for s in json_strings.splitlines():
-                                obj = json.loads(s)     # obj = dict of json
-                                self.response_queue.put(obj)
-                        except json.JSONDecodeError:
-                            logger.warning('could not decode JSON data from gpsd, discarding')
-
-                except socket.timeout:
-                    pass
-
-        except socket.error as msg:
-            logger.error(msg)
-
-        logger.debug('receiver done')
+            logger.info('connecting to gpsd')
+            self.state = 'connecting'
+            self._sock = socket.create_connection(self.address, timeout=1.0)
+            self._sock.sendall(self.connect_msg)
+            self._sock.settimeout(0.25)
+        except OSError as msg:
+            logger.warning(f'cannot connect to gpsd: {msg}')
+            self._disconnect()
+            return False
+
+        self.line_buffer.clear()
+        self._last_report = None
+        self.connects += 1
+        self.state = 'connected'
+        logger.info('gpsd connected')
+        return True
+
+    def _disconnect(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+        self._last_report = None
+        self.state = 'disconnected'
+
+    def _receive_loop(self):
+        start = time.monotonic()
+        while not self._stop_requested:
+            try:
+                data = self._sock.recv(8192)
+                if not data:
+                    logger.warning('gpsd closed connection')
+                    return
+
+                self._receive(data)
+
+            except socket.timeout:
+                pass
+            except OSError as msg:
+                logger.warning(f'gpsd connection failed: {msg}')
+                return
+
+            last = self._last_report or start
+            if time.monotonic() - last > self.SILENCE_TIMEOUT:
+                logger.warning('no data from gpsd, reconnecting')
+                return
+
+    def _receive(self, data):
+        for line in self.line_buffer.feed(data):
+            self._last_report = time.monotonic()
+            self.received += 1
+            if not self._wanted(line):
+                self.filtered += 1
+                continue
+
+            try:
+                obj = json.loads(line)     # obj = dict of json
+            except ValueError:
+                self.decode_errors += 1
+                logger.warning('could not decode JSON data from gpsd, discarding')
+                continue
+
+            cls = obj.get('class')
+            for sub in self._subscribers:
+                if sub.wants(cls):
+                    sub.queue.put(obj)
+
+    def _wanted(self, line):
+        """
+        Checks class of object without decoding it
+
+        Lines not starting with the class member are decoded anyway, so
+        nothing is lost if gpsd changes its member order.
+        """
+        classes = self._classes
+        if classes is None or not line.startswith(self.CLASS_PREFIX):
+            return True
+
+        start = len(self.CLASS_PREFIX)
+        end = line.find(b'"', start)
+        return line[start:end] in classes
+
+    def _update_classes(self):
+        # Lock must be held by caller. Union of subscribed classes, None if
+        # any subscriber wants all
+        classes = set()
+        for sub in self._subscribers:
+            if sub.classes is None:
+                self._classes = None
+                return
+            classes.update(c.encode() for c in sub.classes)
+
+        self._classes = classes
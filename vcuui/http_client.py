@@ -0,0 +1,134 @@
+"""
+Persistent HTTP(S) client for uploads
+
+Reuses one curl handle for all requests. libcurl keeps the connection
+alive between requests and caches DNS results and TLS sessions per handle,
+so subsequent uploads skip DNS lookup, TCP and TLS handshake.
+
+On any transport error the handle is discarded and a fresh one is created
+for the next request.
+"""
+import logging
+from io import BytesIO
+
+import pycurl
+
+logger = logging.getLogger('vcu-ui')
+
+# SIZE_UPLOAD is deprecated in newer libcurl versions
+SIZE_UPLOAD = getattr(pycurl, 'SIZE_UPLOAD_T', pycurl.SIZE_UPLOAD)
+
+
+class HttpResponse():
+    def __init__(self, code, body, timings):
+        super().__init__()
+
+        self.code = code
+        self.body = body
+        self.timings = timings
+
+
+class HttpClient():
+    CONNECT_TIMEOUT_MS = 3000
+    TIMEOUT_MS = 4000
+
+    # Keep resolved server address for 10 minutes
+    DNS_CACHE_TIMEOUT = 600
+
+    # TCP keep-alive probes to detect dead connections, i.e. after
+    # cell change or NAT timeout
+    KEEPALIVE_IDLE = 60
+    KEEPALIVE_INTERVAL = 30
+
+    def __init__(self, connect_timeout_ms=CONNECT_TIMEOUT_MS, timeout_ms=TIMEOUT_MS):
+        super().__init__()
+
+        self.connect_timeout_ms = connect_timeout_ms
+        self.timeout_ms = timeout_ms
+        self._curl = None
+
+        # Statistics
+        self.requests = 0
+        self.connects = 0
+        self.errors = 0
+
+    def post(self, url, body, headers=None):
+        """
+        Sends body (bytes) with POST request to url
+
+        Returns HttpResponse with HTTP code, response body and timings.
+        Raises pycurl.error on transport errors.
+        """
+        c = self._handle()
+        response = BytesIO()
+
+        c.setopt(pycurl.URL, url)
+        c.setopt(pycurl.HTTPHEADER, headers or [])
+        c.setopt(pycurl.POSTFIELDS, body)
+        c.setopt(pycurl.WRITEDATA, response)
+
+        self.requests += 1
+        try:
+            c.perform()
+        except pycurl.error:
+            self.errors += 1
+            self.close()
+            raise
+
+        code = int(c.getinfo(pycurl.RESPONSE_CODE))
+        timings = self._timings(c)
+        self.connects += timings['new-connections']
+
+        return HttpResponse(code, response.getvalue(), timings)
+
+    def close(self):
+        if self._curl:
+            self._curl.close()
+            self._curl = None
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'connects': self.connects,
+            'errors': self.errors,
+        }
+
+    def _handle(self):
+        if self._curl is None:
+            c = pycurl.Curl()
+            c.setopt(pycurl.CONNECTTIMEOUT_MS, self.connect_timeout_ms)
+            c.setopt(pycurl.TIMEOUT_MS, self.timeout_ms)
+            c.setopt(pycurl.DNS_CACHE_TIMEOUT, self.DNS_CACHE_TIMEOUT)
+            c.setopt(pycurl.SSL_SESSIONID_CACHE, 1)
+            c.setopt(pycurl.TCP_KEEPALIVE, 1)
+            c.setopt(pycurl.TCP_KEEPIDLE, self.KEEPALIVE_IDLE)
+            c.setopt(pycurl.TCP_KEEPINTVL, self.KEEPALIVE_INTERVAL)
+            c.setopt(pycurl.NOSIGNAL, 1)
+            # c.setopt(c.VERBOSE, True)
+            self._curl = c
+
+        return self._curl
+
+    @staticmethod
+    def _timings(c):
+        """
+        Returns timing of last request in seconds
+
+        Phases are relative to each other, not to start of request. dns,
+        connect and tls are 0 if an existing connection was reused.
+        """
+        dns = c.getinfo(pycurl.NAMELOOKUP_TIME)
+        connect = c.getinfo(pycurl.CONNECT_TIME)
+        tls = c.getinfo(pycurl.APPCONNECT_TIME)
+        pretransfer = c.getinfo(pycurl.PRETRANSFER_TIME)
+        total = c.getinfo(pycurl.TOTAL_TIME)
+
+        return {
+            'dns': round(dns, 4),
+            'connect': round(max(0.0, connect - dns), 4),
+            'tls': round(max(0.0, tls - connect), 4) if tls else 0.0,
+            'transfer': round(max(0.0, total - pretransfer), 4),
+            'total': round(total, 4),
+            'new-connections': int(c.getinfo(pycurl.NUM_CONNECTS)),
+            'bytes-up': int(c.getinfo(SIZE_UPLOAD)),
+        }
@@ -1,28 +1,199 @@
+"""
+LED control
+
+LED state changes are only recorded by the caller and written to sysfs by
+a background thread (LedWriter). Callers never block on file I/O. Repeated
+requests for the same state are dropped unless writing it failed, several
+changes before the writer runs are coalesced into the last one.
+
+Blink patterns are timed by the writer thread, callers only request the
+pattern once.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('vcu-ui')
+
+
+class LedWriter(threading.Thread):
+    # Singleton accessor, see get()
+    instance = None
+    _instance_lock = threading.Lock()
+
+    @staticmethod
+    def get():
+        """
+        Returns shared writer, starts it on first use
+        """
+        with LedWriter._instance_lock:
+            if LedWriter.instance is None:
+                writer = LedWriter()
+                writer.start()
+                LedWriter.instance = writer
+
+            return LedWriter.instance
+
+    def __init__(self):
+        super().__init__()
+
+        self.daemon = True
+        self.name = 'led-writer'
+
+        self._cond = threading.Condition()
+        self._pending = dict()
+        self._blinking = dict()
+        self._busy = False
+
+    def set(self, led, state):
+        with self._cond:
+            self._blinking.pop(led, None)
+            if led.state == state:
+                return
+
+            led.state = state
+            self._pending[led] = state
+            self._cond.notify()
+
+    def blink(self, led, on, off, interval):
+        with self._cond:
+            pattern = (on, off, interval)
+            if led in self._blinking and self._blinking[led][0] == pattern:
+                return
+
+            # Start with on phase right away
+            led.state = None
+            self._blinking[led] = (pattern, True, time.monotonic())
+            self._cond.notify()
+
+    def flush(self, timeout=1.0):
+        """
+        Waits until all requested changes are written
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+                while True:
+                    now = time.monotonic()
+                    self._toggle_blinking(now)
+                    if self._pending:
+                        break
+
+                    self._cond.wait(self._next_toggle(now))
+
+                writes = self._pending
+                self._pending = dict()
+                self._busy = True
+
+            # Write outside of lock, callers can queue new changes meanwhile
+            failed = [(led, state) for led, state in writes.items() if not led._write(state)]
+
+            # Forget state of failed writes, so the next request retries
+            if failed:
+                with self._cond:
+                    for led, state in failed:
+                        if led.state == state:
+                            led.state = None
+
+    def _toggle_blinking(self, now):
+        # Lock must be held by caller
+        for led, (pattern, phase_on, deadline) in self._blinking.items():
+            if deadline <= now:
+                on, off, interval = pattern
+                self._pending[led] = on if phase_on else off
+                # Don't try to catch up if writer was delayed
+                self._blinking[led] = (pattern, not phase_on, max(deadline + interval, now))
+
+    def _next_toggle(self, now):
+        # Lock must be held by caller
+        if self._blinking:
+            return max(0.0, min(b[2] for b in self._blinking.values()) - now)
+
 
 class LED_BiColor():
-    def __init__(self, path):
+    OFF = (False, False)
+    RED = (True, False)
+    YELLOW = (True, True)
+    GREEN = (False, True)
+
+    def __init__(self, path, writer=None):
         super().__init__()
         self._green_path = path + ':green/brightness'
         self._red_path = path + ':red/brightness'
 
+        # Last requested steady state, None while blinking
+        self.state = None
+
+        # Owned by writer thread
+        self._fds = dict()
+        self._written = dict()
+        self._failed = False
+
+        self.writer = writer or LedWriter.get()
+
     def off(self):
-        self._set(False, False)
+        self._set(*self.OFF)
 
     def red(self):
-        self._set(True, False)
+        self._set(*self.RED)
 
     def yellow(self):
-        self._set(True, True)
+        self._set(*self.YELLOW)
 
     def green(self):
-        self._set(False, True)
+        self._set(*self.GREEN)
+
+    def blink(self, on=YELLOW, off=OFF, interval=0.5):
+        """
+        Toggles between on and off state every interval seconds
+
+        Any steady state request (e.g. green()) stops blinking.
+        """
+        self.writer.blink(self, on, off, interval)
 
     def _set(self, red, green):
-        red_str = '1' if red else '0'
-        green_str = '1' if green else '0'
+        self.writer.set(self, (red, green))
+
+    def _write(self, state):
+        """
+        Writes state to sysfs, returns False if that failed
+        """
+        red, green = state
+        try:
+            self._write_file(self._red_path, red)
+            self._write_file(self._green_path, green)
+            self._failed = False
+            return True
+        except OSError as e:
+            # Report only once, LEDs don't exist on all devices
+            if not self._failed:
+                logger.warning(f'cannot set LED {self._red_path}')
+                logger.warning(e)
+                self._failed = True
+            return False
+
+    def _write_file(self, path, value):
+        if self._written.get(path) == value:
+            return
 
-        with open(self._red_path, 'w+') as f:
-            f.write(red_str)
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_WRONLY | os.O_CLOEXEC)
+            self._fds[path] = fd
 
-        with open(self._green_path, 'w+') as f:
-            f.write(green_str)
+        try:
+            os.pwrite(fd, b'1' if value else b'0', 0)
+            self._written[path] = value
+        except OSError:
+            # Reopen next time
+            os.close(fd)
+            del self._fds[path]
+            self._written.pop(path, None)
+            raise
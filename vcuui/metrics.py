@@ -0,0 +1,201 @@
+"""
+OpenMetrics (Prometheus) exporter for the data model
+
+The registry subscribes to the model and converts published values to
+metric samples right away. Each metric family keeps its rendered text. A
+scrape returns the cached exposition, it is only joined again from the
+family texts after a change.
+
+Metrics are declared in METRICS as
+(origin, path in value, family name, type, help, labels)
+"""
+import math
+import threading
+
+from vcuui._version import __version__ as ui_version
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class Metric():
+    def __init__(self, origin, path, family, mtype, help, labels=None):
+        super().__init__()
+
+        self.origin = origin
+        self.keys = path.split('.')
+        self.family = family
+        self.type = mtype
+        self.help = help
+        self.labels = labels or dict()
+
+        # OpenMetrics counter samples have a _total suffix
+        name = f'{family}_total' if mtype == 'counter' else family
+        if self.labels:
+            text = ','.join(f'{k}="{v}"' for k, v in sorted(self.labels.items()))
+            name += f'{{{text}}}'
+        self.sample = name
+
+    def value(self, data):
+        for key in self.keys:
+            try:
+                data = data[int(key) if isinstance(data, (list, tuple)) else key]
+            except (KeyError, IndexError, TypeError, ValueError):
+                return None
+
+        return _number(data)
+
+
+def _number(data):
+    if isinstance(data, bool):
+        return int(data)
+    if isinstance(data, (int, float)) and math.isfinite(data):
+        return data
+    return None
+
+
+def _net(name):
+    return [
+        Metric(f'net-{name}', 'bytes.0', 'vcu_network_receive_bytes', 'counter', 'Bytes received',
+               {'interface': name}),
+        Metric(f'net-{name}', 'bytes.1', 'vcu_network_transmit_bytes', 'counter', 'Bytes transmitted',
+               {'interface': name}),
+    ]
+
+
+METRICS = [
+    # System
+    Metric('sys-misc', 'temp', 'vcu_temperature_celsius', 'gauge', 'Temperature', {'sensor': 'cpu'}),
+    Metric('sys-misc', 'temp_lm75', 'vcu_temperature_celsius', 'gauge', 'Temperature', {'sensor': 'lm75'}),
+    Metric('sys-misc', 'v_in', 'vcu_input_voltage_volts', 'gauge', 'Input voltage'),
+    Metric('sys-misc', 'v_rtc', 'vcu_rtc_voltage_volts', 'gauge', 'RTC battery voltage'),
+    Metric('sys-misc', 'load.0', 'vcu_load1', 'gauge', 'System load, 1 minute average'),
+    Metric('sys-misc', 'mem.0', 'vcu_memory_total_kilobytes', 'gauge', 'Total memory'),
+    Metric('sys-misc', 'mem.1', 'vcu_memory_free_kilobytes', 'gauge', 'Free memory'),
+    Metric('sys-datetime', 'uptime-secs', 'vcu_uptime_seconds', 'gauge', 'System uptime'),
+    Metric('sys-disc', 'wear.0', 'vcu_emmc_wear_percent', 'gauge', 'eMMC wear level', {'type': 'slc'}),
+    Metric('sys-disc', 'wear.1', 'vcu_emmc_wear_percent', 'gauge', 'eMMC wear level', {'type': 'mlc'}),
+    Metric('sys-disc', 'part_data.free', 'vcu_partition_free_bytes', 'gauge', 'Free space', {'partition': 'data'}),
+    Metric('sys-disc', 'part_sysroot.free', 'vcu_partition_free_bytes', 'gauge', 'Free space',
+           {'partition': 'sysroot'}),
+
+    # Modem and link
+    Metric('modem', 'signal-quality', 'vcu_modem_signal_quality_percent', 'gauge', 'Signal quality',
+           {'source': 'modemmanager'}),
+    Metric('modem', 'signal-quality2', 'vcu_modem_signal_quality_percent', 'gauge', 'Signal quality',
+           {'source': 'lte'}),
+    Metric('modem', 'signal-lte.rsrp', 'vcu_modem_rsrp_dbm', 'gauge', 'LTE reference signal received power'),
+    Metric('modem', 'signal-lte.rsrq', 'vcu_modem_rsrq_db', 'gauge', 'LTE reference signal received quality'),
+    Metric('modem', 'signal-lte.snr', 'vcu_modem_snr_db', 'gauge', 'LTE signal to noise ratio'),
+    Metric('modem', 'bearer-uptime', 'vcu_bearer_uptime_seconds', 'gauge', 'Mobile data connection uptime'),
+    Metric('link', 'delay', 'vcu_link_delay_seconds', 'gauge', 'Ping round trip time, 0 if ping failed'),
+    *_net('wwan0'),
+    *_net('wlan0'),
+    Metric('traffic-wwan0', 'day_rx', 'vcu_traffic_day_receive_bytes', 'gauge', 'Bytes received today'),
+    Metric('traffic-wwan0', 'day_tx', 'vcu_traffic_day_transmit_bytes', 'gauge', 'Bytes transmitted today'),
+    Metric('traffic-wwan0', 'month_rx', 'vcu_traffic_month_receive_bytes', 'gauge', 'Bytes received this month'),
+    Metric('traffic-wwan0', 'month_tx', 'vcu_traffic_month_transmit_bytes', 'gauge', 'Bytes transmitted this month'),
+
+    # GNSS
+    Metric('gnss-pos', 'lat', 'vcu_gnss_latitude_degrees', 'gauge', 'Latitude'),
+    Metric('gnss-pos', 'lon', 'vcu_gnss_longitude_degrees', 'gauge', 'Longitude'),
+    Metric('gnss-pos', 'alt', 'vcu_gnss_altitude_meters', 'gauge', 'Altitude above mean sea level'),
+    Metric('gnss-pos', 'speed', 'vcu_gnss_speed_meters_per_second', 'gauge', 'Speed over ground'),
+    Metric('gnss-pos', 'pdop', 'vcu_gnss_pdop', 'gauge', 'Position dilution of precision'),
+    Metric('gnss-pos', 'eph', 'vcu_gnss_horizontal_error_meters', 'gauge', 'Estimated horizontal error'),
+    Metric('gnss-pos', 'sats-used', 'vcu_gnss_satellites', 'gauge', 'Satellites', {'state': 'used'}),
+    Metric('gnss-pos', 'sats-visible', 'vcu_gnss_satellites', 'gauge', 'Satellites', {'state': 'visible'}),
+    Metric('gnss-pos', 'latency', 'vcu_gnss_latency_seconds', 'gauge', 'Time from fix to reception'),
+
+    # OBD-II
+    Metric('obd2', 'speed', 'vcu_obd2_speed_kmh', 'gauge', 'Vehicle speed'),
+    Metric('obd2', 'coolant-temp', 'vcu_obd2_coolant_temperature_celsius', 'gauge', 'Engine coolant temperature'),
+
+    # Cloud upload
+    Metric('things-upload', 'queue.entries', 'vcu_upload_queue_entries', 'gauge', 'Telemetry entries waiting for upload'),
+    Metric('things-upload', 'queue.dropped', 'vcu_upload_queue_dropped', 'counter', 'Telemetry entries lost'),
+    Metric('things-upload', 'successes', 'vcu_uploads', 'counter', 'Uploads', {'result': 'success'}),
+    Metric('things-upload', 'failures', 'vcu_uploads', 'counter', 'Uploads', {'result': 'failure'}),
+    Metric('things-upload', 'period', 'vcu_upload_period_seconds', 'gauge', 'Upload period'),
+]
+
+
+class Family():
+    def __init__(self, name, mtype, help):
+        super().__init__()
+
+        self.name = name
+        self.type = mtype
+        self.header = f'# TYPE {name} {mtype}\n# HELP {name} {help}\n'
+
+        # Sample text by sample name, in declaration order
+        self.samples = dict()
+        self.text = ''
+
+    def render(self):
+        values = [f'{sample} {value}\n' for sample, value in self.samples.items() if value is not None]
+        self.text = self.header + ''.join(values) if values else ''
+
+
+class MetricsRegistry():
+    """
+    Metric families of the model, updated on publish
+    """
+    def __init__(self, metrics=None):
+        super().__init__()
+
+        self._lock = threading.Lock()
+        self._families = dict()
+        self._by_origin = dict()
+
+        info = Family('vcu_ui', 'info', 'vcu-ui version')
+        info.samples[f'vcu_ui_info{{version="{ui_version}"}}'] = 1
+        info.render()
+        self._families[info.name] = info
+
+        for m in METRICS if metrics is None else metrics:
+            family = self._families.get(m.family)
+            if family is None:
+                family = self._families[m.family] = Family(m.family, m.type, m.help)
+            family.samples[m.sample] = None
+            self._by_origin.setdefault(m.origin, list()).append(m)
+
+        self._text = None
+
+    def attach(self, model):
+        """
+        Subscribes to model and takes over values already published
+        """
+        model.subscribe(list(self._by_origin), self.update)
+        for origin, value in model.get_all().items():
+            self.update(origin, value)
+
+    def update(self, origin, value):
+        """
+        Updates samples of origin, value None removes them
+        """
+        metrics = self._by_origin.get(origin)
+        if not metrics:
+            return
+
+        with self._lock:
+            dirty = set()
+            for m in metrics:
+                family = self._families[m.family]
+                v = m.value(value) if value is not None else None
+                if family.samples[m.sample] != v:
+                    family.samples[m.sample] = v
+                    dirty.add(family)
+
+            for family in dirty:
+                family.render()
+            if dirty:
+                self._text = None
+
+    def render(self):
+        """
+        Returns exposition text
+        """
+        with self._lock:
+            if self._text is None:
+                self._text = ''.join(f.text for f in self._families.values()) + '# EOF\n'
+            return self._text
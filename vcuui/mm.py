@@ -1,12 +1,65 @@
 import logging
 import subprocess
 
+from vcuui.command import run_command
+
 logger = logging.getLogger('vcu-ui')
 
 MMCLI_BIN = '/usr/bin/mmcli'
 
 
+class MmCli():
+    """
+    ModemManager access using the mmcli command line tool
+
+    Default backend, each query forks an mmcli process.
+    """
+    def modem_id(self):
+        mmr = MM.command([MMCLI_BIN, '-K', '-L'])
+        # If successful, returns number of modems with each modems id.
+        #   modem-list.length   : 1
+        #   modem-list.value[1] : /org/freedesktop/ModemManager1/Modem/0
+        # In case no modem is found returns the following. Note that no .length
+        # entry is present
+        #   modem-list : 0
+        if mmr:
+            num_modems = mmr.text('modem-list.length')
+            if num_modems:
+                return mmr.id('modem-list.value[1]')
+            else:
+                logger.info('no modem(s) found')
+                return None
+        else:
+            return None
+
+    def modem_info(self, id, extra=None):
+        cmd = [MMCLI_BIN, '-K', '-m', str(id)]
+        if extra:
+            cmd.append(extra)
+
+        return MM.command(cmd)
+
+    def bearer_info(self, id):
+        return MM.command([MMCLI_BIN, '-K', '-b', str(id)])
+
+    def sim_info(self, id):
+        return MM.command([MMCLI_BIN, '-K', '-i', str(id)])
+
+    def modem_reset(self, id):
+        run_command([MMCLI_BIN, '-m', str(id), '-r'])
+
+    def modem_signal_setup(self, id, rate):
+        run_command([MMCLI_BIN, '-m', str(id), '--signal-setup', str(rate)])
+
+    def modem_location_setup(self, id):
+        run_command([MMCLI_BIN, '-m', str(id), '--location-enable-3gpp'])
+
+
 class MM():
+    # Backend used to access ModemManager, see MmCli for interface.
+    # Can be replaced by a D-Bus backend, see vcuui.mm_dbus
+    backend = MmCli()
+
     @staticmethod
     def modem():
         id = MM._id()
@@ -16,7 +69,7 @@ class MM():
     @staticmethod
     def command(cmd):
         try:
-            cp = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=10.0)
+            cp = run_command(cmd, timeout=10.0)
             stdout = cp.stdout.decode()
             return MmResult(stdout)
         except subprocess.TimeoutExpired:
@@ -25,105 +78,181 @@ class MM():
 
     @staticmethod
     def _id():
-        mmr = MM.command([MMCLI_BIN, '-K', '-L'])
-        # If successful, returns number of modems with each modems id.
-        #   modem-list.length   : 1
-        #   modem-list.value[1] : /org/freedesktop/ModemManager1/Modem/0
-        # In case no modem is found returns the following. Note that no .length
-        # entry is present
-        #   modem-list : 0
-        if mmr:
-            num_modems = mmr.text('modem-list.length')
-            if num_modems:
-                return mmr.id('modem-list.value[1]')
-            else:
-                logger.info('no modem(s) found')
-                return None
-        else:
-            return None
+        return MM.backend.modem_id()
+
+
+class IdentityCache():
+    """
+    Caches static modem and SIM information
+
+    Vendor, model, revision, IMSI and ICCID don't change as long as the
+    modem and SIM objects stay the same. The cache is invalidated when the
+    modem id or the SIM id changes, e.g. after a modem reset or SIM swap.
+    """
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.modem_id = None
+        self.sim_id = None
+        self._modem = None
+        self._sim = None
+
+    def modem(self, m, mmr):
+        """
+        Returns dictionary with modem identity
+        """
+        if m.id != self.modem_id or self._modem is None:
+            logger.info(f'reading identity of modem {m.id}')
+            if m.id != self.modem_id:
+                self.clear()
+                self.modem_id = m.id
+
+            modem = {
+                'vendor': m.vendor(mmr),
+                'model': m.model(mmr),
+                'revision': m.revision(mmr)
+            }
+
+            # Only cache complete information, retry on next call otherwise
+            if None not in modem.values():
+                self._modem = modem
+            return modem
+
+        return self._modem
+
+    def sim(self, s):
+        """
+        Returns dictionary with SIM identity
+
+        Queries SIM information only if SIM is not yet known.
+        """
+        if s.id != self.sim_id or self._sim is None:
+            logger.info(f'reading identity of SIM {s.id}')
+            self.sim_id = s.id
+            self._sim = None
+
+            s_info = s.get_info()
+            sim = {
+                'sim-imsi': s.imsi(s_info) if s_info else None,
+                'sim-iccid': s.iccid(s_info) if s_info else None
+            }
+
+            # Only cache complete information, retry on next call otherwise
+            if sim['sim-imsi']:
+                self._sim = sim
+            return sim
+
+        return self._sim
 
 
 class MmResult():
+    """
+    Result of an 'mmcli -K' call
+
+    The output is parsed on first access in a single pass. Lines have the
+    format 'key : value', values may contain spaces and colons. mmcli
+    reports missing values as '--', these are treated as not set.
+
+    Typed values (dec, hex, number, id) are converted on request and the
+    result is cached per key.
+    """
     def __init__(self, stdout):
-        lines = stdout.split('\n')
-        self.items = MmResult._to_dict(lines)
+        self._stdout = stdout
+        self._items = None
+        self._converted = dict()
+
+    @staticmethod
+    def from_dict(items):
+        """
+        Creates result from a dictionary with mmcli keys and text values
+        """
+        mmr = MmResult('')
+        mmr._items = items
+        return mmr
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = MmResult._to_dict(self._stdout)
+            self._stdout = None
+        return self._items
 
     def id(self, name):
         if not self._exists(name):
             logger.info(f'{name} does not exist')
             return None
 
-        line = self.items[name]
-        if line:
-            id = line[line.rfind('/') + 1:]
-            try:
-                return int(id)
-            except ValueError:
-                logger.warning('MmResult::id() value error')
-                return None
+        return self._convert(name, MmResult._to_id)
 
     def text(self, name):
-        if not self._exists(name):
-            return None
-        val = self.items[name]
-        return val
+        return self.items.get(name)
 
     def dec(self, name):
-        if not self._exists(name):
-            return None
-        # Check for '--'
-        val = self.items[name]
-        try:
-            return int(val)
-        except ValueError:
-            return None
+        return self._convert(name, int)
 
     def hex(self, name):
-        if not self._exists(name):
-            return None
-        val = self.items[name]
-        try:
-            return int(val, base=16)
-        except ValueError:
-            return None
+        return self._convert(name, MmResult._to_hex)
 
     def number(self, name):
-        if not self._exists(name):
-            return None
-        val = self.items[name]
-        try:
-            return float(val)
-        except ValueError:
-            return None
+        return self._convert(name, float)
 
     def _exists(self, name):
         return name in self.items
 
-    @staticmethod
-    def _to_dict(lines):
-        res = dict()
-        for line in lines:
-            k, v = MmResult._parseline(line)
-            if k:
-                res[k] = v
+    def _convert(self, name, func):
+        key = (name, func)
+        if key in self._converted:
+            return self._converted[key]
+
+        res = None
+        val = self.items.get(name)
+        if val is not None:
+            try:
+                res = func(val)
+            except ValueError:
+                res = None
 
+        self._converted[key] = res
         return res
 
     @staticmethod
-    def _parseline(line):
+    def _to_hex(val):
+        return int(val, base=16)
+
+    @staticmethod
+    def _to_id(val):
+        """
+        Extracts numeric id from object path
+
+        /org/freedesktop/ModemManager1/Modem/0 -> 0
+        """
+        pos = val.rfind('/')
+        if pos < 0:
+            raise ValueError('not an object path')
+        return int(val[pos + 1:])
+
+    @staticmethod
+    def _to_dict(stdout):
         """Split modem manager output lines
 
         Output format is as here
         modem-list.value[1] : /org/freedesktop/ModemManager1/Modem/0
+        modem.generic.revision : EG25GGBR07A08M2G
+        modem.generic.own-numbers.length : 0
+        modem.signal.lte.rssi : --
         """
-        k, v = None, None
-        t = line.split()
-        if len(t) >= 1:
-            k = t[0]
-        if len(t) >= 3:
-            v = t[2]
+        res = dict()
+        for line in stdout.splitlines():
+            k, sep, v = line.partition(':')
+            if sep:
+                k = k.strip()
+                if k:
+                    v = v.strip()
+                    res[k] = v if v and v != '--' else None
 
-        return k, v
+        return res
 
 
 class Modem():
@@ -131,16 +260,13 @@ class Modem():
         self.id = id
 
     def reset(self):
-        subprocess.run([MMCLI_BIN, '-m', str(self.id), '-r'],
-                       stdout=subprocess.PIPE)
+        MM.backend.modem_reset(self.id)
 
     def setup_signal_query(self):
-        subprocess.run([MMCLI_BIN, '-m', str(self.id), '--signal-setup', '2'],
-                       stdout=subprocess.PIPE)
+        MM.backend.modem_signal_setup(self.id, 2)
 
     def setup_location_query(self):
-        subprocess.run([MMCLI_BIN, '-m', str(self.id), '--location-enable-3gpp'],
-                       stdout=subprocess.PIPE)
+        MM.backend.modem_location_setup(self.id)
 
     def get_info(self):
         mmr = self._info()
@@ -235,11 +361,7 @@ class Modem():
             return SIM(int(sid))
 
     def _info(self, extra=None):
-        cmd = [MMCLI_BIN, '-K', '-m', str(self.id)]
-        if extra:
-            cmd.append(extra)
-
-        return MM.command(cmd)
+        return MM.backend.modem_info(self.id, extra)
 
 
 class Bearer():
@@ -256,8 +378,7 @@ class Bearer():
         return mmr.text('bearer.ipv4-config.address')
 
     def _info(self):
-        cmd = [MMCLI_BIN, '-K', '-b', str(self.id)]
-        return MM.command(cmd)
+        return MM.backend.bearer_info(self.id)
 
 
 class SIM():
@@ -274,5 +395,4 @@ class SIM():
         return mmr.text('sim.properties.iccid')
 
     def _info(self):
-        cmd = [MMCLI_BIN, '-K', '-i', str(self.id)]
-        return MM.command(cmd)
+        return MM.backend.sim_info(self.id)
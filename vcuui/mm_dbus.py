@@ -0,0 +1,405 @@
+"""
+ModemManager D-Bus backend
+
+Accesses org.freedesktop.ModemManager1 over a single long lived D-Bus
+connection instead of forking mmcli for every query.
+
+Properties of all ModemManager objects (modem, bearer, SIM) are cached per
+object path. The cache is filled from GetManagedObjects/GetAll and kept up
+to date by PropertiesChanged and InterfacesAdded/Removed signals, so regular
+queries are served without any D-Bus traffic.
+
+Results are returned as MmResult objects with the same keys as the
+'mmcli -K' output, so the Modem, Bearer and SIM accessors in vcuui.mm work
+unchanged.
+
+Requires the optional jeepney package.
+"""
+import logging
+import queue
+import threading
+
+try:
+    from jeepney import DBusAddress, DBusErrorResponse, HeaderFields, MatchRule, message_bus, new_method_call
+    from jeepney.io.threading import DBusRouter, open_dbus_connection
+    from jeepney.wrappers import unwrap_msg
+except ImportError:
+    DBusRouter = None
+
+from vcuui.mm import MmResult
+
+logger = logging.getLogger('vcu-ui')
+
+
+MM_BUS_NAME = 'org.freedesktop.ModemManager1'
+MM_PATH = '/org/freedesktop/ModemManager1'
+
+IF_PROPERTIES = 'org.freedesktop.DBus.Properties'
+IF_OBJECT_MANAGER = 'org.freedesktop.DBus.ObjectManager'
+IF_MODEM = 'org.freedesktop.ModemManager1.Modem'
+IF_SIGNAL = 'org.freedesktop.ModemManager1.Modem.Signal'
+IF_LOCATION = 'org.freedesktop.ModemManager1.Modem.Location'
+IF_BEARER = 'org.freedesktop.ModemManager1.Bearer'
+IF_SIM = 'org.freedesktop.ModemManager1.Sim'
+
+# MMModemState, as printed by mmcli
+MODEM_STATES = {
+    -1: 'failed',
+    0: 'unknown',
+    1: 'initializing',
+    2: 'locked',
+    3: 'disabled',
+    4: 'disabling',
+    5: 'enabling',
+    6: 'enabled',
+    7: 'searching',
+    8: 'registered',
+    9: 'disconnecting',
+    10: 'connecting',
+    11: 'connected',
+}
+
+# MMModemAccessTechnology bits, as printed by mmcli
+ACCESS_TECHNOLOGIES = (
+    'pots', 'gsm', 'gsm-compact', 'gprs', 'edge', 'umts', 'hsdpa', 'hsupa',
+    'hspa', 'hspa-plus', '1xrtt', 'evdo0', 'evdoa', 'evdob', 'lte', '5gnr',
+    'lte-cat-m', 'lte-nb-iot'
+)
+
+# MMModemLocationSource
+LOCATION_SOURCE_3GPP_LAC_CI = 1 << 0
+
+# Timeout for D-Bus method calls in seconds
+CALL_TIMEOUT = 5.0
+
+
+class MmDBus():
+    """
+    ModemManager backend using D-Bus, see MmCli for the interface
+
+    Use setup() to connect. If it fails (jeepney not installed, no system
+    bus, ModemManager not running) keep using the mmcli backend.
+    """
+    def __init__(self, bus='SYSTEM'):
+        super().__init__()
+
+        self._bus = bus
+        self._router = None
+        self._lock = threading.Lock()
+        self._props = dict()     # {path: {interface: {name: value}}}
+        self._signals = queue.Queue()
+
+    def setup(self):
+        if DBusRouter is None:
+            logger.info('jeepney not installed, cannot use D-Bus for ModemManager')
+            return False
+
+        try:
+            conn = open_dbus_connection(bus=self._bus)
+            self._router = DBusRouter(conn)
+
+            # Get notified about property changes, new/removed objects and
+            # ModemManager restarts.
+            # Bus side rules filter by sender. Local filters can't, they see
+            # the unique name of ModemManager only.
+            rules = [
+                dict(interface=IF_PROPERTIES, member='PropertiesChanged', path_namespace=MM_PATH),
+                dict(interface=IF_OBJECT_MANAGER, path=MM_PATH),
+            ]
+            for rule in rules:
+                self._router.filter(MatchRule(type='signal', **rule), queue=self._signals)
+                self._call(message_bus.AddMatch(MatchRule(type='signal', sender=MM_BUS_NAME, **rule)))
+
+            rule = MatchRule(type='signal', sender='org.freedesktop.DBus', interface='org.freedesktop.DBus',
+                             member='NameOwnerChanged', path='/org/freedesktop/DBus')
+            rule.add_arg_condition(0, MM_BUS_NAME)
+            self._router.filter(rule, queue=self._signals)
+            self._call(message_bus.AddMatch(rule))
+
+            self._load_objects()
+
+        except (OSError, ValueError, DBusErrorResponse) as e:
+            logger.warning('cannot access ModemManager via D-Bus')
+            logger.warning(e)
+            if self._router:
+                self._router.close()
+                self._router = None
+            return False
+
+        t = threading.Thread(target=self._signal_handler, name='mm-dbus', daemon=True)
+        t.start()
+
+        logger.info('using D-Bus to access ModemManager')
+        return True
+
+    def close(self):
+        if self._router:
+            self._router.close()
+            self._router = None
+
+    """
+    Backend interface
+    """
+    def modem_id(self):
+        path = self._modem_path()
+        if path:
+            return MmDBus._path_to_id(path)
+        else:
+            logger.info('no modem(s) found')
+
+    def modem_info(self, id, extra=None):
+        path = f'{MM_PATH}/Modem/{id}'
+        if extra == '--signal-get':
+            return self._signal_result(path)
+        elif extra == '--location-get':
+            return self._location_result(path)
+        else:
+            assert extra is None
+            return self._modem_result(path)
+
+    def bearer_info(self, id):
+        path = f'{MM_PATH}/Bearer/{id}'
+        items = dict()
+        props = self._properties(path, IF_BEARER)
+        if props:
+            stats = props.get('Stats', {})
+            if 'duration' in stats:
+                items['bearer.stats.duration'] = str(stats['duration'])
+            ip4 = props.get('Ip4Config', {})
+            if 'address' in ip4:
+                items['bearer.ipv4-config.address'] = ip4['address']
+
+        return MmResult.from_dict(items)
+
+    def sim_info(self, id):
+        path = f'{MM_PATH}/SIM/{id}'
+        items = dict()
+        props = self._properties(path, IF_SIM)
+        if props:
+            items['sim.properties.imsi'] = props.get('Imsi')
+            items['sim.properties.iccid'] = props.get('SimIdentifier')
+
+        return MmResult.from_dict(items)
+
+    def modem_reset(self, id):
+        self._method(f'{MM_PATH}/Modem/{id}', IF_MODEM, 'Reset')
+
+    def modem_signal_setup(self, id, rate):
+        self._method(f'{MM_PATH}/Modem/{id}', IF_SIGNAL, 'Setup', 'u', (rate, ))
+
+    def modem_location_setup(self, id):
+        path = f'{MM_PATH}/Modem/{id}'
+        props = self._properties(path, IF_LOCATION)
+        if props is not None:
+            sources = props.get('Enabled', 0) | LOCATION_SOURCE_3GPP_LAC_CI
+            signals = props.get('SignalsLocation', False)
+            self._method(path, IF_LOCATION, 'Setup', 'ub', (sources, signals))
+
+    """
+    Result conversion, creates mmcli compatible results
+    """
+    def _modem_result(self, path):
+        items = dict()
+        props = self._properties(path, IF_MODEM)
+        if props:
+            items['modem.generic.manufacturer'] = props.get('Manufacturer')
+            items['modem.generic.model'] = props.get('Model')
+            items['modem.generic.revision'] = props.get('Revision')
+            items['modem.generic.state'] = MODEM_STATES.get(props.get('State'), 'unknown')
+
+            rats = MmDBus._access_technologies(props.get('AccessTechnologies', 0))
+            items['modem.generic.access-technologies.length'] = str(len(rats))
+            for i, rat in enumerate(rats):
+                items[f'modem.generic.access-technologies.value[{i+1}]'] = rat
+
+            quality = props.get('SignalQuality')
+            if quality:
+                items['modem.generic.signal-quality.value'] = str(quality[0])
+
+            bearers = props.get('Bearers', [])
+            items['modem.generic.bearers.length'] = str(len(bearers))
+            for i, bearer in enumerate(bearers):
+                items[f'modem.generic.bearers.value[{i+1}]'] = bearer
+
+            sim = props.get('Sim')
+            if sim and sim != '/':
+                items['modem.generic.sim'] = sim
+
+        return MmResult.from_dict(items)
+
+    def _signal_result(self, path):
+        items = dict()
+        props = self._properties(path, IF_SIGNAL)
+        if props:
+            items['modem.signal.refresh.rate'] = str(props.get('Rate', 0))
+            for rat, keys in (('gsm', ('rssi', )),
+                              ('umts', ('rssi', 'rscp', 'ecio')),
+                              ('lte', ('rssi', 'rsrq', 'rsrp', 'snr'))):
+                values = props.get(rat.capitalize(), {})
+                for key in keys:
+                    if key in values:
+                        items[f'modem.signal.{rat}.{key}'] = f'{values[key]:.2f}'
+
+        return MmResult.from_dict(items)
+
+    def _location_result(self, path):
+        # Location is not cached, query each time
+        items = dict()
+        res = self._method(path, IF_LOCATION, 'GetLocation')
+        if res:
+            locations = res[0]
+            if LOCATION_SOURCE_3GPP_LAC_CI in locations:
+                # Format: MCC,MNC,LAC,CI,TAC with LAC, CI and TAC in hex
+                _, loc = locations[LOCATION_SOURCE_3GPP_LAC_CI]
+                fields = loc.split(',')
+                if len(fields) >= 5:
+                    items['modem.location.3gpp.mcc'] = fields[0]
+                    items['modem.location.3gpp.mnc'] = fields[1]
+                    items['modem.location.3gpp.lac'] = fields[2]
+                    items['modem.location.3gpp.cid'] = fields[3]
+                    items['modem.location.3gpp.tac'] = fields[4]
+
+        return MmResult.from_dict(items)
+
+    @staticmethod
+    def _access_technologies(mask):
+        return [name for bit, name in enumerate(ACCESS_TECHNOLOGIES) if mask & (1 << bit)]
+
+    @staticmethod
+    def _path_to_id(path):
+        try:
+            return int(path[path.rfind('/') + 1:])
+        except ValueError:
+            logger.warning(f'invalid ModemManager object path {path}')
+
+    """
+    Property cache
+    """
+    def _modem_path(self):
+        with self._lock:
+            modems = [p for p, ifs in self._props.items() if IF_MODEM in ifs]
+
+        if modems:
+            return sorted(modems, key=lambda p: MmDBus._path_to_id(p) or 0)[0]
+
+    def _properties(self, path, interface):
+        """
+        Returns cached properties of object, loads them if not yet cached.
+        """
+        with self._lock:
+            if path in self._props and interface in self._props[path]:
+                return self._props[path][interface]
+
+        res = self._method(path, IF_PROPERTIES, 'GetAll', 's', (interface, ))
+        if res is None:
+            return None
+
+        props = MmDBus._unwrap_properties(res[0])
+        with self._lock:
+            self._props.setdefault(path, dict())[interface] = props
+
+        return props
+
+    def _load_objects(self):
+        manager = DBusAddress(MM_PATH, MM_BUS_NAME, IF_OBJECT_MANAGER)
+        res = self._call(new_method_call(manager, 'GetManagedObjects'))
+        objects = dict()
+        for path, interfaces in res[0].items():
+            objects[path] = {i: MmDBus._unwrap_properties(p) for i, p in interfaces.items()}
+
+        with self._lock:
+            self._props = objects
+
+    @staticmethod
+    def _unwrap_properties(props):
+        """
+        Converts a{sv} property dictionary to plain dictionary
+
+        Nested a{sv} dictionaries (e.g. Bearer.Stats) are unwrapped as well.
+        """
+        res = dict()
+        for name, (signature, value) in props.items():
+            if signature == 'a{sv}':
+                value = MmDBus._unwrap_properties(value)
+            res[name] = value
+        return res
+
+    """
+    D-Bus signal processing
+    """
+    def _signal_handler(self):
+        while True:
+            msg = self._signals.get()
+            try:
+                self._handle_signal(msg)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.warning('cannot handle ModemManager signal')
+                logger.warning(e)
+
+    def _handle_signal(self, msg):
+        member = msg.header.fields.get(HeaderFields.member)
+        path = msg.header.fields.get(HeaderFields.path)
+
+        handlers = {
+            'PropertiesChanged': self._properties_changed,
+            'InterfacesAdded': self._interfaces_added,
+            'InterfacesRemoved': self._interfaces_removed,
+            'NameOwnerChanged': self._name_owner_changed,
+        }
+        if member in handlers:
+            handlers[member](path, *msg.body)
+
+    def _properties_changed(self, path, interface, changed, invalidated):
+        changed = MmDBus._unwrap_properties(changed)
+        with self._lock:
+            if path in self._props and interface in self._props[path]:
+                if invalidated:
+                    # Reload on next access
+                    del self._props[path][interface]
+                else:
+                    self._props[path][interface].update(changed)
+
+    def _interfaces_added(self, path, obj_path, interfaces):
+        logger.debug(f'ModemManager object {obj_path} added')
+        with self._lock:
+            ifs = self._props.setdefault(obj_path, dict())
+            for interface, props in interfaces.items():
+                ifs[interface] = MmDBus._unwrap_properties(props)
+
+    def _interfaces_removed(self, path, obj_path, interfaces):
+        logger.debug(f'ModemManager object {obj_path} removed')
+        with self._lock:
+            ifs = self._props.get(obj_path, dict())
+            for interface in interfaces:
+                ifs.pop(interface, None)
+            if not ifs:
+                self._props.pop(obj_path, None)
+
+    def _name_owner_changed(self, path, name, old_owner, new_owner):
+        if name == MM_BUS_NAME:
+            logger.info('ModemManager restarted, reloading objects')
+            with self._lock:
+                self._props = dict()
+            if new_owner:
+                try:
+                    self._load_objects()
+                except (OSError, ValueError, DBusErrorResponse) as e:
+                    logger.warning(e)
+
+    """
+    D-Bus access
+    """
+    def _method(self, path, interface, method, signature=None, body=()):
+        """
+        Invokes method on ModemManager object, returns reply body or None
+        """
+        msg = new_method_call(DBusAddress(path, MM_BUS_NAME, interface), method, signature, body)
+        try:
+            return self._call(msg)
+        except (OSError, ValueError, DBusErrorResponse) as e:
+            logger.warning(f'D-Bus call {method} on {path} failed')
+            logger.warning(e)
+
+    def _call(self, msg):
+        reply = self._router.send_and_get_reply(msg, timeout=CALL_TIMEOUT)
+        return unwrap_msg(reply)
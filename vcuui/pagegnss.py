@@ -81,6 +81,10 @@ class GnssHandler(tornado.web.RequestHandler):
                     tes.append(TE('Position', text))
                     text = nice([('speed', '', 'km/h')], pos)
                     tes.append(TE('Speed', f'{pos["speed"]:.0f} m/s, {pos["speed"]*3.60:.0f} km/h'))
+                    if pos.get('alt') is not None:
+                        tes.append(TE('Altitude', f'{pos["alt"]:.0f} m'))
+                    if pos.get('sats-visible') is not None:
+                        tes.append(TE('Satellites', f'{pos["sats-used"]} used, {pos["sats-visible"]} visible'))
                     # tes.append(TE('', ''))
 
                 # Config
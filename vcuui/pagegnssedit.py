@@ -2,11 +2,11 @@
 Traffic Page
 """
 import logging
-import subprocess
 
 import tornado.web
 
 from vcuui._version import __version__ as version
+from vcuui.command import run_command_async
 from vcuui.data_model import Model
 
 
@@ -65,10 +65,10 @@ class GnssSaveHandler(tornado.web.RequestHandler):
 
 
 class GnssRestartHandler(tornado.web.RequestHandler):
-    def post(self):
+    async def post(self):
         logger.info('restarting gnss handler')
 
-        cp = subprocess.run(['/usr/bin/systemctl', 'restart', 'gnss-mgr'], stdout=subprocess.PIPE)
+        cp = await run_command_async(['/usr/bin/systemctl', 'restart', 'gnss-mgr'], timeout=30.0)
         rc = cp.returncode
         if rc == 0:
             res = 'gnss-mgr restarted succesfully'
@@ -7,7 +7,7 @@ import tornado.web
 
 from vcuui._version import __version__ as version
 from vcuui.data_model import Model
-from vcuui.tools import secs_to_hhmm
+from vcuui.tools import bytes_to_human, secs_to_hhmm
 
 logger = logging.getLogger('vcu-ui')
 
@@ -21,6 +21,33 @@ class TE(object):
         self.text = text
 
 
+def part_text(info):
+    if info:
+        return (f'{bytes_to_human(info["used"])} of {bytes_to_human(info["size"])} used ({info["percent"]} %), '
+                f'{bytes_to_human(info["free"])} free')
+    else:
+        return 'N/A'
+
+
+def statistics_tes(stats):
+    """
+    Returns table elements for model statistics
+    """
+    tes = list()
+    if stats:
+        tes.append(TE('', ''))
+        tes.append(TE('<b>Statistics</b>', ''))
+        for name, st in sorted(stats.items()):
+            text = f'{st["min"]:g} / {st["mean"]:.4g} / {st["max"]:g} (min/mean/max)'
+            percentiles = [f'{k}: {v:.4g}' for k, v in st.items() if k.startswith('p') and v is not None]
+            if percentiles:
+                text += '</br>' + ', '.join(percentiles)
+            text += f'</br>{st["count"]} samples'
+            tes.append(TE(name, text))
+
+    return tes
+
+
 def nice(items, data, linebreak=False):
     res = ''
     for i in items:
@@ -96,14 +123,14 @@ class MainHandler(tornado.web.RequestHandler):
             tes.append(TE('Memory', f'Total: {total} MB, Free: {free} MB'))
 
             wear_slc, wear_mlc = d.get((0, 0), 'sys-disc', 'wear')
-            sysroot_info = d.get('N/A', 'sys-disc', 'part_sysroot')
-            data_info = d.get('N/A', 'sys-disc', 'part_data')
+            sysroot_info = part_text(d.get(None, 'sys-disc', 'part_sysroot'))
+            data_info = part_text(d.get(None, 'sys-disc', 'part_data'))
             tes.append(TE('Disc', f'eMMC Wear Level: SLC: {wear_slc} %, MLC: {wear_mlc} %<br>'
                                   f'Root: {sysroot_info}<br>'
                                   f'Data: {data_info}'))
 
             a, b, c = d.get((0, 0, 0), 'sys-misc', 'load')
-            tes.append(TE('Load', f'{a}, {b}, {c}'))
+            tes.append(TE('Load', f'{a:.2f}, {b:.2f}, {c:.2f}'))
 
             temp = d.get(0, 'sys-misc', 'temp')
             temp_str = f'PMIC: {temp:.0f} °C'
@@ -121,15 +148,15 @@ class MainHandler(tornado.web.RequestHandler):
             tes.append(TE('<b>Network</b>', ''))
 
             rx, tx = d.get((None, None), 'net-wwan0', 'bytes')
-            if rx and tx:
-                rx = int(rx) / 1000000
-                tx = int(tx) / 1000000
+            if rx is not None and tx is not None:
+                rx = rx / 1000000
+                tx = tx / 1000000
                 tes.append(TE('wwan0', f'Rx: {rx:.1f} MB, Tx: {tx:.1f} MB'))
 
             rx, tx = d.get((None, None), 'net-wlan0', 'bytes')
-            if rx and tx:
-                rx = int(rx) / 1000000
-                tx = int(tx) / 1000000
+            if rx is not None and tx is not None:
+                rx = rx / 1000000
+                tx = tx / 1000000
                 tes.append(TE('wlan0', f'Rx: {rx:.1f} MB, Tx: {tx:.1f} MB'))
 
             # Modem Information
@@ -204,9 +231,9 @@ class MainHandler(tornado.web.RequestHandler):
 
                     if 'bearer-uptime' in mi:
                         max_ut = None
-                        wtm = md['watermark']
-                        if 'bearer-uptime' in wtm:
-                            max_ut = wtm['bearer-uptime']
+                        stats = m.get_statistics()
+                        if 'modem.bearer-uptime' in stats:
+                            max_ut = stats['modem.bearer-uptime']['max']
 
                         ut = mi['bearer-uptime']
                         if ut:
@@ -249,6 +276,8 @@ class MainHandler(tornado.web.RequestHandler):
                 text = nice([('speed', '', 'km/h')], pos)
                 tes.append(TE('Speed', f'{pos["speed"]:.0f} m/s, {pos["speed"]*3.60:.0f} km/h'))
 
+            tes.extend(statistics_tes(m.get_statistics()))
+
             # OBD-II
             if 'obd2' in md:
                 tes.append(TE('', ''))
@@ -7,6 +7,7 @@ import subprocess
 import tornado.web
 
 from vcuui._version import __version__ as version
+from vcuui.command import run_command_async
 from vcuui.data_model import Model
 
 logger = logging.getLogger('vcu-ui')
@@ -71,14 +72,14 @@ class TrafficImageHandler(tornado.web.RequestHandler):
         'summary.png': ['-vs']
     }
 
-    def get(self, filename):
+    async def get(self, filename):
         logger.info(f'asking for traffic image {filename}')
         try:
             vnstati_call = ['/usr/bin/vnstati', '-o', '-', '--noedge']
             vnstati_call += self.image_options[filename]
             logger.info(vnstati_call)
 
-            cp = subprocess.run(vnstati_call, capture_output=True)
+            cp = await run_command_async(vnstati_call)
             if cp.returncode == 0:
                 s = cp.stdout
                 self.set_header('Content-type', 'image/jpeg')
@@ -87,3 +88,6 @@ class TrafficImageHandler(tornado.web.RequestHandler):
 
         except FileNotFoundError:
             logger.info('vnstati not found')
+        except subprocess.TimeoutExpired:
+            logger.warning(f'vnstati timed out creating {filename}')
+            raise tornado.web.HTTPError(504)
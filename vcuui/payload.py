@@ -0,0 +1,159 @@
+"""
+Telemetry payload encoder for Thingsboard uploads
+
+Turns transmit queue entries into the request body
+- Entries with identical timestamp are merged into one record
+- Records are added until the byte budget is reached
+- Body is gzip compressed if enabled and large enough to benefit
+
+Thingsboard telemetry format
+[{"ts": <time in ms>, "values": {"key": value, ...}}, ...]
+"""
+import gzip
+import json
+import time
+
+
+class Payload():
+    def __init__(self, body, raw_size, num_entries, num_records, num_values, compressed):
+        super().__init__()
+
+        self.body = body
+        self.raw_size = raw_size
+        self.num_entries = num_entries
+        self.num_records = num_records
+        self.num_values = num_values
+        self.compressed = compressed
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    @property
+    def headers(self):
+        headers = ['Content-Type:application/json']
+        if self.compressed:
+            headers.append('Content-Encoding:gzip')
+        return headers
+
+    def stats(self):
+        return {
+            'bytes': self.size,
+            'bytes-raw': self.raw_size,
+            'entries': self.num_entries,
+            'datapoints': self.num_values,
+            'compression-ratio': round(self.raw_size / self.size, 2) if self.size else 1.0,
+            'bytes-per-datapoint': round(self.size / self.num_values, 1) if self.num_values else 0.0,
+        }
+
+
+class PayloadEncoder():
+    # Uncompressed JSON size per request. Typical entries are 50..150 bytes
+    BYTE_BUDGET = 32 * 1024
+
+    # Don't compress small bodies, gzip header and trailer eat the gain
+    MIN_COMPRESS_SIZE = 256
+
+    COMPRESS_LEVEL = 6
+
+    # After the server rejected compressed data, send uncompressed for this
+    # long, then try again
+    COMPRESS_RETRY = 3600.0
+
+    def __init__(self, byte_budget=BYTE_BUDGET, compress=True):
+        super().__init__()
+
+        self.byte_budget = byte_budget
+        self.compress = compress
+        self.compress_retry = None
+
+    def encode(self, entries):
+        """
+        Encodes queue entries ({"time": .., "data": ..}) as telemetry body
+
+        Uses entries from the start of the list until the byte budget is
+        reached. At least one record is always encoded. Payload.num_entries
+        tells how many entries were consumed.
+        """
+        records = list()
+        size = 2    # Enclosing []
+        num_entries = 0
+        num_values = 0
+
+        for ts, values, count in self._merge(entries):
+            record = json.dumps({'ts': ts, 'values': values}, separators=(',', ':')).encode()
+            if records and size + len(record) + 1 > self.byte_budget:
+                break
+
+            records.append(record)
+            size += len(record) + 1
+            num_entries += count
+            num_values += len(values)
+
+        raw = b'[' + b','.join(records) + b']'
+        body = raw
+        compressed = False
+        if self.compressing() and len(raw) >= self.MIN_COMPRESS_SIZE:
+            body = gzip.compress(raw, self.COMPRESS_LEVEL)
+            compressed = True
+
+        return Payload(body, len(raw), num_entries, len(records), num_values, compressed)
+
+    def compressing(self, now=None):
+        """
+        True if bodies are compressed, i.e. enabled and not paused after
+        the server rejected compressed data
+        """
+        if not self.compress:
+            return False
+
+        if self.compress_retry is not None:
+            if now is None:
+                now = time.monotonic()
+            if now < self.compress_retry:
+                return False
+            self.compress_retry = None
+
+        return True
+
+    def response(self, payload, code, now=None):
+        """
+        Reports the HTTP response code the server sent for payload
+
+        Thingsboard answers 400 if it can't parse a gzip body, or 415. Then
+        compression is paused for COMPRESS_RETRY seconds. Other errors, e.g.
+        5xx while the server starts, don't tell anything about compression.
+
+        Returns True if payload must be encoded again and resent
+        """
+        if not payload.compressed or code not in (400, 415):
+            return False
+
+        if now is None:
+            now = time.monotonic()
+        self.compress_retry = now + self.COMPRESS_RETRY
+        return True
+
+    @staticmethod
+    def _merge(entries):
+        """
+        Yields tuples (ts, values, number of entries) with consecutive
+        entries of same timestamp merged
+        """
+        ts = None
+        values = None
+        count = 0
+        for entry in entries:
+            if entry['time'] == ts:
+                values.update(entry['data'])
+                count += 1
+            else:
+                if count:
+                    yield ts, values, count
+
+                ts = entry['time']
+                values = dict(entry['data'])
+                count = 1
+
+        if count:
+            yield ts, values, count
@@ -1,7 +1,8 @@
 import logging
 import os
 import re
-import subprocess
+
+from vcuui.command import run_command
 
 logger = logging.getLogger('vcu-ui')
 
@@ -85,7 +86,7 @@ class PhyInfo5:
         return int((qual/max_qual)*100.0)
 
     def ethtool(self):
-        cp = subprocess.run(['/usr/sbin/ethtool', self.__if], stdout=subprocess.PIPE)
+        cp = run_command(['/usr/sbin/ethtool', self.__if])
         res = cp.stdout.decode().strip()
 
         return res
@@ -32,6 +32,13 @@ class RealtimeWebSocket(tornado.websocket.WebSocketHandler):
     counter = 0
     timer_fn = None
     esf_status = None
+    model_version = None
+    payload = None
+    ioloop = None
+    push_pending = False
+
+    # Model origins that trigger an immediate update of the clients
+    ORIGINS = ('gnss-pos', 'gnss-state', 'obd2', 'modem', 'link', 'net-wwan0')
 
     def __init__(self, application, request, **kwargs):
         logger.info(f'new SimpleWebSocket {self}')
@@ -45,6 +52,11 @@ class RealtimeWebSocket(tornado.websocket.WebSocketHandler):
             RealtimeWebSocket.timer_fn = tornado.ioloop.PeriodicCallback(RealtimeWebSocket.timer, 900)
             RealtimeWebSocket.timer_fn.start()
 
+            # Push changes as soon as they are published, the timer above
+            # only serves as heartbeat.
+            RealtimeWebSocket.ioloop = tornado.ioloop.IOLoop.current()
+            Model.instance.subscribe(RealtimeWebSocket.ORIGINS, RealtimeWebSocket.changed)
+
     def open(self):
         logger.info(f'adding new connection {self}')
         RealtimeWebSocket.connections.add(self)
@@ -53,12 +65,38 @@ class RealtimeWebSocket(tornado.websocket.WebSocketHandler):
         logger.info('closing connection')
         RealtimeWebSocket.connections.remove(self)
 
+    @staticmethod
+    def changed(origin, value):
+        # Invoked from publisher thread, hand over to IOLoop.
+        # Coalesce multiple changes into a single push.
+        if not RealtimeWebSocket.push_pending:
+            RealtimeWebSocket.push_pending = True
+            RealtimeWebSocket.ioloop.add_callback(RealtimeWebSocket.push)
+
     @staticmethod
     def timer():
+        RealtimeWebSocket.push()
+        RealtimeWebSocket.counter += 1
+
+    @staticmethod
+    def push():
+        RealtimeWebSocket.push_pending = False
+
         m = Model.instance
-        md = m.get_all()
-        # gnss = Gnss.instance
+        version, md = m.snapshot()
+
+        # Only rebuild payload if model has changed since last run
+        if version != RealtimeWebSocket.model_version:
+            RealtimeWebSocket.payload = RealtimeWebSocket._payload(md)
+            RealtimeWebSocket.model_version = version
+
+        info = dict(RealtimeWebSocket.payload)
+        info['clients'] = len(RealtimeWebSocket.connections)
+        info['time'] = RealtimeWebSocket.counter
+        [client.write_message(info) for client in RealtimeWebSocket.connections]
 
+    @staticmethod
+    def _payload(md):
         rx, tx = RealtimeWebSocket.safeget((None, None), md, 'net-wwan0', 'bytes')
         if not (rx and tx):
             rx = 0
@@ -89,16 +127,12 @@ class RealtimeWebSocket(tornado.websocket.WebSocketHandler):
         obd2 = RealtimeWebSocket.safeget(default, md, 'obd2')
 
         info = {
-            'clients': len(RealtimeWebSocket.connections),
-            'time': RealtimeWebSocket.counter,
             'pos': pos,
             'esf': esf_state,
             'wwan0': wwan0,
             'obd2': obd2,
         }
-        [client.write_message(info) for client in RealtimeWebSocket.connections]
-
-        RealtimeWebSocket.counter += 1
+        return info
 
     @staticmethod
     def safeget(default, dct, *keys):
@@ -0,0 +1,218 @@
+"""
+Poll scheduler
+
+Runs periodic poll functions (sources) on their own deadline in a small
+worker pool. A slow or hung source only delays itself, never the other
+sources.
+
+Each source has
+- period: time between two runs in seconds
+- timeout: expected maximum run time, longer runs are counted and reported
+- priority: when more sources are due than workers are free, sources with
+  higher priority are dispatched first. Due sources wait for a free worker,
+  so late runs are visible as drift.
+
+A source never runs concurrently with itself. If a source is still running
+when its next deadline is reached, the run is skipped and counted as
+overrun.
+"""
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('vcu-ui')
+
+
+class PollSource():
+    def __init__(self, name, func, period, timeout, priority):
+        super().__init__()
+
+        self.name = name
+        self.func = func
+        self.period = period
+        self.timeout = timeout
+        self.priority = priority
+
+        self.deadline = 0.0
+        self.running = False
+        self.started = None
+        self.timed_out = False
+
+        # Statistics
+        self.runs = 0
+        self.overruns = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.drift_max = 0.0
+        self.drift_sum = 0.0
+        self.duration_last = 0.0
+        self.duration_max = 0.0
+
+    def stats(self):
+        drift_avg = self.drift_sum / self.runs if self.runs else 0.0
+        return {
+            'runs': self.runs,
+            'overruns': self.overruns,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'drift-avg': round(drift_avg, 4),
+            'drift-max': round(self.drift_max, 4),
+            'duration-last': round(self.duration_last, 4),
+            'duration-max': round(self.duration_max, 4),
+        }
+
+
+class PollScheduler(threading.Thread):
+    # Number of sources that can run in parallel
+    NUM_WORKERS = 4
+
+    def __init__(self, num_workers=NUM_WORKERS):
+        super().__init__()
+
+        self.daemon = True
+        self.name = 'poll-scheduler'
+
+        self._sources = dict()
+        self._heap = list()
+        self._ready = list()
+        self._seq = 0
+        self._num_workers = num_workers
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._stop_requested = False
+        self._pool = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='poll-worker')
+
+    def add(self, name, func, period, timeout=None, priority=0):
+        """
+        Registers a source
+
+        The source runs for the first time as soon as the scheduler is
+        started (or immediately if it is already running).
+        """
+        assert name not in self._sources
+        assert period > 0
+
+        if timeout is None:
+            timeout = period
+
+        source = PollSource(name, func, period, timeout, priority)
+        with self._cond:
+            self._sources[name] = source
+            source.deadline = time.monotonic()
+            self._push(source)
+            self._cond.notify()
+
+    def stats(self):
+        """
+        Returns statistics of all sources as dictionary, indexed by name
+        """
+        with self._cond:
+            return {name: s.stats() for name, s in self._sources.items()}
+
+    def stop(self):
+        with self._cond:
+            self._stop_requested = True
+            self._cond.notify()
+
+        self._pool.shutdown(wait=False)
+
+    def run(self):
+        logger.info('running poll scheduler')
+
+        with self._cond:
+            while not self._stop_requested:
+                now = time.monotonic()
+                self._check_timeouts(now)
+
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, source = heapq.heappop(self._heap)
+                    self._make_ready(source, now)
+
+                while self._ready and self._busy < self._num_workers:
+                    _, _, _, source = heapq.heappop(self._ready)
+                    self._dispatch(source, now)
+
+                # Sleep until next deadline or a worker gets free, but wake up
+                # regularly to check for timeouts of running sources
+                wait_time = 1.0
+                if self._heap:
+                    wait_time = min(wait_time, self._heap[0][0] - now)
+
+                self._cond.wait(max(0.0, wait_time))
+
+    def _make_ready(self, source, now):
+        # Lock must be held by caller
+        if source.running:
+            source.overruns += 1
+            logger.debug(f'{source.name} still running, skipping')
+            self._reschedule(source, now)
+        else:
+            self._seq += 1
+            heapq.heappush(self._ready, (-source.priority, source.deadline, self._seq, source))
+
+    def _dispatch(self, source, now):
+        # Lock must be held by caller
+        source.running = True
+        source.timed_out = False
+        self._busy += 1
+        self._pool.submit(self._execute, source, source.deadline)
+        self._reschedule(source, now)
+
+    def _reschedule(self, source, now):
+        # Lock must be held by caller
+        # Schedule next run, skip deadlines that already passed
+        source.deadline += source.period
+        if source.deadline <= now:
+            missed = int((now - source.deadline) / source.period) + 1
+            source.deadline += missed * source.period
+
+        self._push(source)
+
+    def _execute(self, source, deadline):
+        start = time.monotonic()
+        with self._cond:
+            source.started = start
+
+        try:
+            source.func()
+            failed = False
+        except Exception as e:
+            logger.warning(f'poll source {source.name} failed')
+            logger.warning(e)
+            failed = True
+
+        end = time.monotonic()
+        with self._cond:
+            drift = start - deadline
+            duration = end - start
+
+            source.runs += 1
+            source.drift_sum += drift
+            source.drift_max = max(source.drift_max, drift)
+            source.duration_last = duration
+            source.duration_max = max(source.duration_max, duration)
+            if failed:
+                source.errors += 1
+            if duration > source.timeout and not source.timed_out:
+                source.timeouts += 1
+
+            source.running = False
+            source.started = None
+            self._busy -= 1
+            self._cond.notify()
+
+    def _check_timeouts(self, now):
+        # Lock must be held by caller
+        for source in self._sources.values():
+            if source.running and source.started and not source.timed_out:
+                if now - source.started > source.timeout:
+                    logger.warning(f'poll source {source.name} exceeds timeout of {source.timeout} s')
+                    source.timed_out = True
+                    source.timeouts += 1
+
+    def _push(self, source):
+        # Lock must be held by caller
+        self._seq += 1
+        heapq.heappush(self._heap, (source.deadline, self._seq, source))
@@ -15,11 +15,14 @@ import tornado.web
 import tornado.websocket
 
 from vcuui._version import __version__ as version
+from vcuui.command import run_command_async
 from vcuui.data_model import Model
 from vcuui.wwan_model import Wwan
 from vcuui.gnss_model import Gnss
 from vcuui.gnss_pos import GnssPosition
 from vcuui.mm import MM
+from vcuui.metrics import CONTENT_TYPE, MetricsRegistry
+from vcuui.mm_dbus import MmDBus
 from vcuui.pagegnss import GnssHandler, GnssSaveStateHandler, GnssClearStateHandler
 from vcuui.pagegnss import GnssFactoryResetHandler, GnssColdStartHandler
 
@@ -46,45 +49,59 @@ logger.info(f'running server from {module_path}')
 
 
 class LocationHandler(tornado.web.RequestHandler):
-    def get(self):
+    async def get(self):
+        # mmcli calls block, keep them off the IOLoop
+        res = await tornado.ioloop.IOLoop.current().run_in_executor(None, self._enable)
+        self.write(res)
+
+    @staticmethod
+    def _enable():
         m = MM.modem()
         if m:
             m.setup_location_query()
-            self.write('3GPP location query enabled')
+            return '3GPP location query enabled'
         else:
-            self.write('No modem found')
+            return 'No modem found'
 
 
 class ModemResetHandler(tornado.web.RequestHandler):
-    def get(self):
+    async def get(self):
         logger.warning('resetting modem')
+        res = await tornado.ioloop.IOLoop.current().run_in_executor(None, self._reset)
+        self.write(res)
+
+    @staticmethod
+    def _reset():
         m = MM.modem()
         if m:
             m.reset()
-            self.write('Modem reset successfully')
+            return 'Modem reset successfully'
         else:
-            self.write('No modem found')
+            return 'No modem found'
 
 
 class SystemSleepHandler(tornado.web.RequestHandler):
-    def get(self):
+    async def get(self):
         logger.warning('putting system to sleep')
         self.write('Initiated system sleep procedure')
-        os.system("rtcwake -s 300 -m off")
+        await self.flush()
+        await run_command_async(['rtcwake', '-s', '300', '-m', 'off'])
 
 
 class SystemRebootHandler(tornado.web.RequestHandler):
-    def get(self):
+    async def get(self):
         logger.warning('rebooting system')
         self.write('Initiated system reboot')
-        os.system("reboot")
+        await self.flush()
+        await run_command_async(['reboot'])
 
 
 class SystemPowerdownHandler(tornado.web.RequestHandler):
-    def get(self):
+    async def get(self):
         logger.warning('powering down system')
         self.write('Initiated system power down')
-        os.system("poweroff")
+        await self.flush()
+        await run_command_async(['poweroff'])
 
 
 class CloudHandler(tornado.web.RequestHandler):
@@ -136,15 +153,91 @@ class GsmCellLocateHandler(tornado.web.RequestHandler):
         self.write(result)
 
 
+class StatisticsResetHandler(tornado.web.RequestHandler):
+    async def get(self):
+        logger.warning('clearing statistics')
+        # Writes statistics file, keep it off the IOLoop
+        await tornado.ioloop.IOLoop.current().run_in_executor(None, Model.instance.reset_statistics)
+        self.write('Statistics cleared')
+
+
+class HistoryHandler(tornado.web.RequestHandler):
+    def get(self):
+        """
+        Returns history of a model field as JSON, list of fields if no field
+        is given
+
+        /history?field=sys-misc.temp&start=<epoch>&end=<epoch>&resolution=60
+        """
+        store = Model.instance.timeseries
+        field = self.get_query_argument('field', None)
+        if not field:
+            self.write({'fields': store.fields()})
+            return
+
+        try:
+            start = self.get_query_argument('start', None)
+            end = self.get_query_argument('end', None)
+            resolution = float(self.get_query_argument('resolution', 1))
+            res = store.query(field,
+                              float(start) if start else None,
+                              float(end) if end else None,
+                              resolution)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+        if res is None:
+            raise tornado.web.HTTPError(404)
+
+        self.write(res)
+
+
+class GnssTrackHandler(tornado.web.RequestHandler):
+    def get(self):
+        """
+        Returns the fixes of the last seconds as JSON, i.e. for the realtime
+        page
+
+        /gnss_track?seconds=30
+        """
+        try:
+            seconds = float(self.get_query_argument('seconds', 60))
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+        self.write({'fixes': GnssPosition.instance.track(seconds)})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def initialize(self, registry):
+        self.registry = registry
+
+    def get(self):
+        """
+        Model data in OpenMetrics text format, for Prometheus and compatible
+        scrapers
+        """
+        self.set_header('Content-Type', CONTENT_TYPE)
+        self.write(self.registry.render())
+
+
 class NotImplementedHandler(tornado.web.RequestHandler):
     def get(self):
         self.write('WARNING: Function not yet implemented')
 
 
 def run_server(port=80):
+    # Prefer persistent D-Bus connection to ModemManager over forking mmcli
+    mm_dbus = MmDBus()
+    if mm_dbus.setup():
+        MM.backend = mm_dbus
+
     model = Model()
     model.setup()
 
+    metrics = MetricsRegistry()
+    metrics.attach(model)
+
     wwan = Wwan(model)
     wwan.setup()
 
@@ -170,6 +263,9 @@ def run_server(port=80):
         (r"/gnss_edit", GnssEditHandler),
         (r"/realtime", RealtimeHandler),
         (r"/traffic", TrafficHandler),
+        (r"/history", HistoryHandler),
+        (r"/gnss_track", GnssTrackHandler),
+        (r"/metrics", MetricsHandler, dict(registry=metrics)),
         (r'/traffic/img/(?P<filename>.+\.png)?', TrafficImageHandler),
 
         (r"/do_location", LocationHandler),
@@ -181,6 +277,7 @@ def run_server(port=80):
         (r"/do_system_sleep", SystemSleepHandler),
         (r"/do_system_reboot", SystemRebootHandler),
         (r"/do_system_powerdown", SystemPowerdownHandler),
+        (r"/do_statistics_reset", StatisticsResetHandler),
 
         (r"/do_ser2net", NotImplementedHandler),
         (r"/do_gnss_state_save", GnssSaveStateHandler),
@@ -0,0 +1,313 @@
+"""
+Persistent spool for telemetry entries
+
+Append-only log of JSON lines, split into segment files. Each entry has a
+sequence number. Entries are acknowledged by sequence number once they are
+uploaded. Segments only holding acknowledged entries are deleted.
+
+Directory layout
+- <first seq>.seg  segment files, one JSON object per line
+- ack              last acknowledged sequence number
+
+To limit eMMC wear, segments are fsync'ed in batches (at most every
+SYNC_INTERVAL seconds and on rotation) and the total size is capped. If the
+cap is exceeded the oldest segment is dropped. After a crash at most the
+last SYNC_INTERVAL seconds are lost, a partially written last line is
+discarded on replay.
+
+Not thread safe, the owner (TransmitQueue) serializes access. Only
+read_segments() may run without, so disk reads don't block writers.
+"""
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('vcu-ui')
+
+
+class Segment():
+    def __init__(self, first_seq, path, size=0):
+        super().__init__()
+
+        self.first_seq = first_seq
+        self.path = path
+        self.size = size
+
+
+class Spool():
+    SEGMENT_SIZE = 1024 * 1024
+    MAX_SIZE = 32 * 1024 * 1024
+    SYNC_INTERVAL = 10.0
+
+    SUFFIX = '.seg'
+
+    def __init__(self, path, max_size=MAX_SIZE, segment_size=SEGMENT_SIZE, sync_interval=SYNC_INTERVAL):
+        super().__init__()
+
+        self.path = path
+        self.max_size = max_size
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+
+        self.acked = 0
+        self.next_seq = 1
+        self.dropped = 0
+
+        self._segments = list()
+        self._file = None
+        self._cursor = None
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+
+    @property
+    def head_seq(self):
+        """
+        Sequence number of oldest not yet acknowledged entry
+        """
+        if self._segments:
+            return max(self.acked + 1, self._segments[0].first_seq)
+        else:
+            return self.next_seq
+
+    def num_entries(self):
+        return self.next_seq - self.head_seq
+
+    def open(self):
+        """
+        Opens spool, creates directory if required
+
+        Scans existing segments, repairs a partially written last entry and
+        removes acknowledged segments.
+        """
+        os.makedirs(self.path, exist_ok=True)
+
+        self.acked = self._read_ack()
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(self.SUFFIX):
+                try:
+                    first_seq = int(name[:-len(self.SUFFIX)])
+                except ValueError:
+                    continue
+
+                path = os.path.join(self.path, name)
+                self._segments.append(Segment(first_seq, path, os.path.getsize(path)))
+
+        if self._segments:
+            last = self._segments[-1]
+            self.next_seq = self._repair(last)
+            if last.size == 0:
+                self._delete(last)
+        self.next_seq = max(self.next_seq, self.acked + 1)
+
+        self._remove_acked()
+
+        num = self.num_entries()
+        if num:
+            logger.info(f'spool {self.path} has {num} pending entries')
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def append(self, entry):
+        """
+        Appends entry, assigns sequence number to entry['seq']
+
+        Returns number of entries dropped to stay within size limit
+        """
+        entry['seq'] = self.next_seq
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode()
+
+        # After open() always start new segment, never append to old ones
+        if self._file is None or self._segments[-1].size >= self.segment_size:
+            self._rotate()
+
+        self._file.write(line)
+        self._segments[-1].size += len(line)
+        self.next_seq += 1
+        self._unsynced = True
+
+        dropped = self._enforce_limit()
+
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+        return dropped
+
+    def read(self, from_seq, num):
+        """
+        Returns up to num entries, starting at sequence number from_seq
+        """
+        entries, cursor = self.read_segments(self.read_plan(from_seq), from_seq, num)
+        self.set_cursor(cursor)
+        return entries
+
+    def read_plan(self, from_seq):
+        """
+        Returns list of (first seq, path, offset) of the segments to read for
+        entries from from_seq on
+
+        Starts at the position where the previous read stopped if it ended
+        right before from_seq, so segments are not parsed from the start on
+        every read.
+        """
+        if self._file:
+            self._file.flush()
+
+        start = 0
+        for i, segment in enumerate(self._segments):
+            if segment.first_seq <= from_seq:
+                start = i
+
+        plan = list()
+        for segment in self._segments[start:]:
+            offset = 0
+            if self._cursor and self._cursor[0] == from_seq and self._cursor[1] == segment.first_seq:
+                offset = self._cursor[2]
+            plan.append((segment.first_seq, segment.path, offset))
+
+        return plan
+
+    @staticmethod
+    def read_segments(plan, from_seq, num):
+        """
+        Reads up to num entries from segments in plan, see read_plan()
+
+        Only reads files, so it can run while the owner keeps appending and
+        acknowledging. Segments deleted in the meantime are skipped, an
+        incomplete last line ends the read.
+
+        Returns list of entries and cursor for set_cursor()
+        """
+        res = list()
+        cursor = None
+        for first_seq, path, offset in plan:
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break
+
+                        offset += len(line)
+                        if entry['seq'] >= from_seq:
+                            res.append(entry)
+                            cursor = (entry['seq'] + 1, first_seq, offset)
+                            if len(res) >= num:
+                                return res, cursor
+            except FileNotFoundError:
+                continue
+
+        return res, cursor
+
+    def set_cursor(self, cursor):
+        """
+        Remembers where a read stopped, (next seq, segment first seq, offset)
+        """
+        self._cursor = cursor
+
+    def ack(self, seq):
+        """
+        Marks all entries up to and including seq as transmitted
+        """
+        if seq <= self.acked:
+            return
+
+        self.acked = seq
+        self._write_ack()
+        self._remove_acked()
+
+    def sync(self):
+        if self._file and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+
+        self._last_sync = time.monotonic()
+
+    def _rotate(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+
+        name = f'{self.next_seq:012d}{self.SUFFIX}'
+        segment = Segment(self.next_seq, os.path.join(self.path, name))
+        self._segments.append(segment)
+        self._file = open(segment.path, 'ab')
+
+    def _enforce_limit(self):
+        dropped = 0
+        while len(self._segments) > 1 and sum(s.size for s in self._segments) > self.max_size:
+            head = self.head_seq
+            self._delete(self._segments[0])
+            dropped += self.head_seq - head
+
+        if dropped:
+            logger.warning(f'spool size limit reached, dropped {dropped} entries')
+            self.dropped += dropped
+
+        return dropped
+
+    def _remove_acked(self):
+        # A segment is done if all its entries, i.e. everything before the
+        # next segment, are acknowledged. The current segment is kept.
+        while len(self._segments) > 1 and self._segments[1].first_seq <= self.acked + 1:
+            self._delete(self._segments[0])
+
+    def _delete(self, segment):
+        self._segments.remove(segment)
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            logger.warning(f'cannot remove spool segment {segment.path}')
+            logger.warning(e)
+
+    def _repair(self, segment):
+        """
+        Truncates partially written entries at end of segment
+
+        Returns sequence number to use for next entry
+        """
+        next_seq = segment.first_seq
+        good = 0
+        with open(segment.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('incomplete line')
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                next_seq = entry['seq'] + 1
+                good += len(line)
+
+        if good != segment.size:
+            logger.warning(f'truncating damaged spool segment {segment.path} at {good}')
+            os.truncate(segment.path, good)
+            segment.size = good
+
+        return next_seq
+
+    def _read_ack(self):
+        try:
+            with open(os.path.join(self.path, 'ack')) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 0
+
+    def _write_ack(self):
+        path = os.path.join(self.path, 'ack')
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(f'{self.acked}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
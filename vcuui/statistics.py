@@ -0,0 +1,286 @@
+"""
+Statistics of model values
+
+Keeps count, min, max, mean and percentiles of selected model fields,
+updated incrementally whenever the model publishes the origin. Fields are
+named by their path, i.e. 'sys-misc.temp' or 'link.delay'.
+
+Percentiles are estimated with the P-square algorithm (Jain & Chlamtac),
+which needs five markers per percentile instead of storing the samples.
+
+The state can be saved to a JSON file and loaded on start, so statistics
+cover more than one power cycle.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger('vcu-ui')
+
+
+class P2Quantile():
+    """
+    Streaming estimate of the p-quantile
+    """
+    def __init__(self, p):
+        super().__init__()
+
+        self.p = p
+        self.q = list()     # Marker heights
+        self.n = [0, 1, 2, 3, 4]    # Marker positions
+        self.np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]   # Desired positions
+        self.dn = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x):
+        q = self.q
+        if len(q) < 5:
+            bisect.insort(q, x)
+            return
+
+        n = self.n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        for i in range(1, 4):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = self._parabolic(i, d)
+                if q[i - 1] < qp < q[i + 1]:
+                    q[i] = qp
+                else:
+                    q[i] += d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def value(self):
+        q = self.q
+        if not q:
+            return None
+        if len(q) < 5:
+            # Exact for the first samples
+            return q[int(round(self.p * (len(q) - 1)))]
+        return q[2]
+
+    def state(self):
+        return {'p': self.p, 'q': list(self.q), 'n': list(self.n), 'np': list(self.np)}
+
+    @classmethod
+    def from_state(cls, state):
+        res = cls(state['p'])
+        res.q = list(state['q'])
+        res.n = list(state['n'])
+        res.np = list(state['np'])
+        return res
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+
+class Stat():
+    """
+    Specification of statistics for one field
+
+    quantiles: percentiles to estimate, i.e. (0.5, 0.95)
+    valid: optional function, samples for which it returns False are
+        ignored, i.e. link delay 0.0 which means ping failed
+    """
+    def __init__(self, quantiles=(), valid=None):
+        super().__init__()
+
+        self.quantiles = quantiles
+        self.valid = valid
+
+
+class FieldStats():
+    def __init__(self, quantiles=()):
+        super().__init__()
+
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+
+    def add(self, x):
+        self.count += 1
+        self.mean += (x - self.mean) / self.count
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        for q in self.quantiles:
+            q.add(x)
+
+    def info(self):
+        res = {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': round(self.mean, 6) if self.count else None,
+        }
+        for q in self.quantiles:
+            v = q.value()
+            res[f'p{q.p * 100:g}'] = round(v, 6) if v is not None else None
+
+        return res
+
+    def state(self):
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'quantiles': [q.state() for q in self.quantiles],
+        }
+
+    @classmethod
+    def from_state(cls, state, quantiles):
+        res = cls(quantiles)
+        res.count = state['count']
+        res.min = state['min']
+        res.max = state['max']
+        res.mean = state['mean']
+
+        # Keep estimates only for percentiles still configured
+        saved = {q['p']: q for q in state.get('quantiles', ())}
+        res.quantiles = [P2Quantile.from_state(saved[p]) if p in saved else P2Quantile(p) for p in quantiles]
+        return res
+
+
+class Statistics():
+    """
+    Statistics for a set of model fields
+
+    Not thread safe, the model calls it with its lock held.
+    """
+    def __init__(self, specs, path=None):
+        """
+        specs: dictionary of Stat, indexed by field path
+        path: file to save state in, no persistence if None
+        """
+        super().__init__()
+
+        self.specs = specs
+        self.path = path
+        self.fields = {name: FieldStats(spec.quantiles) for name, spec in specs.items()}
+
+        # Field paths by origin, split once for fast lookup in update()
+        self._origins = dict()
+        for name in specs:
+            origin, _, key = name.partition('.')
+            self._origins.setdefault(origin, list()).append((name, key.split('.') if key else []))
+
+    def update(self, origin, value):
+        """
+        Adds samples of all fields of origin found in value
+
+        Returns list of changed field paths
+        """
+        changed = list()
+        for name, keys in self._origins.get(origin, ()):
+            x = self._lookup(value, keys)
+            if x is None:
+                continue
+
+            valid = self.specs[name].valid
+            if valid and not valid(x):
+                continue
+
+            self.fields[name].add(x)
+            changed.append(name)
+
+        return changed
+
+    def info(self):
+        """
+        Returns dictionary of statistics, indexed by field path. Fields
+        without samples are left out.
+        """
+        return {name: f.info() for name, f in self.fields.items() if f.count}
+
+    def reset(self, name=None):
+        """
+        Clears statistics of field name, or all fields if name is None
+        """
+        names = [name] if name else list(self.fields)
+        for n in names:
+            if n in self.fields:
+                self.fields[n] = FieldStats(self.specs[n].quantiles)
+
+    def load(self):
+        if not self.path:
+            return
+
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f'cannot load statistics from {self.path}')
+            logger.warning(e)
+            return
+
+        for name, field_state in state.get('fields', dict()).items():
+            if name in self.specs:
+                try:
+                    self.fields[name] = FieldStats.from_state(field_state, self.specs[name].quantiles)
+                except (KeyError, TypeError, ValueError):
+                    logger.warning(f'ignoring invalid saved statistics for {name}')
+
+    def state(self):
+        return {'fields': {name: f.state() for name, f in self.fields.items()}}
+
+    def save(self, state=None):
+        """
+        Writes state to file, atomically replaces the previous file
+
+        state: state to write, taken from self if None. Allows callers to
+            get the state with a lock held and write without.
+        """
+        if not self.path:
+            return
+
+        if state is None:
+            state = self.state()
+
+        tmp = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(state, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f'cannot save statistics to {self.path}')
+            logger.warning(e)
+
+    @staticmethod
+    def _lookup(value, keys):
+        for key in keys:
+            try:
+                value = value[int(key) if isinstance(value, (list, tuple)) else key]
+            except (KeyError, IndexError, TypeError, ValueError):
+                return None
+
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+
+        return value
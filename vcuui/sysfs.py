@@ -0,0 +1,122 @@
+"""
+Reader for sysfs and procfs attributes
+
+Keeps file descriptors open and re-reads the attributes with pread() at
+offset 0. The kernel regenerates sysfs and procfs content on each read
+from offset 0, so this returns fresh values with one syscall instead of
+open/read/close.
+
+Attributes that disappear (hot-unplug of a device, interface removed)
+are reopened on the next read.
+"""
+import errno
+import logging
+import os
+import threading
+
+logger = logging.getLogger('vcu-ui')
+
+# errno values indicating the underlying object went away
+REOPEN_ERRORS = (errno.ENODEV, errno.ENOENT, errno.ESTALE, errno.ENXIO)
+
+
+class Attribute():
+    # Sysfs attributes are limited to one page, procfs files we read
+    # (meminfo, loadavg) fit in one page as well
+    BUF_SIZE = 4096
+
+    def __init__(self, path):
+        super().__init__()
+
+        self.path = path
+        self.fd = None
+
+    def read(self):
+        """
+        Returns content of attribute as stripped string
+
+        Raises FileNotFoundError (or other OSError) if attribute doesn't
+        exist.
+        """
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+
+        try:
+            data = self._pread()
+        except OSError as e:
+            if e.errno not in REOPEN_ERRORS:
+                raise
+
+            # Device was removed and maybe added again, try once with new fd
+            self.close()
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+            data = self._pread()
+
+        return data.decode().strip()
+
+    def close(self):
+        if self.fd is not None:
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+            self.fd = None
+
+    def _pread(self):
+        data = os.pread(self.fd, self.BUF_SIZE, 0)
+        if len(data) == self.BUF_SIZE:
+            # Rarely needed, continue reading until end of file
+            chunks = [data]
+            while len(data) == self.BUF_SIZE:
+                data = os.pread(self.fd, self.BUF_SIZE, self.BUF_SIZE * len(chunks))
+                chunks.append(data)
+            data = b''.join(chunks)
+
+        return data
+
+
+class SysfsReader():
+    def __init__(self):
+        super().__init__()
+
+        self.lock = threading.Lock()
+        self.attributes = dict()
+
+    def read(self, path):
+        """
+        Returns content of file at path as stripped string
+
+        Raises FileNotFoundError if file doesn't exist.
+        """
+        return self._attribute(path).read()
+
+    def read_batch(self, paths):
+        """
+        Reads several files in one call
+
+        Returns dictionary indexed by path. Files that can't be read are
+        reported as None.
+        """
+        res = dict()
+        for path in paths:
+            try:
+                res[path] = self._attribute(path).read()
+            except OSError:
+                res[path] = None
+
+        return res
+
+    def close(self):
+        with self.lock:
+            for attr in self.attributes.values():
+                attr.close()
+            self.attributes.clear()
+
+    def _attribute(self, path):
+        with self.lock:
+            attr = self.attributes.get(path)
+            if attr is None:
+                attr = Attribute(path)
+                self.attributes[path] = attr
+
+            return attr
@@ -1,9 +1,14 @@
-import subprocess
+import os
+import time
+
+from vcuui.command import run_command
+from vcuui.sysfs import SysfsReader
 
 
 class SysInfoBase():
     def __init__(self):
-        pass
+        # Keeps files read on each poll open
+        self.reader = SysfsReader()
 
     def poll(self):
         pass
@@ -45,31 +50,57 @@ class SysInfoBase():
             return "unknown"
 
     def meminfo(self):
-        with open('/proc/meminfo') as f:
-            res = f.readlines()
-            for line in res:
-                if 'MemTotal' in line:
-                    total = int(line.split()[1].strip())
-                elif 'MemFree' in line:
-                    free = int(line.split()[1].strip())
+        res = self.reader.read('/proc/meminfo')
+        for line in res.splitlines():
+            if 'MemTotal' in line:
+                total = int(line.split()[1].strip())
+            elif 'MemFree' in line:
+                free = int(line.split()[1].strip())
 
         return total, free
 
     def part_size(self, partition):
-        cp = subprocess.run(['/usr/bin/df', '-h', partition], stdout=subprocess.PIPE)
-        res = cp.stdout.decode().strip()
-        for line in res.splitlines():
-            if partition in line:
-                res = line
+        """
+        Returns size information of partition in bytes, same values as df
 
-        return res
+        size, used, free (available to non-root users) and percent used,
+        None if partition doesn't exist
+        """
+        try:
+            st = os.statvfs(partition)
+        except OSError:
+            return None
+
+        size = st.f_blocks * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        free = st.f_bavail * st.f_frsize
+
+        # df rounds percentage up and relates to space usable by non-root
+        usable = used + free
+        percent = -(-used * 100 // usable) if usable else 0
+
+        return {'size': size, 'used': used, 'free': free, 'percent': percent}
 
     def emmc_wear(self):
+        """
+        Returns life time estimation of eMMC for SLC (type A) and MLC (type B)
+
+        Kernel exports both values in sysfs, e.g. '0x01 0x02'. Falls back to
+        mmc tool if not available.
+        """
+        try:
+            with open('/sys/block/mmcblk1/device/life_time') as f:
+                res_a, res_b = f.readline().split()
+                return int(res_a, 16) * 10.0, int(res_b, 16) * 10.0
+        except (OSError, ValueError):
+            return self._emmc_wear_mmc()
+
+    def _emmc_wear_mmc(self):
         """
         Check for following output in mmc command
         eMMC Life Time Estimation A [EXT_CSD_DEVICE_LIFE_TIME_EST_TYP_A]: 0x01
         """
-        cp = subprocess.run(['/usr/bin/mmc', 'extcsd', 'read', '/dev/mmcblk1'], stdout=subprocess.PIPE)
+        cp = run_command(['/usr/bin/mmc', 'extcsd', 'read', '/dev/mmcblk1'])
         res = cp.stdout.decode().strip()
 
         res_a = 0
@@ -84,34 +115,48 @@ class SysInfoBase():
         return res_a, res_b
 
     def load(self):
-        with open('/proc/loadavg') as f:
-            res = f.readline()
-            info = res.split()
-            return info[0:3]
+        res = self.reader.read('/proc/loadavg')
+        info = res.split()
+        return [float(v) for v in info[0:3]]
 
     def date(self):
-        cp = subprocess.run(['/usr/bin/date'], stdout=subprocess.PIPE)
-        res = cp.stdout.decode().strip()
-        return res
+        # Same format as date tool, e.g. 'Tue Dec  6 08:12:01 UTC 2022'
+        return time.strftime('%a %b %e %H:%M:%S %Z %Y')
+
+    def uptime_secs(self):
+        res = self.reader.read('/proc/uptime')
+        return int(float(res.split()[0]))
 
     def uptime(self):
-        cp = subprocess.run(['/usr/bin/uptime'], stdout=subprocess.PIPE)
-        res = cp.stdout.decode().strip()
-        start = res.find("up")
-        end = res.find(",  load")
-        return res[start:end]
+        return self.format_uptime(self.uptime_secs())
 
-    def ifinfo(self, name):
-        try:
-            rxpath = f'/sys/class/net/{name}/statistics/rx_bytes'
-            with open(rxpath) as f:
-                rxbytes = f.readline().strip()
+    @staticmethod
+    def format_uptime(secs):
+        """
+        Formats uptime like uptime tool, e.g. 'up 2 days,  3:04' or 'up 5 min'
+        """
+        mins = secs // 60
+        days = mins // (24 * 60)
+        hours = (mins // 60) % 24
+        mins = mins % 60
+
+        res = 'up '
+        if days:
+            res += f'{days} day{"s" if days != 1 else ""}, '
+        if hours:
+            res += f'{hours:2}:{mins:02}'
+        else:
+            res += f'{mins} min'
 
-            txpath = f'/sys/class/net/{name}/statistics/tx_bytes'
-            with open(txpath) as f:
-                txbytes = f.readline().strip()
+        return res
 
-        except FileNotFoundError:
-            rxbytes, txbytes = None, None
+    def ifinfo(self, name):
+        rxpath = f'/sys/class/net/{name}/statistics/rx_bytes'
+        txpath = f'/sys/class/net/{name}/statistics/tx_bytes'
+        res = self.reader.read_batch((rxpath, txpath))
+        rxbytes, txbytes = res[rxpath], res[txpath]
+
+        if rxbytes is None or txbytes is None:
+            return None, None
 
-        return rxbytes, txbytes
+        return int(rxbytes), int(txbytes)
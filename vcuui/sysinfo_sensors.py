@@ -1,7 +1,7 @@
 import re
-import subprocess
 from os import path
 
+from vcuui.command import run_command
 from vcuui.sysinfo_base import SysInfoBase
 
 
@@ -25,7 +25,7 @@ class SysInfoSensors(SysInfoBase):
         self.volt_rtc = None
 
     def poll(self):
-        cp = subprocess.run([SysInfoSensors.BIN], stdout=subprocess.PIPE)
+        cp = run_command([SysInfoSensors.BIN])
         res = cp.stdout.decode().strip()
         self.sensor_res = res
 
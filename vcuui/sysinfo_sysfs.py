@@ -24,25 +24,21 @@ class SysInfoSysFs(SysInfoBase):
         self.lm75_path = '/sys/bus/i2c/drivers/lm75/1-0048/hwmon/hwmon1'
 
     def temperature(self):
-        with open(f'{self.da9063_path}/temp1_input') as f:
-            temp_in_milli_c = f.readline().strip()
-            return round(float(temp_in_milli_c) / 1000.0, 1)
+        temp_in_milli_c = self.reader.read(f'{self.da9063_path}/temp1_input')
+        return round(float(temp_in_milli_c) / 1000.0, 1)
 
     def input_voltage(self):
-        with open(f'{self.da9063_path}/in1_input') as f:
-            adc_millivolts = f.readline().strip()
-            return round(float(adc_millivolts) / 1000.0 * 15.0, 1)
+        adc_millivolts = self.reader.read(f'{self.da9063_path}/in1_input')
+        return round(float(adc_millivolts) / 1000.0 * 15.0, 1)
 
     def rtc_voltage(self):
-        with open(f'{self.da9063_path}/in4_input') as f:
-            adc_millivolts = f.readline().strip()
-            return round(float(adc_millivolts) / 1000.0, 3)
+        adc_millivolts = self.reader.read(f'{self.da9063_path}/in4_input')
+        return round(float(adc_millivolts) / 1000.0, 3)
 
     def temperature_lm75(self):
         # TODO: Test
         try:
-            with open(f'{self.lm75_path}/temp_input') as f:
-                temp_in_milli_c = f.readline().strip()
-                return round(float(temp_in_milli_c) / 1000.0, 1)
+            temp_in_milli_c = self.reader.read(f'{self.lm75_path}/temp_input')
+            return round(float(temp_in_milli_c) / 1000.0, 1)
         except FileNotFoundError:
             pass
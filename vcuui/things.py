@@ -6,18 +6,36 @@ Store your device token in /etc/thingsboard.conf
 [API]
 Server=name:port
 Token=xyz
+
+Telemetry is kept on disk while it can't be uploaded. To change the
+location (or disable with an empty value) add
+
+[Spool]
+Path=/data/vcuui/spool
+
+Telemetry is sent gzip compressed. If the server rejects compressed data
+(HTTP 400 or 415) compression is paused for an hour. To disable it
+completely add
+
+[API]
+Compress=no
 """
 import configparser
 import json
 import logging
-import math
+import os
 import threading
 import time
-from io import BytesIO
 
 import pycurl
 
+from vcuui.deadband import DeadbandFilter, Rule
+from vcuui.http_client import HttpClient
+from vcuui.payload import PayloadEncoder
+from vcuui.trajectory import TrajectorySimplifier
 from vcuui.transmit_queue import TransmitQueue
+from vcuui.upload_policy import UploadPolicy
+from vcuui.uploader import Uploader
 from vcuui._version import __version__ as ui_version
 
 logger = logging.getLogger('vcu-ui')
@@ -27,17 +45,23 @@ class Things(threading.Thread):
     # Singleton accessor
     instance = None
 
-    # Upload every 30 seconds
+    # Initial upload period, adapted to link quality by UploadPolicy
     TELEMETRY_UPLOAD_PERIOD = 30
 
-    # Upload at most 120 entries. Assuming around 100 bytes per entry,
-    # this makes 12 kBytes.
-    TELEMETRY_MAX_ITEMS_TO_UPLOAD = 120
+    # Look at up to 2000 entries per upload. The actual number sent is
+    # limited by the byte budget of the payload encoder, which is adapted
+    # to link quality by UploadPolicy.
+    TELEMETRY_MAX_ITEMS_TO_UPLOAD = 2000
 
     # New entries are dropped when this size is reached
     # Assumption is that this queue size is good for 10 minutes
     MAX_QUEUE_SIZE = 600
 
+    # Spool directory for telemetry if /data partition is present. With
+    # spool, MAX_QUEUE_SIZE only limits entries held in memory.
+    SPOOL_PARTITION = '/data'
+    SPOOL_PATH = '/data/vcuui/spool'
+
     def __init__(self, model):
         super().__init__()
 
@@ -59,10 +83,29 @@ class Things(threading.Thread):
             logger.info(e)
             self.has_server = False
 
+        self._client = HttpClient()
+        self._telemetry_backlog = False
+        self._policy = UploadPolicy()
+        self._uploader = Uploader('things-uploader', self._upload, self.TELEMETRY_UPLOAD_PERIOD,
+                                  pending=lambda: self._telemetry_backlog and self._policy.drain)
+        compress = self.config.getboolean('API', 'Compress', fallback=True)
+        self._encoder = PayloadEncoder(self._policy.byte_budget, compress=compress)
         self._attributes_queue = TransmitQueue(1)
-        self._data_queue = TransmitQueue(self.MAX_QUEUE_SIZE)
+        self._data_queue = self._create_data_queue()
         self._data_collector = ThingsDataCollector(model, self._data_queue, self._attributes_queue)
 
+    def _create_data_queue(self):
+        default = self.SPOOL_PATH if os.path.isdir(self.SPOOL_PARTITION) else ''
+        spool_path = self.config.get('Spool', 'Path', fallback=default)
+        if spool_path:
+            try:
+                return TransmitQueue(self.MAX_QUEUE_SIZE, spool_path)
+            except OSError as e:
+                logger.warning(f'cannot use spool {spool_path}, keeping telemetry in memory only')
+                logger.warning(e)
+
+        return TransmitQueue(self.MAX_QUEUE_SIZE)
+
     def setup(self):
         self.daemon = True
         if self.has_server:
@@ -95,49 +138,91 @@ class Things(threading.Thread):
         return res
 
     def run(self):
-        cnt = 0
+        """
+        Tracks link and upload state
+
+        Uploads are done by the uploader thread. This loop never blocks on
+        the server.
+        """
+        self._uploader.start()
 
         while True:
             if self.active:
-                next_state = self.state
                 md = self.model.get_all()
+                self._uploader.set_link(self._link_ready(md))
+                self._adapt(md)
 
-                if self.state != 'connected':
-                    # Check if we are connected
-                    if 'modem' in md:
-                        m = md['modem']
-                        if 'modem-id' in m:
-                            if 'bearer-id' in m:
-                                # logger.info('link ready, changing to connected state')
-                                cnt = 0
-                                next_state = 'connected'
-
-                elif self.state == 'connected':
-                    # Upload any pending data
-                    self._upload_attributes()
-
-                    if cnt % Things.TELEMETRY_UPLOAD_PERIOD == 5:
-                        self._upload_telemetry()
-
-                    # TODO: check for error and switch to disconnected state in case of problem
+                next_state = self.state
+                upload_state = self._uploader.state
+                if upload_state == 'connected':
+                    next_state = 'connected'
+                elif upload_state in ('disconnected', 'offline') and self.state != 'init':
+                    # Link lost or server not reachable since several retries
+                    next_state = 'disconnected'
 
                 # state change
                 if self.state != next_state:
                     logger.info(f'changed state from {self.state} to {next_state}')
                     self.state = next_state
 
-                cnt += 1
+                upload_info = self._uploader.stats()
+                upload_info.update(self._policy.info())
+                upload_info['state'] = self.state
+                upload_info['queue'] = self._data_queue.stats()
+                self.model.publish('things-upload', upload_info)
+            else:
+                self._uploader.set_link(False)
 
             time.sleep(1.0)
 
+    def _adapt(self, md):
+        """
+        Adapts upload period and batch size to link quality and backlog
+        """
+        if self._policy.update(md, self._data_queue.num_entries()):
+            logger.info(f'upload policy {self._policy.link_class}, period {self._policy.period} s, '
+                        f'budget {self._policy.byte_budget} bytes')
+            self._uploader.set_period(self._policy.period)
+            self._encoder.byte_budget = self._policy.byte_budget
+
+    @staticmethod
+    def _link_ready(md):
+        if 'modem' in md:
+            m = md['modem']
+            return 'modem-id' in m and 'bearer-id' in m
+
+        return False
+
+    def _upload(self):
+        """
+        Upload function run by uploader thread
+
+        Returns True if data was sent, False on error and None if there was
+        nothing to send.
+        """
+        res_attrs = self._upload_attributes()
+        if res_attrs is False:
+            return False
+
+        res_telemetry = self._upload_telemetry()
+        if res_telemetry is None:
+            return res_attrs
+
+        return res_telemetry
+
     def _upload_telemetry(self):
         """
         Sends telemtry data
 
-        Checks for entries in _data_queue If entries are present, gets up to
-        TELEMETRY_MAX_ITEMS_TO_UPLOAD entries and tries to upload them. If upload is ok,
-        removes entries from queue. Otherwise leaves entries for next try.
+        Checks for entries in _data_queue If entries are present, encodes as
+        many entries as fit the payload byte budget and tries to upload them.
+        If upload is ok, removes entries from queue. Otherwise leaves entries
+        for next try.
+
+        Returns True if upload was ok, False if it failed and None if queue
+        is empty.
         """
+        self._telemetry_backlog = False
 
         # Are there any entries at all?
         queue_entries = self._data_queue.num_entries()
@@ -146,114 +231,134 @@ class Things(threading.Thread):
             data = {'tb-qsize': queue_entries}
             self._data_queue.add(data)
 
-            # Build HTTP query string with queue data
+            # Encode as many entries as fit the byte budget
             entries = self._data_queue.first_entries(Things.TELEMETRY_MAX_ITEMS_TO_UPLOAD)
-            num_entries = len(entries)
-            assert len(entries) >= 0
-
-            post_data = list()
-            for entry in entries:
-                data = {'ts': entry['time'], 'values': entry['data']}
-                post_data.append(data)
+            payload = self._encoder.encode(entries)
 
             # Upload the collected data
-            res = self._post_data('telemetry', post_data)
-            if res:
+            code = self._post_data('telemetry', payload.body, payload.headers, payload.stats())
+            if self._encoder.response(payload, code):
+                logger.warning(f'server rejected compressed data ({code}), pausing compression')
+                payload = self._encoder.encode(entries)
+                code = self._post_data('telemetry', payload.body, payload.headers, payload.stats())
+
+            if code == 200:
                 # Transmission was ok, remove data from queue
+                num_entries = payload.num_entries
                 self._data_queue.remove_first(num_entries)
                 logger.debug(f'removing {num_entries} entries from queue')
+
+                # More than fit into one payload, continue right away
+                self._telemetry_backlog = num_entries < queue_entries + 1
+                return True
             else:
                 logger.warning('could not upload telemetry data, keeping in queue')
                 logger.warning(f'{queue_entries} entries in queue')
+                return False
 
     def _upload_attributes(self):
         """
         Upload a single attribute entry.
 
+        Returns True if upload was ok, False if it failed and None if there
+        are no attributes to send.
+
         Assumes all attributes are in one entry
         TODO: Rework to allow more than one entry, combine code with _upload_telemetry
         """
         if self._attributes_queue.num_entries() >= 1:
             entry = self._attributes_queue.all_entries()[0]
-            post_data = entry['data']
+            body = json.dumps(entry['data'], separators=(',', ':')).encode()
 
-            res = self._post_data('attributes', post_data)
-            if res:
+            code = self._post_data('attributes', body, ['Content-Type:application/json'])
+            if code == 200:
                 # Transmission was ok, remove data from queue
                 self._attributes_queue.remove_first(1)
+                return True
             else:
                 logger.warning('could not upload attribute data, keeping in queue')
+                return False
 
-    def _post_data(self, msgtype, payload):
+    def _post_data(self, msgtype, body, headers, stats=None):
         """
         Sends data with HTTP(S) POST request to Thingsboard server
 
-        Captures pycurl exceptions and checks for 200 (OK) response
-        from server.
+        Captures pycurl exceptions and returns the HTTP response code or
+        None if the request failed. stats of the payload are published
+        along with the request timings.
 
-        TODO:
-        Check timeout behavior. While we are transmitting data is not captured and can get lost!
-        Ideally this method would run in it's own thread with transmit queue
-        """
-        res = False
+        The connection to the server is kept open between calls.
 
+        Runs in uploader thread, data collection continues while waiting
+        for the server.
+        """
         assert msgtype == 'attributes' or msgtype == 'telemetry'
 
-        c = pycurl.Curl()
-        c.setopt(pycurl.URL, f'{self.api_server}/api/v1/{self.api_token}/{msgtype}')
-        c.setopt(pycurl.HTTPHEADER, ['Content-Type:application/json'])
-        c.setopt(pycurl.POST, 1)
-        c.setopt(pycurl.CONNECTTIMEOUT_MS, 3000)
-        c.setopt(pycurl.TIMEOUT_MS, 4000)
-        # c.setopt(c.VERBOSE, True)
-
-        body_as_json_string = json.dumps(payload)  # dict to json
-        body_as_json_bytes = body_as_json_string.encode()
-        body_as_file_object = BytesIO(body_as_json_bytes)
-
-        # prepare and send. See also: pycurl.READFUNCTION to pass function instead
-        c.setopt(pycurl.READDATA, body_as_file_object)
-        c.setopt(pycurl.POSTFIELDSIZE, len(body_as_json_string))
+        url = f'{self.api_server}/api/v1/{self.api_token}/{msgtype}'
 
         try:
             info = dict()
             info['state'] = 'sending'
             self.model.publish('things', info)
 
-            c.perform()
-            bytes_sent = len(body_as_json_bytes)
+            response = self._client.post(url, body, headers)
+            bytes_sent = len(body)
             logger.debug(f'sent {bytes_sent} bytes to {self.api_server}')
 
             info['state'] = 'sent'
             info['bytes'] = bytes_sent
+            if stats:
+                info['payload'] = stats
+            info['timings'] = response.timings
+            info['client'] = self._client.stats()
             self.model.publish('things', info)
 
-            response = int(c.getinfo(pycurl.RESPONSE_CODE))
-            logger.debug(f'got response {response} from server')
-
-            if response == 200:
-                bytes_sent = int(c.getinfo(pycurl.CONTENT_LENGTH_UPLOAD))
-                logger.debug(f'{bytes_sent} bytes uploaded')
+            logger.debug(f'got response {response.code} from server')
+            if response.code != 200:
+                logger.warning(f'bad HTTP response {response.code} received')
 
-                res = True
-            else:
-                logger.warning(f'bad HTTP response {response} received')
+            return response.code
 
         except pycurl.error as e:
             logger.warning("failed uploading data to Thingsboard")
             logger.warning(e)
-        finally:
-            c.close()
-
-        return res
 
 
 class ThingsDataCollector(threading.Thread):
     # Check/Upload every 120 seconds
     ATTRIBUTE_CHECKING_PERIOD = 120
 
-    # Suppress GNSS update if movement less than this distance in meter
-    GNSS_UPDATE_DISTANCE = 1.5
+    # Maximum deviation of reported track from driven path in meter
+    GNSS_TOLERANCE = 5.0
+
+    # Position values sent to cloud
+    GNSS_KEYS = ('fix', 'lon', 'lat', 'alt', 'speed', 'pdop')
+
+    # Report telemetry values only on significant change, but at least
+    # every 5 minutes (default heartbeat of Rule)
+    MB = 1024 * 1024
+    FILTER_RULES = {
+        'temperature': Rule(abs=1.0),
+        'temperature-board': Rule(abs=1.0),
+        'cpu-load': Rule(abs=0.2),
+        'voltage-in': Rule(abs=0.2),
+        'mem-free': Rule(rel=0.05),
+        'wwan-delay': Rule(abs=20, rel=0.25),
+        'siqnal-qlt': Rule(abs=5),
+        'signal-qlt-ext': Rule(abs=5),
+        'bearer-uptime': Rule(abs=300),
+        'wwan0-rx': Rule(abs=0.1 * MB),
+        'wwan0-tx': Rule(abs=0.1 * MB),
+        'wlan0-rx': Rule(abs=0.1 * MB),
+        'wlan0-tx': Rule(abs=0.1 * MB),
+        'broadr0-quality': Rule(abs=5),
+        'wwan0-rx-day': Rule(abs=1 * MB),
+        'wwan0-tx-day': Rule(abs=1 * MB),
+        'wwan0-rx-month': Rule(abs=1 * MB),
+        'wwan0-tx-month': Rule(abs=1 * MB),
+        # Live data, at most twice per second, once a minute if constant
+        'obd2-speed': Rule(abs=1.0, min_interval=0.5, max_silence=60.0),
+    }
 
     def __init__(self, model, data_queue, attributes_queue):
         super().__init__()
@@ -263,16 +368,24 @@ class ThingsDataCollector(threading.Thread):
         self._data_queue = data_queue
         self._attributes_queue = attributes_queue
 
-        self.lat_last_rad = 0
-        self.lon_last_rad = 0
-        self.obd2_last_speed = -1
+        self.pos_last = None
+        self.trajectory = TrajectorySimplifier(self.GNSS_TOLERANCE)
         self.rat_last = None
         self.rat2_last = None
+        self.filter = DeadbandFilter(self.FILTER_RULES)
+
+        # Position and speed changes are handled as soon as they are published
+        self.live_changed = threading.Event()
+        self.model.subscribe(['gnss-pos', 'obd2'], lambda origin, value: self.live_changed.set())
 
         self.daemon = True
         self.start()
 
     def enable(self):
+        # Report all values when starting
+        self.filter.reset()
+        self.trajectory.reset()
+        self.pos_last = None
         self.active = True
 
     def disable(self):
@@ -282,8 +395,21 @@ class ThingsDataCollector(threading.Thread):
         logger.info("starting cloud data collector thread")
 
         cnt = 0
+        next_tick = time.monotonic()
         while True:
-            if self.active:
+            now = time.monotonic()
+            tick = now >= next_tick
+            if tick:
+                next_tick = max(next_tick + 1.0, now)
+
+            self.live_changed.clear()
+            if self.active and not tick:
+                # Woken up by a live data change
+                md = self.model.get_all()
+                self._gnss(md, False)
+                self._obd2(md)
+
+            elif self.active:
                 md = self.model.get_all()
 
                 # Attributes
@@ -298,17 +424,18 @@ class ThingsDataCollector(threading.Thread):
                 if cnt % 120 == 0:
                     self._traffic(md)
 
-                # Force GNSS update once a minute, even if not moving
-                force_update = (cnt % 60) == 0
-                self._gnss(md, force_update)
+                # Report GNSS position once a minute, even if not moving
+                heartbeat = (cnt % 60) == 0
+                self._gnss(md, heartbeat)
 
-                # OBD2 information every second, force update even when no change
-                force_update = (cnt % 60) == 0
-                self._obd2(md, force_update)
+                # OBD2 information every second, filter reports it once a
+                # minute even when no change
+                self._obd2(md)
 
                 cnt += 1
 
-            time.sleep(1.0)
+            # Wait for next cycle or live data change, whatever comes first
+            self.live_changed.wait(max(0.0, next_tick - time.monotonic()))
 
     def _attributes(self, md):
         os_version = md['sys-version']['sys']
@@ -357,7 +484,7 @@ class ThingsDataCollector(threading.Thread):
         if 'sys-misc' in md:
             info = md['sys-misc']
             telemetry['temperature'] = info['temp']
-            telemetry['cpu-load'] = info['load'][0]
+            telemetry['cpu-load'] = float(info['load'][0])
             telemetry['voltage-in'] = info['v_in']
             telemetry['mem-free'] = info['mem'][1]
             if 'temp_lm75' in info:
@@ -367,7 +494,7 @@ class ThingsDataCollector(threading.Thread):
             info = md['link']
             if 'delay' in info:
                 delay_in_ms = info['delay'] * 1000.0
-                telemetry['wwan-delay'] = f'{delay_in_ms:.0f}'
+                telemetry['wwan-delay'] = round(delay_in_ms)
 
         if 'modem' in md:
             info = md['modem']
@@ -403,78 +530,74 @@ class ThingsDataCollector(threading.Thread):
                     uptime = info['bearer-uptime']
                     telemetry['bearer-uptime'] = uptime
 
-        if 'net-wwan0' in md:
-            info = md['net-wwan0']
-            (rx, tx) = info['bytes']
-            telemetry['wwan0-rx'] = f'{rx}'
-            telemetry['wwan0-tx'] = f'{tx}'
-
-        if 'net-wlan0' in md:
-            info = md['net-wlan0']
-            (rx, tx) = info['bytes']
-            telemetry['wlan0-rx'] = f'{rx}'
-            telemetry['wlan0-tx'] = f'{tx}'
+        self._net_bytes(md, 'wwan0', telemetry)
+        self._net_bytes(md, 'wlan0', telemetry)
 
         if 'phy-broadr0' in md:
-            info = md['phy-broadr0']
-            quality = info['quality']
-            telemetry['broadr0-quality'] = f'{quality}'
+            quality = md['phy-broadr0']['quality']
+            # None if there is no PHY
+            if quality is not None:
+                telemetry['broadr0-quality'] = int(quality)
 
-        if len(telemetry) > 0:
-            self._data_queue.add(telemetry)
+        self._add_filtered(telemetry)
+        self.model.publish('things-filter', self.filter.stats())
+
+    @staticmethod
+    def _net_bytes(md, name, telemetry):
+        if f'net-{name}' in md:
+            (rx, tx) = md[f'net-{name}']['bytes']
+            if rx is not None:
+                telemetry[f'{name}-rx'] = int(rx)
+                telemetry[f'{name}-tx'] = int(tx)
 
     def _traffic(self, md):
         telemetry = dict()
         if 'traffic-wwan0' in md:
             info = md['traffic-wwan0']
-            telemetry['wwan0-rx-day'] = f'{info["day_rx"]}'
-            telemetry['wwan0-tx-day'] = f'{info["day_tx"]}'
-            telemetry['wwan0-rx-month'] = f'{info["month_rx"]}'
-            telemetry['wwan0-tx-month'] = f'{info["month_tx"]}'
+            telemetry['wwan0-rx-day'] = info['day_rx']
+            telemetry['wwan0-tx-day'] = info['day_tx']
+            telemetry['wwan0-rx-month'] = info['month_rx']
+            telemetry['wwan0-tx-month'] = info['month_tx']
 
-        if len(telemetry) > 0:
-            self._data_queue.add(telemetry)
-
-    def _gnss(self, md, force):
-        if 'gnss-pos' in md:
-            pos = md['gnss-pos']
-            if 'lon' in pos and 'lat' in pos:
-                lon_rad = math.radians(pos['lon'])
-                lat_rad = math.radians(pos['lat'])
+        self._add_filtered(telemetry)
 
-                d = self._distance(lon_rad, lat_rad)
-                if force or d > self.GNSS_UPDATE_DISTANCE:
-                    self._data_queue.add(pos)
+    def _gnss(self, md, heartbeat):
+        """
+        Feeds new position fixes to the trajectory simplifier and queues the
+        points it reports with the time of the fix
 
-                    self.lat_last_rad = lat_rad
-                    self.lon_last_rad = lon_rad
+        heartbeat reports the current position even if it did not change
+        """
+        pos = md.get('gnss-pos')
+        if not pos or 'lon' not in pos or 'lat' not in pos:
+            return
 
-    def _distance(self, lon_rad, lat_rad):
-        R = 6371.0e3
-        d_lat_rad = self.lat_last_rad - lat_rad
-        d_lon_rad = self.lon_last_rad - lon_rad
+        points = list()
+        if pos is not self.pos_last:
+            # Model publishes a new object only if the position changed
+            self.pos_last = pos
+            data = {k: pos[k] for k in self.GNSS_KEYS if pos.get(k) is not None}
+            points = self.trajectory.add(pos['lat'], pos['lon'], data, pos.get('time') or time.time())
 
-        a = math.sin(d_lat_rad / 2) * math.sin(d_lat_rad / 2) + \
-            math.cos(lat_rad) * math.cos(self.lat_last_rad) * \
-            math.sin(d_lon_rad / 2) * math.sin(d_lon_rad / 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1.0 - a))
-        d = R * c
+        if heartbeat and not points:
+            points = self.trajectory.flush() or self.trajectory.repeat(time.time())
+            self.model.publish('things-trajectory', self.trajectory.stats())
 
-        return d
+        for timestamp, data in points:
+            self._data_queue.add(data, timestamp)
 
-    def _obd2(self, md, force):
+    def _obd2(self, md):
         if 'obd2' in md:
             info = md['obd2']
-            speed = info['speed']
-            speed_diff = speed - self.obd2_last_speed
-            # print(f'TB telemetry {speed} {self.obd2_last_speed}')
-            if force or abs(speed_diff) >= 1.0:
-                data = {
-                    'obd2-speed': f'{speed}',
-                }
-                self._data_queue.add(data)
-
-                self.obd2_last_speed = speed
+            data = {
+                'obd2-speed': info['speed'],
+            }
+            self._add_filtered(data)
+
+    def _add_filtered(self, telemetry):
+        telemetry = self.filter.filter(telemetry)
+        if len(telemetry) > 0:
+            self._data_queue.add(telemetry)
 
     @staticmethod
     def rat_to_number(rat_str):
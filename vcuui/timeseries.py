@@ -0,0 +1,337 @@
+"""
+In-memory time-series store for model data
+
+Keeps the history of numeric model values, i.e. temperature, input
+voltage, signal quality or link delay. Fields are named by their path in
+the model, nested values are joined with '.', list entries use their
+index, i.e. 'sys-misc.temp', 'modem.signal-lte.rsrp', 'sys-misc.load.0'.
+Only numbers are recorded, text values such as ids are ignored.
+
+Each field has three tiers, every tier aggregates the samples to buckets
+with min, max and average
+- 1 s buckets for the last 10 minutes
+- 1 min buckets for the last 12 hours
+- 15 min buckets for the last 7 days
+
+Buckets are stored in preallocated arrays (ring buffers), so the memory of
+a field is fixed. The number of fields is limited by a total memory
+budget, fields showing up after the budget is used are not recorded.
+
+Buckets are aligned to wall clock time. When the clock is set, i.e. by NTP
+or GNSS time sync after boot, the recorded history is moved by the same
+step, so it doesn't collapse into the current bucket.
+"""
+import logging
+import math
+import threading
+import time
+from array import array
+
+logger = logging.getLogger('vcu-ui')
+
+
+class Tier():
+    """
+    Ring buffer of buckets with fixed resolution
+    """
+    # Arrays per tier: start, min, max, sum, count
+    ARRAYS = 5
+
+    def __init__(self, resolution, size):
+        super().__init__()
+
+        self.resolution = resolution
+        self.size = size
+
+        self._start = array('d', bytes(8 * size))
+        self._min = array('d', bytes(8 * size))
+        self._max = array('d', bytes(8 * size))
+        self._sum = array('d', bytes(8 * size))
+        self._count = array('d', bytes(8 * size))
+        self._head = 0
+        self._len = 0
+
+        # Bucket currently being filled
+        self._cur_start = None
+        self._cur_min = 0.0
+        self._cur_max = 0.0
+        self._cur_sum = 0.0
+        self._cur_count = 0
+
+    @property
+    def span(self):
+        return self.resolution * self.size
+
+    @property
+    def nbytes(self):
+        return self.ARRAYS * 8 * self.size
+
+    def add(self, t, value):
+        start = t - t % self.resolution
+        if self._cur_start is None or start > self._cur_start:
+            if self._cur_start is not None:
+                self._close()
+            self._cur_start = start
+            self._cur_min = value
+            self._cur_max = value
+            self._cur_sum = value
+            self._cur_count = 1
+        else:
+            # Same bucket, or clock stepped back
+            self._cur_min = min(self._cur_min, value)
+            self._cur_max = max(self._cur_max, value)
+            self._cur_sum += value
+            self._cur_count += 1
+
+    def shift(self, delta):
+        """
+        Moves all buckets by delta seconds, rounded to the resolution
+        """
+        delta = round(delta / self.resolution) * self.resolution
+        if not delta:
+            return
+
+        for i in range(self._head - self._len, self._head):
+            self._start[i % self.size] += delta
+        if self._cur_start is not None:
+            self._cur_start += delta
+
+    def oldest(self):
+        """
+        Returns start of oldest bucket, None if empty
+        """
+        if self._len:
+            return self._start[(self._head - self._len) % self.size]
+        return self._cur_start
+
+    def buckets(self, start, end):
+        """
+        Returns list of (time, min, max, avg) of buckets starting in range
+        start..end, oldest first. Includes the bucket being filled.
+        """
+        res = list()
+        for i in range(self._head - self._len, self._head):
+            i %= self.size
+            t = self._start[i]
+            if start <= t <= end:
+                res.append((t, self._min[i], self._max[i], self._sum[i] / self._count[i]))
+
+        t = self._cur_start
+        if t is not None and start <= t <= end:
+            res.append((t, self._cur_min, self._cur_max, self._cur_sum / self._cur_count))
+
+        return res
+
+    def _close(self):
+        i = self._head
+        self._start[i] = self._cur_start
+        self._min[i] = self._cur_min
+        self._max[i] = self._cur_max
+        self._sum[i] = self._cur_sum
+        self._count[i] = self._cur_count
+
+        self._head = (i + 1) % self.size
+        self._len = min(self._len + 1, self.size)
+
+
+class Series():
+    """
+    History of one field in all tiers
+    """
+    def __init__(self, tiers):
+        super().__init__()
+
+        self.tiers = [Tier(resolution, size) for resolution, size in tiers]
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for t in self.tiers)
+
+    def add(self, t, value):
+        for tier in self.tiers:
+            tier.add(t, value)
+
+    def shift(self, delta):
+        for tier in self.tiers:
+            tier.shift(delta)
+
+    def query(self, start, end, resolution):
+        """
+        Uses the finest tier with at least the requested resolution that
+        holds data from start. If none does, uses the tier holding the
+        oldest data.
+        """
+        candidates = [t for t in self.tiers if t.resolution >= resolution] or self.tiers[-1:]
+
+        best = None
+        best_end = None
+        for tier in candidates:
+            oldest = tier.oldest()
+            if oldest is None:
+                continue
+            if oldest <= start:
+                best = tier
+                break
+
+            # Compare end of oldest bucket, coarser tiers only win if they
+            # really go back further
+            if best is None or oldest + tier.resolution < best_end:
+                best = tier
+                best_end = oldest + tier.resolution
+
+        tier = best or candidates[0]
+        return tier.resolution, tier.buckets(start - start % tier.resolution, end)
+
+
+class TimeSeriesStore():
+    # (resolution in s, number of buckets)
+    TIERS = (
+        (1, 600),       # 10 minutes
+        (60, 720),      # 12 hours
+        (900, 672),     # 7 days
+    )
+
+    # Origins to record, statistics and static information are left out
+    ORIGINS = ('sys-misc', 'sys-disc', 'modem', 'link', 'net-wwan0', 'net-wlan0', 'obd2', 'gnss-pos',
+               'phy-broadr0', 'traffic-wwan0')
+
+    # Fields without meaningful history
+    EXCLUDE = ('gnss-pos.time', 'modem.location')
+
+    # About 50 fields with the default tiers
+    BUDGET = 4 * 1024 * 1024
+
+    # Changes of wall clock against monotonic time above this are treated
+    # as the clock being set
+    STEP_THRESHOLD = 2.0
+
+    def __init__(self, tiers=TIERS, budget=BUDGET, origins=ORIGINS, exclude=EXCLUDE):
+        super().__init__()
+
+        self.tiers = tiers
+        self.budget = budget
+        self.origins = set(origins)
+        self.exclude = set(exclude)
+
+        self._lock = threading.Lock()
+        self._series = dict()
+        self._nbytes = 0
+        self._offset = None     # Wall clock minus monotonic time
+
+        # Statistics
+        self.samples = 0
+        self.rejected = set()
+
+    def add(self, origin, value, now=None):
+        """
+        Records all numeric fields of value
+
+        Called by the model for every published value, also unchanged
+        ones, so averages are weighted by time. Other origins are ignored.
+        """
+        if value is None or origin not in self.origins:
+            return
+
+        offset = None
+        if now is None:
+            now = time.time()
+            offset = now - time.monotonic()
+
+        fields = list()
+        self._flatten(origin, value, fields)
+
+        with self._lock:
+            if offset is not None:
+                self._check_step(offset)
+
+            for name, v in fields:
+                series = self._series.get(name) or self._create(name)
+                if series:
+                    series.add(now, v)
+                    self.samples += 1
+
+    def fields(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def query(self, field, start=None, end=None, resolution=1):
+        """
+        Returns history of field
+
+        start, end: time range in seconds since epoch, default is the last
+            hour
+        resolution: requested bucket size in seconds, the next coarser
+            tier is used, or a coarser one if only that reaches back to start
+
+        Returns dict with resolution used and list of [time, min, max, avg]
+        points, or None if field is unknown
+        """
+        if end is None:
+            end = time.time()
+        if start is None:
+            start = end - 3600
+
+        with self._lock:
+            series = self._series.get(field)
+            if not series:
+                return None
+
+            res, points = series.query(start, end, resolution)
+
+        return {
+            'field': field,
+            'resolution': res,
+            'points': [[t, mn, mx, round(avg, 6)] for t, mn, mx, avg in points],
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'fields': len(self._series),
+                'bytes': self._nbytes,
+                'budget': self.budget,
+                'samples': self.samples,
+                'rejected': len(self.rejected),
+            }
+
+    def _check_step(self, offset):
+        # Lock must be held by caller
+        if self._offset is not None:
+            step = offset - self._offset
+            if abs(step) > self.STEP_THRESHOLD:
+                logger.info(f'wall clock stepped by {step:.0f} s, moving history')
+                for series in self._series.values():
+                    series.shift(step)
+
+        self._offset = offset
+
+    def _create(self, name):
+        # Lock must be held by caller
+        if name in self.rejected:
+            return None
+
+        series = Series(self.tiers)
+        if self._nbytes + series.nbytes > self.budget:
+            logger.warning(f'time-series budget exhausted, not recording {name}')
+            self.rejected.add(name)
+            return None
+
+        self._series[name] = series
+        self._nbytes += series.nbytes
+        return series
+
+    def _flatten(self, prefix, value, res):
+        if prefix in self.exclude:
+            return
+
+        if isinstance(value, bool):
+            return
+        elif isinstance(value, (int, float)):
+            if math.isfinite(value):
+                res.append((prefix, float(value)))
+        elif isinstance(value, dict):
+            for k, v in value.items():
+                self._flatten(f'{prefix}.{k}', v, res)
+        elif isinstance(value, (list, tuple)):
+            for i, v in enumerate(value):
+                self._flatten(f'{prefix}.{i}', v, res)
@@ -1,7 +1,3 @@
-import subprocess
-# import asyncio
-
-
 def secs_to_hhmm(secs):
     t = int((secs + 30) / 60)
     h = int(t / 60)
@@ -9,26 +5,20 @@ def secs_to_hhmm(secs):
     return h, m
 
 
-def ping(ip):
-    cp = subprocess.run(['/usr/bin/ping', '-c', '4', ip], stdout=subprocess.PIPE)
-    res = cp.stdout.decode()
-
-    return res
-
-
-"""
-async def ping(ip):
-    proc = await asyncio.create_subprocess_exec('ping', '-c', '4', ip, stdout=subprocess.PIPE)
-    await proc.wait()
-    # cp = subprocess.run(['/usr/bin/ping', '-c', '4', ip], stdout=subprocess.PIPE)
-    res = proc.stdout.decode()
-
-    return res
-"""
-
-
-def nmcli_c():
-    cp = subprocess.run(['/usr/bin/nmcli', 'c'], stdout=subprocess.PIPE)
-    res = cp.stdout.decode()
-
-    return res
+def bytes_to_human(num):
+    """
+    Formats byte count with binary prefix like df -h, e.g. 1.5G or 980M
+    """
+    for unit in ('', 'K', 'M', 'G'):
+        if num < 1024:
+            break
+        num /= 1024.0
+    else:
+        unit = 'T'
+
+    if unit == '':
+        return f'{int(num)}'
+    elif num < 10:
+        return f'{num:.1f}{unit}'
+    else:
+        return f'{num:.0f}{unit}'
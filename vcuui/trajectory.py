@@ -0,0 +1,201 @@
+"""
+Trajectory simplification for GNSS telemetry
+
+Reduces the stream of position fixes to the points needed to reproduce the
+driven path within an error bound (tolerance in metres).
+
+Opening window algorithm, an online variant of Douglas-Peucker
+- The last reported point is the anchor
+- New fixes are collected in a window
+- For each new fix, the distance of all window points to the line from
+  anchor to the new fix is checked. If one exceeds the tolerance the
+  previous fix is reported and becomes the new anchor.
+
+Straight segments collapse to their end points, curves keep as many points
+as needed to stay within the tolerance. A point is reported at least every
+max_age seconds or max_points fixes, even on a straight line.
+
+Window distances are computed with NumPy if available, otherwise with a
+plain Python loop.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+EARTH_RADIUS = 6371.0e3
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance in metres between points given in degrees
+
+    Accepts floats or, if NumPy is installed, arrays which are processed
+    element-wise.
+    """
+    if np is not None and any(isinstance(v, np.ndarray) for v in (lat1, lon1, lat2, lon2)):
+        m, asin = np, np.arcsin
+    else:
+        m, asin = math, math.asin
+
+    lat1 = m.radians(lat1)
+    lat2 = m.radians(lat2)
+    d_lat = lat2 - lat1
+    d_lon = m.radians(lon2) - m.radians(lon1)
+
+    a = m.sin(d_lat / 2) ** 2 + m.cos(lat1) * m.cos(lat2) * m.sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS * asin(m.sqrt(a))
+
+
+class TrajectorySimplifier():
+    # Maximum deviation of the reported path in metres
+    TOLERANCE = 5.0
+
+    # Report point after this many fixes or seconds, even if not needed
+    MAX_POINTS = 120
+    MAX_AGE = 60.0
+
+    # Below this window size the NumPy call overhead outweighs the gain
+    NUMPY_MIN_POINTS = 16
+
+    def __init__(self, tolerance=TOLERANCE, max_points=MAX_POINTS, max_age=MAX_AGE, use_numpy=True):
+        super().__init__()
+
+        self.tolerance = tolerance
+        self.max_points = max_points
+        self.max_age = max_age
+        self.use_numpy = use_numpy and np is not None
+
+        # Fixes are tuples (timestamp, lat, lon, data)
+        self._anchor = None
+        self._window = list()
+
+        # Statistics
+        self.received = 0
+        self.reported = 0
+        self.distance = 0.0
+
+    def add(self, lat, lon, data, timestamp):
+        """
+        Adds position fix, timestamp in seconds
+
+        Returns list of (timestamp, data) of points to report, usually empty
+        """
+        self.received += 1
+        fix = (timestamp, lat, lon, data)
+
+        if self._anchor is None:
+            return self._report(fix)
+
+        res = list()
+        if self._window and (self._window_full(timestamp) or self._exceeds(fix)):
+            res = self._report(self._window[-1])
+
+        self._window.append(fix)
+        return res
+
+    def flush(self):
+        """
+        Reports the most recent fix if not done yet
+
+        Returns list of (timestamp, data), empty if nothing was pending
+        """
+        if self._window:
+            return self._report(self._window[-1])
+
+        return list()
+
+    def repeat(self, timestamp):
+        """
+        Reports the last reported point again with new timestamp, i.e. as
+        heartbeat when not moving
+
+        Returns list of (timestamp, data), empty if nothing was reported yet
+        """
+        if self._anchor is None:
+            return list()
+
+        return [(timestamp, self._anchor[3])]
+
+    def reset(self):
+        """
+        Forgets all fixes, next fix is reported
+        """
+        self._anchor = None
+        self._window.clear()
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'reported': self.reported,
+            'pending': len(self._window),
+            'distance': round(self.distance),
+        }
+
+    def _window_full(self, timestamp):
+        return len(self._window) >= self.max_points or timestamp - self._anchor[0] >= self.max_age
+
+    def _report(self, fix):
+        if self._anchor is not None:
+            self.distance += haversine(self._anchor[1], self._anchor[2], fix[1], fix[2])
+
+        self._anchor = fix
+        self._window.clear()
+        self.reported += 1
+
+        return [(fix[0], fix[3])]
+
+    def _exceeds(self, fix):
+        """
+        True if any window point is further than tolerance from the line
+        anchor -> fix
+        """
+        if not self._window:
+            return False
+
+        if self.use_numpy and len(self._window) >= self.NUMPY_MIN_POINTS:
+            return self._max_deviation_numpy(fix) > self.tolerance
+
+        return self._max_deviation(fix) > self.tolerance
+
+    def _project(self, lat, lon):
+        """
+        Local equirectangular projection around anchor, returns (x, y) in
+        metres. Accurate enough for the short distances in a window.
+        """
+        _, lat0, lon0, _ = self._anchor
+        scale = math.radians(EARTH_RADIUS)
+        d_lon = (lon - lon0 + 180.0) % 360.0 - 180.0
+        return d_lon * scale * math.cos(math.radians(lat0)), (lat - lat0) * scale
+
+    def _max_deviation(self, fix):
+        bx, by = self._project(fix[1], fix[2])
+        b2 = bx * bx + by * by
+
+        res = 0.0
+        for _, lat, lon, _ in self._window:
+            px, py = self._project(lat, lon)
+            t = min(1.0, max(0.0, (px * bx + py * by) / b2)) if b2 > 0.0 else 0.0
+            res = max(res, math.hypot(px - t * bx, py - t * by))
+
+        return res
+
+    def _max_deviation_numpy(self, fix):
+        _, lat0, lon0, _ = self._anchor
+        bx, by = self._project(fix[1], fix[2])
+        b2 = bx * bx + by * by
+
+        points = np.array([(lat, lon) for _, lat, lon, _ in self._window])
+        scale = math.radians(EARTH_RADIUS)
+        px = ((points[:, 1] - lon0 + 180.0) % 360.0 - 180.0) * scale * math.cos(math.radians(lat0))
+        py = (points[:, 0] - lat0) * scale
+
+        if b2 > 0.0:
+            t = np.clip((px * bx + py * by) / b2, 0.0, 1.0)
+        else:
+            t = 0.0
+
+        return float(np.max(np.hypot(px - t * bx, py - t * by)))
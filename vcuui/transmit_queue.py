@@ -1,6 +1,12 @@
-# import logging
+import logging
 import threading
 import time
+from collections import deque
+from itertools import islice
+
+from vcuui.spool import Spool
+
+logger = logging.getLogger('vcu-ui')
 
 
 class TransmitQueue():
@@ -8,39 +14,70 @@ class TransmitQueue():
     Transmit queue
 
     - Thread safe
-    - Size limited
+    - Size limited ring buffer, adding to a full queue drops the oldest entry
+    - Constant cost add and remove, independent of queue size
     - Stores data with timestamp in a map as follows
       {"time": <time>, "data": <data>}
+
+    Persistent mode (spool_path given)
+    - All entries are written to a Spool on disk and survive restarts
+    - The queue only keeps the oldest max_queue_size entries in memory,
+      newer entries stay on disk and are loaded as the head is removed
+    - Removing entries acknowledges them in the spool
+    - Entries additionally contain their sequence number "seq"
+    - Overflow is defined by the spool size limit, not max_queue_size
+    - On disk errors the queue continues in memory, entries only stored on
+      disk are counted as dropped
     """
-    def __init__(self, max_queue_size):
+    def __init__(self, max_queue_size, spool_path=None, **spool_args):
         super().__init__()
 
-        assert 1 <= max_queue_size < 3000
+        assert max_queue_size >= 1
         self._max_queue_size = max_queue_size
         self._lock = threading.Lock()
-        self._data_queue = list()
+
+        # Statistics
+        self._added = 0
+        self._removed = 0
+        self._dropped = 0
+
+        self._refilling = False
+        if spool_path:
+            self._spool = Spool(spool_path, **spool_args)
+            self._spool.open()
+            self._data_queue = deque()
+            self._refill()
+        else:
+            self._spool = None
+            self._data_queue = deque(maxlen=max_queue_size)
 
     def num_entries(self):
+        """
+        Returns number of entries, including entries only stored on disk
+        """
         with self._lock:
+            if self._spool:
+                return self._spool.num_entries()
+
             return len(self._data_queue)
 
     def all_entries(self):
+        """
+        Gets copy of all entries held in memory
+        """
         with self._lock:
-            return self._data_queue
+            return list(self._data_queue)
 
     def first_entries(self, num):
         """
         Gets first <num> entries
 
         If <num> exceeds the number of entries in the queue, all entries
-        are returned without failing.
+        are returned without failing. The entries are not copied, only the
+        list referencing them.
         """
         with self._lock:
-            max = len(self._data_queue)
-            if num > max:
-                num = max
-            # self._deqeue_head(num)
-            return self._data_queue[:num]
+            return list(islice(self._data_queue, num))
 
     def remove_first(self, num):
         """
@@ -49,35 +86,196 @@ class TransmitQueue():
         If <num> is greater than queue size, removes all entries without
         failing.
         """
+        self.pop_first(num)
+
+    def pop_first(self, num):
+        """
+        Removes first <num> entries from queue and returns them
+        """
         with self._lock:
-            # assert num <= len(self._data_queue)
-            max = len(self._data_queue)
-            if num > max:
-                num = max
-            # self._deqeue_head(num)
-            self._data_queue = self._data_queue[num:]
+            num = min(num, len(self._data_queue))
+            popleft = self._data_queue.popleft
+            res = [popleft() for _ in range(num)]
+            self._removed += num
 
-    def add(self, data):
+            refill = None
+            if self._spool and res:
+                try:
+                    self._spool.ack(res[-1]['seq'])
+                    refill = self._refill_start()
+                except OSError as e:
+                    self._fall_back(e)
+
+        # Parse entries from disk without blocking add()
+        if refill:
+            self._refill_finish(*refill)
+
+        return res
+
+    def add(self, data, timestamp=None):
         """
         Adds entry to transmit queue
 
+        timestamp in seconds since epoch, defaults to current time. Used
+        for data that is queued after it was measured.
+
         Removes oldest entry to make space for new one if queue size limit
         is reached.
         """
-        now = time.time()
-        now_ms = int(1000.0 * now)
-        data_set = {"time": now_ms, "data": data}
+        if timestamp is None:
+            timestamp = time.time()
+        time_ms = int(1000.0 * timestamp)
+        data_set = {"time": time_ms, "data": data}
 
         with self._lock:
-            num_entries = len(self._data_queue)
-            # logger.debug(f'num q entries {num_entries}')
-            if num_entries >= self._max_queue_size:
+            self._added += 1
+            if self._spool:
+                try:
+                    self._add_persistent(data_set)
+                    return
+                except OSError as e:
+                    self._fall_back(e, data_set)
+
+            if len(self._data_queue) == self._max_queue_size:
                 # logger.info('queue overflow, dropping old elements')
-                self._data_queue = self._data_queue[1:]
+                self._dropped += 1
 
+            # deque with maxlen discards oldest entry itself
             self._data_queue.append(data_set)
 
-    def _deqeue_head(self, amount):
-        data = self._data_queue[0:amount]
-        self._data_queue = self._data_queue[amount:]
-        return data
+    def sync(self):
+        """
+        Forces spooled entries to disk, no-op in memory mode
+        """
+        with self._lock:
+            if self._spool:
+                try:
+                    self._spool.sync()
+                except OSError as e:
+                    self._fall_back(e)
+
+    def close(self):
+        with self._lock:
+            if self._spool:
+                try:
+                    self._spool.close()
+                except OSError as e:
+                    logger.warning('cannot close spool')
+                    logger.warning(e)
+
+    def stats(self):
+        """
+        Returns queue counters
+
+        dropped counts entries lost due to queue overflow
+        """
+        with self._lock:
+            entries = self._spool.num_entries() if self._spool else len(self._data_queue)
+            return {
+                'entries': entries,
+                'capacity': self._max_queue_size,
+                'added': self._added,
+                'removed': self._removed,
+                'dropped': self._dropped,
+            }
+
+    def _fall_back(self, error, data_set=None):
+        # Lock must be held by caller. Drops the spool and continues with the
+        # entries held in memory. data_set is the entry being added, it is
+        # kept by the caller.
+        logger.warning('spool failed, keeping telemetry in memory only')
+        logger.warning(error)
+
+        spool = self._spool
+        last = self._data_queue[-1]['seq'] if self._data_queue else spool.head_seq - 1
+        lost = max(0, spool.next_seq - 1 - last)
+        if data_set and last < data_set.get('seq', 0) < spool.next_seq:
+            lost -= 1
+        self._dropped += lost
+
+        try:
+            spool.close()
+        except OSError:
+            pass
+
+        self._spool = None
+        self._data_queue = deque(self._data_queue, maxlen=self._max_queue_size)
+
+    def _add_persistent(self, data_set):
+        # Lock must be held by caller
+        in_memory = len(self._data_queue) < self._max_queue_size and not self._backlog()
+
+        dropped = self._spool.append(data_set)
+        if dropped:
+            self._dropped += dropped
+            head = self._spool.head_seq
+            while self._data_queue and self._data_queue[0]['seq'] < head:
+                self._data_queue.popleft()
+
+        if in_memory:
+            self._data_queue.append(data_set)
+        elif not self._data_queue:
+            self._refill()
+
+    def _backlog(self):
+        # Lock must be held by caller. True if entries exist only on disk
+        if self._data_queue:
+            return self._data_queue[-1]['seq'] + 1 < self._spool.next_seq
+        else:
+            return self._spool.head_seq < self._spool.next_seq
+
+    def _refill(self):
+        # Lock must be held by caller. Loads entries from disk into memory
+        refill = self._refill_start()
+        if refill:
+            plan, from_seq, num = refill
+            self._refill_merge(*Spool.read_segments(plan, from_seq, num))
+
+    def _refill_start(self):
+        # Lock must be held by caller. Returns arguments for
+        # Spool.read_segments() or None if nothing is to be loaded
+        if self._refilling or not self._backlog():
+            return None
+
+        if self._data_queue:
+            from_seq = self._data_queue[-1]['seq'] + 1
+        else:
+            from_seq = self._spool.head_seq
+
+        num = self._max_queue_size - len(self._data_queue)
+        if num <= 0:
+            return None
+
+        self._refilling = True
+        return self._spool.read_plan(from_seq), from_seq, num
+
+    def _refill_finish(self, plan, from_seq, num):
+        # Reads without lock, merges with lock
+        try:
+            entries, cursor = Spool.read_segments(plan, from_seq, num)
+        except OSError:
+            entries, cursor = list(), None
+
+        with self._lock:
+            self._refill_merge(entries, cursor)
+
+    def _refill_merge(self, entries, cursor):
+        # Lock must be held by caller. The queue may have changed while
+        # reading, only take entries continuing the queue.
+        self._refilling = False
+        if not self._spool:
+            return
+
+        if self._data_queue:
+            expected = self._data_queue[-1]['seq'] + 1
+        else:
+            expected = self._spool.head_seq
+
+        entries = [e for e in entries if e['seq'] >= expected]
+        if not entries or entries[0]['seq'] != expected:
+            return
+
+        space = self._max_queue_size - len(self._data_queue)
+        self._data_queue.extend(entries[:space])
+        if len(entries) <= space:
+            self._spool.set_cursor(cursor)
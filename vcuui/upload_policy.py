@@ -0,0 +1,110 @@
+"""
+Adaptive upload cadence for Thingsboard telemetry
+
+Derives upload period and payload byte budget from link quality and the
+transmit queue depth.
+
+Link quality is the worse of
+- LTE signal quality ('signal-quality2' or ModemManager 'signal-quality')
+- Round trip delay of the link supervision ping ('link' 'delay')
+
+Quality classes
+- good: large batches, regular period, backlog is drained right away
+- fair: medium batches, regular period, backlog is drained right away
+- poor: small batches, long period, backlog is not drained in a burst to
+  avoid wasting airtime on uploads that time out
+"""
+
+
+class UploadPolicy():
+    # (min quality, class name, upload period in s, byte budget)
+    CLASSES = (
+        (0.7, 'good', 30.0, 128 * 1024),
+        (0.4, 'fair', 30.0, 32 * 1024),
+        (0.0, 'poor', 120.0, 8 * 1024),
+    )
+
+    # Upload period while draining a backlog on good/fair link
+    BACKLOG_PERIOD = 5.0
+
+    # Queue depth considered backlog, more than 5 minutes of data
+    BACKLOG_ENTRIES = 300
+
+    # Ping delay mapped to quality 1.0 and 0.1 respectively
+    DELAY_GOOD = 0.1
+    DELAY_POOR = 1.0
+
+    def __init__(self):
+        super().__init__()
+
+        self.quality = None
+        self.link_class = 'fair'
+        self.period = 30.0
+        self.byte_budget = 32 * 1024
+        self.drain = True
+
+    def update(self, md, queue_depth):
+        """
+        Re-evaluates policy from model data md and queue depth
+
+        Returns True if period or byte budget changed
+        """
+        q = self.link_quality(md)
+        if q is None:
+            # No measurements yet, use defaults
+            link_class, period, byte_budget = 'fair', 30.0, 32 * 1024
+        else:
+            for min_q, link_class, period, byte_budget in self.CLASSES:
+                if q >= min_q:
+                    break
+
+        self.drain = link_class != 'poor'
+        if self.drain and queue_depth >= self.BACKLOG_ENTRIES:
+            period = min(period, self.BACKLOG_PERIOD)
+
+        changed = (period, byte_budget) != (self.period, self.byte_budget)
+
+        self.quality = q
+        self.link_class = link_class
+        self.period = period
+        self.byte_budget = byte_budget
+
+        return changed
+
+    def info(self):
+        return {
+            'link-quality': round(self.quality, 2) if self.quality is not None else None,
+            'link-class': self.link_class,
+            'period': self.period,
+            'byte-budget': self.byte_budget,
+        }
+
+    @classmethod
+    def link_quality(cls, md):
+        """
+        Returns link quality 0..1, or None if unknown
+        """
+        qualities = list()
+
+        modem = md.get('modem')
+        if modem:
+            sq = modem.get('signal-quality2', modem.get('signal-quality'))
+            if sq is not None:
+                qualities.append(max(0.0, min(1.0, sq / 100.0)))
+
+        link = md.get('link')
+        if link and 'delay' in link:
+            qualities.append(cls._delay_to_q(link['delay']))
+
+        if qualities:
+            return min(qualities)
+
+    @classmethod
+    def _delay_to_q(cls, delay):
+        # Delay 0.0 means ping failed
+        if delay <= 0.0 or delay >= cls.DELAY_POOR:
+            return 0.1
+        elif delay <= cls.DELAY_GOOD:
+            return 1.0
+        else:
+            return 1.0 - 0.9 * (delay - cls.DELAY_GOOD) / (cls.DELAY_POOR - cls.DELAY_GOOD)
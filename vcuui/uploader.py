@@ -0,0 +1,214 @@
+"""
+Upload worker with retry, backoff and circuit breaker
+
+Runs an upload function in its own thread, so producers and the owner's
+state machine never wait for the server.
+
+upload() returns
+- True: data was sent
+- False: sending failed, data is kept by the caller for the next try
+- None: nothing to send
+
+Failed uploads are retried with exponential backoff and jitter. After
+several consecutive failures the circuit opens (state 'disconnected') and
+only a single probe upload is attempted once per (growing) cool-down
+period, until one succeeds.
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger('vcu-ui')
+
+
+class CircuitBreaker():
+    # Consecutive failures until circuit opens
+    THRESHOLD = 3
+
+    # Retry delay after first failure, doubles with every further failure
+    BASE_DELAY = 2.0
+
+    # Upper limit for retry delay
+    MAX_DELAY = 600.0
+
+    def __init__(self, threshold=THRESHOLD, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        super().__init__()
+
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.failures = 0
+        self.retry_at = 0.0
+
+    @property
+    def state(self):
+        if self.failures == 0:
+            return 'closed'
+        elif self.failures < self.threshold:
+            return 'retrying'
+        else:
+            return 'open'
+
+    def allow(self, now):
+        return now >= self.retry_at
+
+    def record_success(self):
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def record_failure(self, now):
+        self.failures += 1
+        if self.failures == self.threshold:
+            logger.warning(f'{self.failures} uploads failed in a row, opening circuit')
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+
+        # Equal jitter, avoid synchronized retries of a whole fleet after
+        # a server outage
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.retry_at = now + delay
+
+        return delay
+
+
+class Uploader(threading.Thread):
+    def __init__(self, name, upload, period, pending=None, breaker=None):
+        """
+        name: thread name
+        upload: upload function, see module description
+        period: time between regular uploads in seconds
+        pending: optional function returning True if more data is waiting,
+            used to drain a backlog without waiting for the next period
+        """
+        super().__init__()
+
+        self.daemon = True
+        self.name = name
+
+        self.upload = upload
+        self.period = period
+        self.pending = pending
+        self.breaker = breaker or CircuitBreaker()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._link = False
+        self._next = 0.0
+        self._stop_requested = False
+
+        # Statistics
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self):
+        """
+        'offline' if no link, 'disconnected' if circuit is open, 'retrying'
+        after a failed upload, otherwise 'connected'
+        """
+        with self._lock:
+            if not self._link:
+                return 'offline'
+
+            breaker_state = self.breaker.state
+            if breaker_state == 'open':
+                return 'disconnected'
+            elif breaker_state == 'retrying':
+                return 'retrying'
+            else:
+                return 'connected'
+
+    def set_link(self, up):
+        """
+        Reports whether network link is available, uploads are only
+        attempted with link. Uploads start immediately when the link comes
+        up.
+        """
+        with self._lock:
+            if up and not self._link:
+                self._next = 0.0
+                self._wakeup.set()
+            self._link = up
+
+    def trigger(self):
+        """
+        Requests upload as soon as possible, still respecting retry delay
+        """
+        with self._lock:
+            self._next = 0.0
+        self._wakeup.set()
+
+    def set_period(self, period):
+        """
+        Changes upload period, a shorter period applies right away
+        """
+        with self._lock:
+            if period < self.period:
+                self._next = min(self._next, time.monotonic() + period)
+                self._wakeup.set()
+            self.period = period
+
+    def stop(self):
+        self._stop_requested = True
+        self._wakeup.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'successes': self.successes,
+                'failures': self.failures,
+                'consecutive-failures': self.breaker.failures,
+            }
+
+    def run(self):
+        while not self._stop_requested:
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                link = self._link
+                due = max(self._next, self.breaker.retry_at)
+
+            if link and now >= due:
+                self._execute()
+                continue
+
+            timeout = 1.0
+            if link:
+                timeout = min(timeout, due - now)
+            self._wakeup.wait(max(0.0, timeout))
+
+    def _execute(self):
+        try:
+            res = self.upload()
+        except Exception as e:
+            logger.warning(f'{self.name} upload failed')
+            logger.warning(e)
+            res = False
+
+        now = time.monotonic()
+        with self._lock:
+            if res is None:
+                self._next = now + self.period
+                return
+
+            self.attempts += 1
+            if res:
+                self.successes += 1
+                if self.breaker.failures >= self.breaker.threshold:
+                    logger.info('upload succeeded, closing circuit')
+                self.breaker.record_success()
+                self._next = now + self.period
+            else:
+                self.failures += 1
+                delay = self.breaker.record_failure(now)
+                logger.info(f'retrying upload in {delay:.1f} s')
+                self._next = now
+
+        # Drain backlog without waiting for next period
+        if res and self.pending and self.pending():
+            with self._lock:
+                self._next = now
@@ -1,5 +1,6 @@
 import logging
-import subprocess
+
+from vcuui.command import run_command
 
 logger = logging.getLogger('vcu-ui')
 
@@ -12,7 +13,7 @@ class VnStat:
         # Check if tool is installed
         try:
             vnstat_call = [VnStat.BIN, '--version']
-            cp = subprocess.run(vnstat_call, capture_output=True)
+            cp = run_command(vnstat_call)
             if cp.returncode == 0:
                 VnStat.version = cp.stdout
                 return True
@@ -31,7 +32,7 @@ class VnStat:
             # Parse returned output
             # 1;wwan0;2022-12-04;34572019;50154378;84726397;1370;2022-12;34572019;50154378;84726397;263;34572019;50154378;84726397
             vnstat_call = [VnStat.BIN, '-d', '--oneline', 'b']
-            cp = subprocess.run(vnstat_call, capture_output=True)
+            cp = run_command(vnstat_call)
             if cp.returncode == 0:
                 result = cp.stdout.decode().strip().split(';')
                 if len(result) >= 13 and result[1] == self.__if:
@@ -35,10 +35,15 @@ class GsmWorker(threading.Thread):
         self.model = model
         self.state = 'init'
         self.counter = 0
+        self.modem_changed = threading.Event()
 
     def setup(self):
         self.daemon = True
         self.name = 'wwan-worker'
+
+        # Get notified about modem changes to react on bearer changes
+        # immediately instead of waiting for the next cycle
+        self.model.subscribe(['modem'], lambda origin, value: self.modem_changed.set())
         self.start()
 
     def run(self):
@@ -47,7 +52,14 @@ class GsmWorker(threading.Thread):
         self.counter = 0
         link_data = dict()
 
+        next_tick = time.monotonic()
         while True:
+            now = time.monotonic()
+            tick = now >= next_tick
+            if tick:
+                next_tick = max(next_tick + 1.0, now)
+
+            self.modem_changed.clear()
             info = self.model.get('modem')
             if self.state == 'init':
                 # check if we have a valid bearer
@@ -67,7 +79,7 @@ class GsmWorker(threading.Thread):
                         self.model.publish('link', link_data)
                         self.state = 'init'
                     else:
-                        if self.counter % 5 == 2:
+                        if tick and self.counter % 5 == 2:
                             try:
                                 delay = ping(PING_HOST, timeout=1.0)
                                 if delay:
@@ -87,5 +99,8 @@ class GsmWorker(threading.Thread):
                 except KeyError:
                     pass
 
-            self.counter += 1
-            time.sleep(1.0)
+            if tick:
+                self.counter += 1
+
+            # Wait for next cycle or modem change, whatever comes first
+            self.modem_changed.wait(max(0.0, next_tick - time.monotonic()))